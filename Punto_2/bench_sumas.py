@@ -0,0 +1,81 @@
+#Compara encontrar_indices1 (un diccionario nuevo por llamada) con MotorSumas
+#(preprocesado una vez, objetivos por lotes) sobre listas de 10^6 a 10^7 enteros.
+#
+#Los objetivos mezclan sumas de dos elementos de la lista (con solución) y
+#valores al azar, que con un rango amplio casi nunca tienen par y obligan a
+#recorrer toda la lista. encontrar_indices1 se mide sobre una muestra de los
+#objetivos y se verifica que ambos devuelvan el mismo par.
+#
+#Uso:
+#    python bench_sumas.py --tamanos 1000000 10000000 --objetivos 1000 --muestra 20
+
+import argparse
+import time
+import numpy as np
+from segundo import encontrar_indices1
+from motor_sumas import MotorSumas
+
+
+def generar_caso(tamano, cantidad_objetivos, rango, semilla):
+    aleatorio = np.random.default_rng(semilla)
+    numeros = aleatorio.integers(-rango, rango, size=tamano, dtype=np.int64)
+    con_solucion = cantidad_objetivos // 2
+    posiciones = aleatorio.integers(0, tamano, size=(con_solucion, 2))
+    objetivos = np.concatenate([
+        numeros[posiciones[:, 0]] + numeros[posiciones[:, 1]],
+        aleatorio.integers(-2 * rango, 2 * rango, size=cantidad_objetivos - con_solucion, dtype=np.int64),
+    ])
+    aleatorio.shuffle(objetivos)
+    return numeros, objetivos
+
+
+def medir(tamano, argumentos):
+    numeros, objetivos = generar_caso(tamano, argumentos.objetivos, argumentos.rango, argumentos.semilla)
+    lista = numeros.tolist()
+
+    inicio = time.perf_counter()
+    motor = MotorSumas(numeros)
+    preparar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    pares = motor.pares(objetivos)
+    lote = time.perf_counter() - inicio
+
+    muestra = objetivos[:argumentos.muestra].tolist()
+    inicio = time.perf_counter()
+    esperados = [encontrar_indices1(lista, objetivo) for objetivo in muestra]
+    original = (time.perf_counter() - inicio) / max(len(muestra), 1)
+
+    for objetivo, esperado, par in zip(muestra, esperados, pares):
+        obtenido = (int(par[0]), int(par[1])) if par[1] >= 0 else None
+        if obtenido != esperado:
+            raise AssertionError(f"objetivo {objetivo}: MotorSumas {obtenido} != encontrar_indices1 {esperado}")
+
+    por_objetivo = lote / len(objetivos)
+    print(f"n={tamano:>10,}  objetivos={len(objetivos)}  con par={int((pares[:, 1] >= 0).sum())}")
+    print(f"  encontrar_indices1      {original * 1000:>10.2f} ms por objetivo (muestra de {len(muestra)})")
+    print(f"  MotorSumas preparar     {preparar * 1000:>10.2f} ms una vez")
+    print(f"  MotorSumas pares()      {por_objetivo * 1000:>10.2f} ms por objetivo ({lote:.2f} s el lote)")
+    amortizacion = (f"preparar se amortiza desde {preparar / (original - por_objetivo):.0f} objetivos"
+                    if original > por_objetivo else "preparar no se amortiza")
+    print(f"  aceleración por objetivo {original / por_objetivo:>8.1f}x; {amortizacion}")
+
+    inicio = time.perf_counter()
+    todos = motor.todos_los_pares(int(objetivos[0]))
+    print(f"  todos_los_pares()       {(time.perf_counter() - inicio) * 1000:>10.2f} ms ({len(todos)} pares)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de pares por lotes")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--objetivos", type=int, default=1000)
+    parser.add_argument("--muestra", type=int, default=20, help="Objetivos medidos con encontrar_indices1")
+    parser.add_argument("--rango", type=int, default=10**9, help="Los números se eligen en [-rango, rango)")
+    parser.add_argument("--semilla", type=int, default=7)
+    argumentos = parser.parse_args()
+    for tamano in argumentos.tamanos:
+        medir(tamano, argumentos)
+
+
+if __name__ == "__main__":
+    main()
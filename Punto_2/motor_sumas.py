@@ -0,0 +1,184 @@
+#Motor para responder muchas sumas buscadas sobre la misma lista de enteros.
+#La lista se preprocesa una sola vez (orden con argsort y primera/segunda
+#aparición de cada valor) y los objetivos se resuelven por lotes con NumPy,
+#en lugar de construir un diccionario nuevo en cada llamada.
+#Requiere numpy.
+
+import numpy as np
+
+
+SIN_INDICE = np.iinfo(np.int64).max
+# Elementos por bloque (objetivos x valores) para acotar la memoria temporal
+ELEMENTOS_POR_BLOQUE = 1 << 21
+PREFIJO_INICIAL = 1 << 10
+# Hasta este límite cada nivel busca en un arreglo propio con los valores ya vistos,
+# pequeño y en caché; por encima se busca en el arreglo completo de valores
+PREFIJO_LOCAL_MAXIMO = 1 << 20
+
+
+class MotorSumas:
+    """Índice de una lista de enteros para buscar pares con una suma dada.
+
+    pares() devuelve para cada objetivo el mismo par que encontrar_indices1:
+    el de menor segundo índice j y, para ese j, el último índice i < j cuyo
+    valor completa la suma.
+    """
+
+    def __init__(self, numeros, prefijo_inicial=PREFIJO_INICIAL):
+        self.numeros = np.asarray(numeros, dtype=np.int64)
+        self.cantidad = len(self.numeros)
+
+        # Posiciones ordenadas por (valor, índice); argsort estable conserva el orden de aparición
+        self.orden = np.argsort(self.numeros, kind="stable")
+        valores_ordenados = self.numeros[self.orden]
+        # Los valores ya están ordenados: cada cambio marca el inicio de un valor distinto
+        self.inicio = np.flatnonzero(np.diff(valores_ordenados, prepend=valores_ordenados[:1] - 1)) \
+            if self.cantidad else np.empty(0, dtype=np.int64)
+        self.valores = valores_ordenados[self.inicio]
+        self.cuenta = np.diff(self.inicio, append=self.cantidad)
+        self.primera = self.orden[self.inicio]
+        self.segunda = np.full(len(self.valores), SIN_INDICE, dtype=np.int64)
+        repetidos = self.cuenta > 1
+        self.segunda[repetidos] = self.orden[self.inicio[repetidos] + 1]
+
+        # Clave (rango del valor, índice) creciente a lo largo de self.orden, para ubicar
+        # la última aparición de un valor antes de una posición con una sola búsqueda
+        rangos = np.repeat(np.arange(len(self.valores), dtype=np.int64), self.cuenta)
+        self.claves = rangos * max(self.cantidad, 1) + self.orden
+
+        # Centinela al final de los valores: ningún faltante lo iguala
+        self.valores_centinela = np.append(self.valores, SIN_INDICE)
+        self.niveles = self._preparar_niveles(prefijo_inicial)
+
+    def _preparar_niveles(self, prefijo_inicial):
+        # El nivel con límite L agrupa los valores cuya primera o segunda aparición cae en
+        # [L anterior, L). Un par cuyo segundo índice j está en ese rango tiene allí al valor
+        # más reciente, así que cada nivel solo consulta los valores nuevos y los objetivos
+        # con una solución temprana se resuelven sin recorrer toda la lista
+        niveles = []
+        anterior, limite = 0, prefijo_inicial
+        while anterior < self.cantidad:
+            limite = min(limite, self.cantidad)
+            nuevos = ((self.primera >= anterior) & (self.primera < limite)) | \
+                ((self.segunda >= anterior) & (self.segunda < limite))
+            vistos = None
+            if limite <= PREFIJO_LOCAL_MAXIMO and limite < self.cantidad:
+                vistos = np.nonzero(self.primera < limite)[0]
+            niveles.append((limite, np.nonzero(nuevos)[0], vistos))
+            anterior, limite = limite, limite * 2
+        return niveles
+
+    def _menor_segundo_indice(self, objetivos, consultas, limite, vistos=None):
+        """Para cada objetivo, el menor j < limite de un par con un valor de consultas (SIN_INDICE si no hay).
+
+        vistos son los índices (en self.valores) de los valores ya aparecidos antes de limite;
+        si se indican, los faltantes se buscan solo entre ellos.
+        """
+        resultado = np.full(len(objetivos), SIN_INDICE, dtype=np.int64)
+        if len(consultas) == 0:
+            return resultado
+        if vistos is None:
+            valores = self.valores_centinela
+        else:
+            valores = np.append(self.valores[vistos], SIN_INDICE)
+
+        tramo_valores = min(len(consultas), ELEMENTOS_POR_BLOQUE)
+        tramo_objetivos = max(1, ELEMENTOS_POR_BLOQUE // tramo_valores)
+        for desde_objetivo in range(0, len(objetivos), tramo_objetivos):
+            bloque_objetivos = objetivos[desde_objetivo:desde_objetivo + tramo_objetivos, None]
+            for desde_valor in range(0, len(consultas), tramo_valores):
+                propias = consultas[desde_valor:desde_valor + tramo_valores]
+                faltantes = bloque_objetivos - self.valores[propias]
+                # El centinela hace válida la posición len(valores) sin recortar
+                posiciones = np.searchsorted(valores, faltantes)
+                filas, columnas = np.nonzero(valores[posiciones] == faltantes)
+                if len(filas) == 0:
+                    continue
+                # Solo se evalúan las coincidencias, que son pocas frente a los valores revisados.
+                # Valores distintos: el par aparece cuando aparece el segundo de los dos.
+                # Mismo valor: hace falta su segunda aparición
+                propia, otra = propias[columnas], posiciones[filas, columnas]
+                if vistos is not None:
+                    otra = vistos[otra]
+                candidatos = np.where(
+                    propia == otra, self.segunda[propia], np.maximum(self.primera[propia], self.primera[otra])
+                )
+                validos = candidatos < limite
+                np.minimum.at(resultado, desde_objetivo + filas[validos], candidatos[validos])
+        return resultado
+
+    def _ultimo_indice_antes(self, valores_buscados, posiciones):
+        """Última aparición de cada valor antes de la posición correspondiente (el valor debe existir)"""
+        rangos = np.searchsorted(self.valores, valores_buscados)
+        ubicacion = np.searchsorted(self.claves, rangos * max(self.cantidad, 1) + posiciones) - 1
+        return self.orden[ubicacion]
+
+    def pares(self, objetivos):
+        """Primer par de índices para cada objetivo, como arreglo (k, 2); -1 si no hay par"""
+        objetivos = np.asarray(objetivos, dtype=np.int64).reshape(-1)
+        segundos = np.full(len(objetivos), SIN_INDICE, dtype=np.int64)
+        pendientes = np.arange(len(objetivos))
+        for limite, consultas, vistos in self.niveles:
+            if len(pendientes) == 0:
+                break
+            encontrados = self._menor_segundo_indice(objetivos[pendientes], consultas, limite, vistos)
+            resueltos = encontrados != SIN_INDICE
+            segundos[pendientes[resueltos]] = encontrados[resueltos]
+            pendientes = pendientes[~resueltos]
+
+        resultado = np.full((len(objetivos), 2), -1, dtype=np.int64)
+        con_par = segundos != SIN_INDICE
+        j = segundos[con_par]
+        resultado[con_par, 0] = self._ultimo_indice_antes(objetivos[con_par] - self.numeros[j], j)
+        resultado[con_par, 1] = j
+        return resultado
+
+    def buscar(self, suma_buscada):
+        """Mismo resultado que encontrar_indices1(numeros, suma_buscada): tupla (i, j) o None"""
+        i, j = self.pares([suma_buscada])[0]
+        return (int(i), int(j)) if j >= 0 else None
+
+    def todos_los_pares(self, suma_buscada):
+        """Todos los pares (i, j) con i < j que suman el objetivo, ordenados por j y luego i.
+
+        La cantidad de pares puede crecer con el cuadrado de los valores repetidos.
+        """
+        if self.cantidad == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        faltantes = suma_buscada - self.valores
+        posiciones = np.minimum(np.searchsorted(self.valores, faltantes), len(self.valores) - 1)
+        existe = (self.valores[posiciones] == faltantes) & (self.valores < faltantes)
+        propios, otros = np.nonzero(existe)[0], posiciones[existe]
+
+        # Producto de las apariciones de cada par de valores distintos
+        cuenta_propios, cuenta_otros = self.cuenta[propios], self.cuenta[otros]
+        por_par = cuenta_propios * cuenta_otros
+        desplazamiento = np.arange(por_par.sum()) - np.repeat(np.cumsum(por_par) - por_par, por_par)
+        repetir_otros = np.repeat(cuenta_otros, por_par)
+        primeros = self.orden[np.repeat(self.inicio[propios], por_par) + desplazamiento // repetir_otros]
+        segundos = self.orden[np.repeat(self.inicio[otros], por_par) + desplazamiento % repetir_otros]
+        bloques = [np.stack([np.minimum(primeros, segundos), np.maximum(primeros, segundos)], axis=1)]
+
+        # Un mismo valor que sumado consigo mismo da el objetivo: combinaciones de sus apariciones
+        if suma_buscada % 2 == 0:
+            mitad = np.searchsorted(self.valores, suma_buscada // 2)
+            if mitad < len(self.valores) and self.valores[mitad] == suma_buscada // 2 and self.cuenta[mitad] > 1:
+                apariciones = self.orden[self.inicio[mitad]:self.inicio[mitad] + self.cuenta[mitad]]
+                i, j = np.triu_indices(len(apariciones), 1)
+                bloques.append(np.stack([apariciones[i], apariciones[j]], axis=1))
+
+        pares = np.concatenate(bloques)
+        return pares[np.lexsort((pares[:, 0], pares[:, 1]))]
+
+
+if __name__ == "__main__":
+    numeros = [2, 7, 11, 15, 3, 6, 9, 4, 5, 8, 10, 12, 14, 13, 1]
+    motor = MotorSumas(numeros)
+    print(motor.buscar(14))
+    print(motor.pares([14, 9, 100]).tolist())
+    print(motor.todos_los_pares(14).tolist())
+
+#salida esperada:
+# (2, 4)
+# [[2, 4], [0, 1], [-1, -1]]
+# [[2, 4], [6, 8], [5, 9], [7, 10], [0, 11], [13, 14]]
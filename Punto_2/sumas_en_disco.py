@@ -0,0 +1,237 @@
+#Búsqueda del primer par que suma un objetivo en archivos binarios de enteros
+#(int32 o int64, sin encabezado) que no caben en memoria como listas de Python.
+#
+#El archivo se lee con numpy.memmap por tramos y en dos pasadas con un pool de procesos:
+#  1. Cada proceso recorre un rango del archivo y reparte (valor, índice) en cubetas
+#     en disco según min(valor, objetivo - valor), de modo que los dos valores de
+#     cualquier par quedan en la misma cubeta.
+#  2. Cada cubeta cabe en memoria y se resuelve agrupando por esa clave; el par con
+#     menor segundo índice entre todas las cubetas es el mismo que da encontrar_indices1.
+#Antes de repartir se revisa en memoria un prefijo del archivo: si el par aparece
+#allí (con MotorSumas) la respuesta ya es exacta y no se recorre el resto.
+#
+#Uso:
+#    python sumas_en_disco.py generar datos.bin --cantidad 100000000 --tipo int32
+#    python sumas_en_disco.py buscar datos.bin 12345 --tipo int32 --procesos 4
+
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from motor_sumas import MotorSumas
+
+
+TIPOS = {"int32": np.int32, "int64": np.int64}
+ELEMENTOS_POR_TRAMO = 1 << 22
+PREFIJO_EN_MEMORIA = 1 << 20
+MEMORIA_POR_CUBETA = 256 * 1024 * 1024
+# Multiplicador de Fibonacci para repartir las claves en cubetas de forma pareja
+MULTIPLICADOR_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def abrir(ruta, tipo, desde=0, hasta=None):
+    """Vista de solo lectura de los elementos [desde, hasta) del archivo"""
+    tipo = np.dtype(TIPOS[tipo])
+    if hasta is None:
+        hasta = os.path.getsize(ruta) // tipo.itemsize
+    if hasta <= desde:
+        # np.memmap no admite un rango vacío ("cannot mmap an empty file")
+        return np.empty(0, dtype=tipo)
+    return np.memmap(ruta, dtype=tipo, mode="r", offset=desde * tipo.itemsize, shape=(hasta - desde,))
+
+
+def ruta_cubeta(directorio, cubeta, proceso, parte):
+    return os.path.join(directorio, f"cubeta{cubeta:05d}_{proceso:04d}.{parte}")
+
+
+def cubetas_de(valores, objetivo, bits):
+    """Cubeta de cada valor según la clave del par {valor, objetivo - valor}.
+
+    Con 16 bits o menos se devuelven como uint16, que argsort estable ordena por radix.
+    """
+    tipo = np.uint16 if bits <= 16 else np.int64
+    if not bits:
+        return np.zeros(len(valores), dtype=tipo)
+    claves = np.minimum(valores, objetivo - valores).view(np.uint64)
+    return ((claves * MULTIPLICADOR_HASH) >> np.uint64(64 - bits)).astype(tipo)
+
+
+def particionar(ruta, tipo, desde, hasta, objetivo, bits, directorio, proceso):
+    """Reparte los elementos [desde, hasta) del archivo en las cubetas de este proceso.
+
+    Los tramos se recorren en orden y el reparto es estable, así que dentro de cada
+    archivo de cubeta los índices quedan crecientes.
+    """
+    for inicio in range(desde, hasta, ELEMENTOS_POR_TRAMO):
+        fin = min(inicio + ELEMENTOS_POR_TRAMO, hasta)
+        # Un mapa por tramo: al liberarlo sus páginas dejan de contar en la memoria residente
+        valores = np.array(abrir(ruta, tipo, inicio, fin), dtype=np.int64)
+        cubetas = cubetas_de(valores, objetivo, bits)
+        orden = np.argsort(cubetas, kind="stable")
+        limites = np.flatnonzero(np.diff(cubetas[orden])) + 1
+        for tramo in np.split(orden, limites):
+            if len(tramo) == 0:
+                continue
+            # Se abre y cierra por tramo para no mantener dos archivos abiertos por cubeta
+            cubeta = int(cubetas[tramo[0]])
+            with open(ruta_cubeta(directorio, cubeta, proceso, "valores"), "ab") as archivo:
+                valores[tramo].tofile(archivo)
+            with open(ruta_cubeta(directorio, cubeta, proceso, "indices"), "ab") as archivo:
+                (tramo + inicio).astype(np.int64).tofile(archivo)
+    return hasta - desde
+
+
+def primer_par_agrupado(valores, objetivo):
+    """Primer par (i, j) en posiciones de valores, o None.
+
+    Agrupa por la clave min(valor, objetivo - valor): en cada grupo el par aparece cuando
+    ya apareció un valor de cada lado, así que j es el mayor de los dos primeros índices.
+    """
+    if len(valores) == 0:
+        return None
+    complementos = objetivo - valores
+    claves = np.minimum(valores, complementos)
+    orden = np.argsort(claves)
+    inicios = np.flatnonzero(np.diff(claves[orden], prepend=claves[orden[:1]] - 1))
+    # Solo interesa el primer índice de cada lado, así que no hace falta un orden estable
+    sin_indice = len(valores)
+    bajo = np.minimum.reduceat(np.where(valores[orden] < complementos[orden], orden, sin_indice), inicios)
+    alto = np.minimum.reduceat(np.where(valores[orden] > complementos[orden], orden, sin_indice), inicios)
+    candidatos = np.maximum(bajo, alto)
+    j = int(candidatos.min()) if len(candidatos) else sin_indice
+
+    # Un valor que sumado consigo mismo da el objetivo necesita su segunda aparición
+    mitades = np.flatnonzero(valores == complementos)
+    if len(mitades) > 1:
+        j = min(j, int(mitades[1]))
+    if j == sin_indice:
+        return None
+    anteriores = np.flatnonzero(valores[:j] == complementos[j])
+    return int(anteriores[-1]), j
+
+
+def resolver_cubeta(directorio, cubeta, procesos, objetivo):
+    """Primer par (i, j) dentro de la cubeta, en índices del archivo, o None"""
+    valores, indices = [], []
+    # Los rangos de los procesos son consecutivos: concatenar en orden de proceso mantiene el orden del archivo
+    for proceso in range(procesos):
+        ruta_valores = ruta_cubeta(directorio, cubeta, proceso, "valores")
+        if os.path.exists(ruta_valores):
+            valores.append(np.fromfile(ruta_valores, dtype=np.int64))
+            indices.append(np.fromfile(ruta_cubeta(directorio, cubeta, proceso, "indices"), dtype=np.int64))
+    if not valores:
+        return None
+    par = primer_par_agrupado(np.concatenate(valores), objetivo)
+    indices = np.concatenate(indices)
+    return (int(indices[par[0]]), int(indices[par[1]])) if par else None
+
+
+def buscar_en_archivo(ruta, objetivo, tipo="int64", procesos=None, directorio=None,
+                      memoria_por_cubeta=MEMORIA_POR_CUBETA, prefijo=PREFIJO_EN_MEMORIA):
+    """Mismo resultado que encontrar_indices1 sobre los enteros del archivo: tupla (i, j) o None"""
+    procesos = procesos or os.cpu_count()
+    if os.path.getsize(ruta) // np.dtype(TIPOS[tipo]).itemsize == 0:
+        # Sin elementos no hay par, como encontrar_indices1([])
+        return None
+    datos = abrir(ruta, tipo)
+    cantidad = len(datos)
+
+    # Un par con j dentro del prefijo es el primero del archivo
+    par = MotorSumas(np.asarray(datos[:prefijo], dtype=np.int64)).buscar(objetivo)
+    if par or cantidad <= prefijo:
+        return par
+
+    # Cada elemento ocupa 16 bytes en su cubeta (valor e índice) y resolverla necesita varias veces eso
+    cubetas_necesarias = max(procesos, -(-cantidad * 16 * 6 // memoria_por_cubeta))
+    bits = int(np.ceil(np.log2(cubetas_necesarias)))
+    rangos = np.linspace(0, cantidad, procesos + 1, dtype=np.int64)
+
+    temporal = tempfile.mkdtemp(prefix="sumas_", dir=directorio)
+    try:
+        with ProcessPoolExecutor(procesos) as pool:
+            list(pool.map(
+                particionar, [ruta] * procesos, [tipo] * procesos, rangos[:-1].tolist(), rangos[1:].tolist(),
+                [objetivo] * procesos, [bits] * procesos, [temporal] * procesos, range(procesos),
+            ))
+            total_cubetas = 1 << bits
+            pares = pool.map(
+                resolver_cubeta, [temporal] * total_cubetas, range(total_cubetas),
+                [procesos] * total_cubetas, [objetivo] * total_cubetas,
+            )
+            encontrados = [par for par in pares if par]
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return min(encontrados, key=lambda par: par[1]) if encontrados else None
+
+
+def generar(ruta, cantidad, tipo, rango, semilla):
+    """Escribe enteros al azar en [-rango, rango) por tramos, sin tenerlos todos en memoria"""
+    aleatorio = np.random.default_rng(semilla)
+    with open(ruta, "wb") as archivo:
+        for inicio in range(0, cantidad, ELEMENTOS_POR_TRAMO):
+            tramo = min(ELEMENTOS_POR_TRAMO, cantidad - inicio)
+            aleatorio.integers(-rango, rango, size=tramo, dtype=TIPOS[tipo]).tofile(archivo)
+
+
+def memoria_maxima_mb():
+    """Pico de memoria residente del proceso principal y del mayor proceso hijo (Linux: ru_maxrss en KB)"""
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return propio, hijos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Primer par que suma un objetivo en un archivo binario de enteros")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    generar_parser = subcomandos.add_parser("generar", help="Crea un archivo de prueba")
+    generar_parser.add_argument("ruta")
+    generar_parser.add_argument("--cantidad", type=int, default=100_000_000)
+    generar_parser.add_argument("--tipo", choices=TIPOS, default="int32")
+    generar_parser.add_argument("--rango", type=int, default=2**31 - 1)
+    generar_parser.add_argument("--semilla", type=int, default=7)
+
+    buscar_parser = subcomandos.add_parser("buscar", help="Busca el primer par que suma el objetivo")
+    buscar_parser.add_argument("ruta")
+    buscar_parser.add_argument("objetivo", type=int)
+    buscar_parser.add_argument("--tipo", choices=TIPOS, default="int32")
+    buscar_parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    buscar_parser.add_argument("--memoria-cubeta", type=int, default=MEMORIA_POR_CUBETA // 2**20, help="MB por cubeta")
+    buscar_parser.add_argument("--prefijo", type=int, default=PREFIJO_EN_MEMORIA,
+                               help="Elementos revisados en memoria antes de repartir en cubetas")
+    buscar_parser.add_argument("--temporal", help="Directorio para las cubetas (por defecto el temporal del sistema)")
+    buscar_parser.add_argument("--verificar", action="store_true", help="Compara con encontrar_indices1 (archivos pequeños)")
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "generar":
+        generar(argumentos.ruta, argumentos.cantidad, argumentos.tipo, argumentos.rango, argumentos.semilla)
+        return
+
+    inicio = time.perf_counter()
+    par = buscar_en_archivo(
+        argumentos.ruta, argumentos.objetivo, argumentos.tipo, argumentos.procesos,
+        argumentos.temporal, argumentos.memoria_cubeta * 2**20, argumentos.prefijo,
+    )
+    segundos = time.perf_counter() - inicio
+    cantidad = len(abrir(argumentos.ruta, argumentos.tipo))
+    propio, hijos = memoria_maxima_mb()
+
+    print(f"Par: {par}" + (" (resuelto en el prefijo en memoria)" if par and par[1] < argumentos.prefijo else ""))
+    print(f"Elementos: {cantidad:,} ({os.path.getsize(argumentos.ruta) / 2**20:,.0f} MB) en {segundos:.2f} s")
+    print(f"Rendimiento: {cantidad / segundos / 1e6:,.1f} M elementos/s, "
+          f"{os.path.getsize(argumentos.ruta) / segundos / 2**20:,.0f} MB/s")
+    print(f"Memoria residente máxima: {propio:,.0f} MB proceso principal, {hijos:,.0f} MB mayor proceso hijo")
+
+    if argumentos.verificar:
+        from segundo import encontrar_indices1
+
+        esperado = encontrar_indices1(abrir(argumentos.ruta, argumentos.tipo).tolist(), argumentos.objetivo)
+        print(f"encontrar_indices1: {esperado} ({'coincide' if esperado == par else 'NO coincide'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Mide el arranque en frío de la API: importación, construcción de la app y primera respuesta.
+
+Cada medición corre en un proceso nuevo de Python, como un worker recién creado:
+  - importar: import backend.main (no debe tocar la base ni cargar los routers)
+  - crear_app: crear_app(), que importa routers, modelos y el motor
+  - primera_respuesta: uvicorn con --workers hasta responder GET /metrics en todos ellos
+Se compara el arranque con el esquema ya migrado (solo se comprueba la versión) frente
+a migrar en cada arranque (BIBLIOTECA_MIGRAR_AL_INICIAR=1, create_all + migraciones).
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_arranque --repeticiones 5 --workers 4
+    python -m backend.benchmarks.bench_arranque --detalle   # módulos más lentos de importar
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+
+MEDIR_IMPORTACION = """
+import json, time
+inicio = time.perf_counter()
+import backend.main
+importado = time.perf_counter()
+backend.main.crear_app()
+creada = time.perf_counter()
+print(json.dumps({"importar_ms": (importado - inicio) * 1000, "crear_app_ms": (creada - importado) * 1000}))
+"""
+
+
+def medir_importacion(entorno: dict) -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", MEDIR_IMPORTACION], env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout)
+
+
+def medir_primera_respuesta(entorno: dict, workers: int, puerto: int) -> float:
+    """Milisegundos desde lanzar uvicorn hasta que todos los workers iniciaron y el servidor respondió"""
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(puerto),
+         "--workers", str(workers), "--log-level", "info", "--no-access-log"],
+        env=entorno, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        # Cada worker registra "Application startup complete" al terminar su ciclo de vida de inicio
+        iniciados = 0
+        for linea in servidor.stderr:
+            if "Application startup failed" in linea:
+                raise RuntimeError("uvicorn no pudo iniciar: " + linea.strip())
+            if "Application startup complete" in linea:
+                iniciados += 1
+                if iniciados == workers:
+                    break
+        else:
+            raise RuntimeError("uvicorn terminó antes de iniciar")
+        httpx.get(f"http://127.0.0.1:{puerto}/metrics", timeout=30).raise_for_status()
+        return (time.perf_counter() - inicio) * 1000
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def detalle_importacion(entorno: dict, cantidad: int = 15):
+    """Imprime los módulos con mayor tiempo acumulado según python -X importtime"""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main; backend.main.crear_app()"],
+        env=entorno, capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        # La sangría indica la profundidad: se muestran los módulos importados directamente y sus hijos
+        profundidad = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        if profundidad <= 1:
+            modulos.append((int(acumulado), nombre.strip()))
+    print("\nMódulos más lentos de importar (ms acumulados, dos primeros niveles):")
+    for microsegundos, nombre in sorted(modulos, reverse=True)[:cantidad]:
+        print(f"  {microsegundos / 1000:>8.1f}  {nombre}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--puerto", type=int, default=8767)
+    parser.add_argument("--detalle", action="store_true", help="Muestra los módulos más lentos de importar")
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno_base = dict(os.environ, BIBLIOTECA_URL_BD=f"sqlite:///{os.path.join(directorio, 'arranque.db')}")
+        subprocess.run(
+            [sys.executable, "-m", "backend.cli", "migrar"], env=entorno_base, check=True, stdout=subprocess.DEVNULL
+        )
+
+        escenarios = [
+            ("esquema migrado", dict(entorno_base, BIBLIOTECA_MIGRAR_AL_INICIAR="0")),
+            ("migrar al iniciar", dict(entorno_base, BIBLIOTECA_MIGRAR_AL_INICIAR="1")),
+        ]
+        print(f"Mediana de {argumentos.repeticiones} arranques, uvicorn con {argumentos.workers} workers")
+        print(f"{'escenario':<20} {'importar':>10} {'crear_app':>10} {'primera_respuesta':>18}")
+        for nombre, entorno in escenarios:
+            importaciones = [medir_importacion(entorno) for _ in range(argumentos.repeticiones)]
+            respuestas = [
+                medir_primera_respuesta(entorno, argumentos.workers, argumentos.puerto)
+                for _ in range(argumentos.repeticiones)
+            ]
+            importar = statistics.median(medida["importar_ms"] for medida in importaciones)
+            crear_app = statistics.median(medida["crear_app_ms"] for medida in importaciones)
+            print(f"{nombre:<20} {importar:>7.1f} ms {crear_app:>7.1f} ms {statistics.median(respuestas):>15.1f} ms")
+
+        if argumentos.detalle:
+            detalle_importacion(entorno_base)
+
+
+if __name__ == "__main__":
+    main()
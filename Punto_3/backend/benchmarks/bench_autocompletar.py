@@ -0,0 +1,103 @@
+"""Mide la latencia del autocompletado de títulos y autores con el índice de prefijos frente a LIKE.
+
+Los prefijos (de 1 a 6 letras) se toman de títulos y autores sembrados, con y
+sin acentos ni mayúsculas, y se consultan en todo el catálogo y por biblioteca.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_autocompletar --libros 1000000 --consultas 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..database.models import Libro
+from ..repositories.autocompletado_repository import AutocompletadoLibros
+from .datos_sinteticos import sembrar_libros
+
+
+def percentil(valores: list, porcentaje: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * porcentaje / 100))]
+
+
+def generar_consultas(sesion, cantidad: int, libros: int, bibliotecas: int, semilla: int) -> list:
+    """(prefijo, codigo_biblioteca o None) a partir de una muestra de libros sembrados"""
+    aleatorio = random.Random(semilla)
+    # sembrar_libros numera los códigos como LIB-00000000, LIB-00000001, ...
+    muestra = sesion.execute(
+        select(Libro.titulo_obra, Libro.autor_principal).where(Libro.codigo_libro.in_(
+            [f"LIB-{aleatorio.randrange(libros):08d}" for _ in range(cantidad)]
+        ))
+    ).all()
+    consultas = []
+    for numero in range(cantidad):
+        titulo, autor = muestra[numero % len(muestra)]
+        texto = aleatorio.choice([titulo, autor])
+        prefijo = texto[:aleatorio.randint(1, 6)]
+        if aleatorio.random() < 0.5:
+            prefijo = AutocompletadoLibros.normalizar(prefijo)
+        consultas.append((prefijo, aleatorio.randint(1, bibliotecas) if numero % 2 else None))
+    return consultas
+
+
+def medir(funcion, consultas: list, limite: int) -> dict:
+    tiempos = []
+    for prefijo, codigo_biblioteca in consultas:
+        inicio = time.perf_counter()
+        funcion(prefijo, codigo_biblioteca, limite)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "p50_ms": round(percentil(tiempos, 50), 3),
+        "p99_ms": round(percentil(tiempos, 99), 3),
+        "max_ms": round(max(tiempos), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=1000000)
+    parser.add_argument("--bibliotecas", type=int, default=10)
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--consultas-like", type=int, default=40, help="LIKE recorre la tabla: menos repeticiones")
+    parser.add_argument("--limite", type=int, default=10)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        motor = create_engine(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        inicio = time.perf_counter()
+        sembrar_libros(motor, argumentos.libros, argumentos.bibliotecas)
+        print(f"{argumentos.libros} libros sembrados en {time.perf_counter() - inicio:.1f} s")
+        CrearSesion = sessionmaker(bind=motor)
+
+        with CrearSesion() as sesion:
+            consultas = generar_consultas(
+                sesion, argumentos.consultas, argumentos.libros, argumentos.bibliotecas, 42
+            )
+
+            def indice(prefijo, codigo_biblioteca, limite):
+                return AutocompletadoLibros.sugerir(sesion, prefijo, codigo_biblioteca, limite)
+
+            def like(prefijo, codigo_biblioteca, limite):
+                return AutocompletadoLibros.sugerir_sin_indice(
+                    sesion, AutocompletadoLibros.normalizar(prefijo), codigo_biblioteca, limite
+                )
+
+            # Una pasada de calentamiento para que las páginas de los índices estén en caché
+            medir(indice, consultas[:200], argumentos.limite)
+            for alcance, filtro in (("catálogo", lambda c: c[1] is None), ("por biblioteca", lambda c: c[1] is not None)):
+                seleccion = [consulta for consulta in consultas if filtro(consulta)]
+                print(f"{alcance} ({len(seleccion)} consultas, límite {argumentos.limite}):")
+                print(f"  índice de prefijos {medir(indice, seleccion, argumentos.limite)}")
+                print(f"  LIKE               {medir(like, seleccion[:argumentos.consultas_like], argumentos.limite)}")
+        motor.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compara la búsqueda de libros con LIKE frente al índice FTS5.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_busqueda --libros 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..repositories.busqueda_repository import BuscadorLibros
+from .datos_sinteticos import generar_vocabulario, sembrar_libros
+
+
+CONSULTAS = [
+    {"titulo": "laberinto"},
+    {"titulo": "cancion"},
+    {"titulo": "lab"},
+    {"autor": "marquez", "codigo_biblioteca": 3},
+    {"consulta_libre": "laberinto sombra"},
+]
+
+
+def medir(funcion, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {"mediana_ms": round(statistics.median(tiempos), 3), "max_ms": round(max(tiempos), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        motor = create_engine(f"sqlite:///{os.path.join(directorio, 'bench.db')}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        sembrar_libros(motor, argumentos.libros)
+        CrearSesion = sessionmaker(bind=motor)
+
+        # Palabra de la cola larga del vocabulario: pocos resultados, LIKE recorre toda la tabla
+        palabra_rara = generar_vocabulario(random.Random(42))[5000]
+        consultas = CONSULTAS + [{"titulo": palabra_rara}]
+
+        print(f"{argumentos.libros} libros, {argumentos.repeticiones} repeticiones por consulta")
+        for parametros in consultas:
+            with CrearSesion() as sesion:
+                like = medir(lambda: BuscadorLibros.buscar_sin_indice(sesion, **parametros), argumentos.repeticiones)
+                fts = medir(lambda: BuscadorLibros.buscar(sesion, **parametros), argumentos.repeticiones)
+            print(f"{parametros}: LIKE {like} | FTS5 {fts}")
+        motor.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compara préstamos y devoluciones con y sin escrituras agrupadas: confirmaciones/s frente a latencia.
+
+Cada configuración se mide en un subproceso propio (la opción se lee al importar las
+rutas) con una base nueva y la app en proceso (cliente ASGI). Cada cliente concurrente
+alterna préstamo y devolución sobre un miembro propio. Con synchronous=FULL (por defecto)
+cada confirmación espera al disco, que es el caso que el agrupamiento mejora.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_escrituras_agrupadas --ventanas 0,1,2,5,10 --clientes 64 --segundos 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from sqlalchemy import event
+from .bench_modo_bd import percentil
+
+
+async def generar_carga(clientes: int, segundos: float) -> dict:
+    from ..database.db import motor
+    from ..main import app
+
+    confirmaciones = 0
+
+    @event.listens_for(motor, "commit")
+    def contar_confirmacion(_conexion):
+        nonlocal confirmaciones
+        confirmaciones += 1
+
+    async with app.router.lifespan_context(app):
+        # Un error 500 (por ejemplo "database is locked") cuenta como error en lugar de abortar la medición
+        transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            codigo_biblioteca = (await cliente.post("/biblioteca/", json={"nombre_institucion": "Bench"})).json()["codigo_biblioteca"]
+            await cliente.post("/libros/", json={
+                "codigo_libro": "BENCH", "titulo_obra": "Libro de carga",
+                "codigo_biblioteca": codigo_biblioteca, "cantidad_total": clientes,
+            })
+            miembros = [
+                (await cliente.post("/miembros/", json={
+                    "nombres_completos": f"Cliente {numero}", "documento_identidad": f"BENCH-{numero}",
+                    "codigo_biblioteca": codigo_biblioteca,
+                })).json()["numero_miembro"]
+                for numero in range(clientes)
+            ]
+
+            latencias, errores = [], 0
+            confirmaciones = 0
+            fin = time.perf_counter() + segundos
+
+            async def un_cliente(numero_miembro: int):
+                nonlocal errores
+                while time.perf_counter() < fin:
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.post("/prestamos/", json={"numero_miembro": numero_miembro, "codigo_libro": "BENCH"})
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    if respuesta.status_code != 201:
+                        errores += 1
+                        continue
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.put(f"/prestamos/{respuesta.json()['id_prestamo']}/devolver")
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    if respuesta.status_code != 200:
+                        errores += 1
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(un_cliente(numero) for numero in miembros))
+            duracion = time.perf_counter() - inicio
+
+    return {
+        "operaciones_por_segundo": round(len(latencias) / duracion, 1),
+        "confirmaciones_por_segundo": round(confirmaciones / duracion, 1),
+        "operaciones_por_confirmacion": round(len(latencias) / max(confirmaciones, 1), 1),
+        "p50_ms": round(statistics.median(latencias), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "errores": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ventanas", default="0,1,2,5,10", help="Milisegundos de ventana a medir, separados por comas")
+    parser.add_argument("--lote", type=int, default=128)
+    parser.add_argument("--clientes", type=int, default=64)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--sincronizacion", default="FULL")
+    parser.add_argument("--medir", action="store_true", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.medir:
+        print(json.dumps(asyncio.run(generar_carga(argumentos.clientes, argumentos.segundos))))
+        return
+
+    configuraciones = [("sin agrupar", {"BIBLIOTECA_ESCRITURA_AGRUPADA": "0"})] + [
+        (f"ventana {ventana} ms", {
+            "BIBLIOTECA_ESCRITURA_AGRUPADA": "1",
+            "BIBLIOTECA_ESCRITURA_VENTANA_MS": ventana,
+            "BIBLIOTECA_ESCRITURA_LOTE": str(argumentos.lote),
+        })
+        for ventana in argumentos.ventanas.split(",")
+    ]
+    for nombre, variables in configuraciones:
+        with tempfile.TemporaryDirectory() as directorio:
+            entorno = dict(
+                os.environ, **variables,
+                BIBLIOTECA_URL_BD=f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+                BIBLIOTECA_SQLITE_SINCRONIZACION=argumentos.sincronizacion,
+                BIBLIOTECA_MIGRAR_AL_INICIAR="1",
+                BIBLIOTECA_METRICAS="0",
+            )
+            proceso = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.bench_escrituras_agrupadas", "--medir",
+                 "--clientes", str(argumentos.clientes), "--segundos", str(argumentos.segundos)],
+                env=entorno, capture_output=True, text=True, check=True,
+            )
+            print(f"{nombre}: {proceso.stdout.strip()}")
+
+
+if __name__ == "__main__":
+    main()
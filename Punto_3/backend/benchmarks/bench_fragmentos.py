@@ -0,0 +1,141 @@
+"""Mide préstamos y devoluciones por segundo según el número de fragmentos SQLite.
+
+La configuración se lee al importar el paquete, así que cada número de fragmentos se
+mide en un subproceso propio con BIBLIOTECA_FRAGMENTOS y una base nueva. Cada hilo
+escritor tiene un miembro en cada biblioteca y alterna préstamo y devolución, cada uno
+en su propia transacción, recorriendo las bibliotecas (y con ellas los fragmentos).
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_fragmentos --fragmentos 1,2,4,8 --hilos 16 --segundos 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from ..database.db import CrearSesion, elegir_fragmento, elegir_por_id, fragmentos_de_datos
+from ..database.migraciones import migrar_sistema
+from ..database.models import Biblioteca, Miembro
+from ..models.schemas import PrestamoCrear
+from ..repositories.biblioteca_repository import GestorBiblioteca
+from ..repositories.fragmentos_repository import DirectorioFragmentos
+from ..repositories.importacion_repository import ImportadorCatalogo
+
+
+BIBLIOTECAS = 16
+LIBROS_POR_BIBLIOTECA = 50
+
+
+def sembrar(hilos: int) -> list:
+    """Crea bibliotecas, libros y miembros; devuelve los pares (miembro, libro) de cada hilo"""
+    migrar_sistema()
+    with CrearSesion() as sesion:
+        for codigo in range(1, BIBLIOTECAS + 1):
+            biblioteca = Biblioteca(codigo_biblioteca=codigo, nombre_institucion=f"Biblioteca {codigo}")
+            sesion.add(biblioteca)
+            DirectorioFragmentos.replicar_biblioteca(sesion, biblioteca)
+        sesion.commit()
+
+        ImportadorCatalogo.importar_libros(sesion, (
+            (numero, {"codigo_libro": f"B{codigo}-{numero}", "titulo_obra": f"Libro {numero}",
+                      "codigo_biblioteca": codigo, "cantidad_total": hilos})
+            for codigo in range(1, BIBLIOTECAS + 1) for numero in range(LIBROS_POR_BIBLIOTECA)
+        ))
+        ImportadorCatalogo.importar_miembros(sesion, (
+            (hilo * BIBLIOTECAS + codigo, {"nombres_completos": f"Miembro {hilo}-{codigo}",
+                                           "documento_identidad": f"{hilo}-{codigo}", "codigo_biblioteca": codigo})
+            for hilo in range(hilos) for codigo in range(1, BIBLIOTECAS + 1)
+        ))
+
+        # Los números de miembro dependen del fragmento: se recuperan por documento
+        numeros = {}
+        for fragmento in fragmentos_de_datos():
+            elegir_fragmento(sesion, fragmento)
+            numeros.update(
+                (documento, numero)
+                for numero, documento in sesion.query(Miembro.numero_miembro, Miembro.documento_identidad)
+            )
+    return [
+        [(numeros[f"{hilo}-{codigo}"], f"B{codigo}-{hilo % LIBROS_POR_BIBLIOTECA}") for codigo in range(1, BIBLIOTECAS + 1)]
+        for hilo in range(hilos)
+    ]
+
+
+def medir(hilos: int, segundos: float) -> dict:
+    """Ejecuta la carga de escritura en este proceso y devuelve el resultado"""
+    trabajos = sembrar(hilos)
+    fin = time.perf_counter() + segundos
+    operaciones, errores = [0] * hilos, [0] * hilos
+
+    def escribir(hilo: int):
+        posicion = 0
+        while time.perf_counter() < fin:
+            numero_miembro, codigo_libro = trabajos[hilo][posicion % BIBLIOTECAS]
+            posicion += 1
+            try:
+                with CrearSesion() as sesion:
+                    elegir_por_id(sesion, numero_miembro)
+                    prestamo = GestorBiblioteca.procesar_prestamo(
+                        sesion, PrestamoCrear(numero_miembro=numero_miembro, codigo_libro=codigo_libro)
+                    )
+                with CrearSesion() as sesion:
+                    elegir_por_id(sesion, prestamo.id_prestamo)
+                    GestorBiblioteca.procesar_devolucion(sesion, prestamo.id_prestamo)
+                operaciones[hilo] += 2
+            except (HTTPException, OperationalError):
+                # Rechazos de validación o "database is locked" tras agotar la espera
+                errores[hilo] += 1
+
+    inicio = time.perf_counter()
+    ejecutores = [threading.Thread(target=escribir, args=(hilo,)) for hilo in range(hilos)]
+    for ejecutor in ejecutores:
+        ejecutor.start()
+    for ejecutor in ejecutores:
+        ejecutor.join()
+    duracion = time.perf_counter() - inicio
+    return {
+        "escrituras_por_segundo": round(sum(operaciones) / duracion, 1),
+        "operaciones": sum(operaciones),
+        "errores": sum(errores),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fragmentos", default="1,2,4,8", help="Lista separada por comas; 1 equivale a sin fragmentar")
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--sincronizacion", default="FULL",
+                        help="PRAGMA synchronous de la medición; con FULL cada confirmación espera al disco")
+    parser.add_argument("--medir", action="store_true", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.medir:
+        print(json.dumps(medir(argumentos.hilos, argumentos.segundos)))
+        return
+
+    for fragmentos in (int(valor) for valor in argumentos.fragmentos.split(",")):
+        with tempfile.TemporaryDirectory() as directorio:
+            entorno = dict(
+                os.environ,
+                BIBLIOTECA_URL_BD=f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+                # Un solo fragmento es la base global de siempre
+                BIBLIOTECA_FRAGMENTOS=str(fragmentos if fragmentos > 1 else 0),
+                BIBLIOTECA_SQLITE_SINCRONIZACION=argumentos.sincronizacion,
+                BIBLIOTECA_POOL_TAMANO=str(argumentos.hilos),
+            )
+            proceso = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.bench_fragmentos", "--medir",
+                 "--hilos", str(argumentos.hilos), "--segundos", str(argumentos.segundos)],
+                env=entorno, capture_output=True, text=True, check=True,
+            )
+            print(f"{fragmentos} fragmento(s): {proceso.stdout.strip()}")
+
+
+if __name__ == "__main__":
+    main()
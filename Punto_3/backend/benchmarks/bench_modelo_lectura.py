@@ -0,0 +1,183 @@
+"""Compara las lecturas del catálogo desde la base y desde el modelo de lectura en memoria.
+
+Siembra una base, levanta uvicorn en un subproceso por modo (BIBLIOTECA_MODELO_LECTURA 0 y 1)
+sobre una copia y lanza lecturas concurrentes por ruta: latencia p50/p99, peticiones por
+segundo, tiempo de arranque y memoria residente del servidor. Mide además los bytes por libro
+de tres representaciones de los mismos libros: objetos ORM, tuplas y las columnas del modelo.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_modelo_lectura --libros 100000 --peticiones 3000 --concurrencia 32
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..database.models import Libro
+from ..models.schemas import LibroRespuesta
+from ..services.modelo_lectura import LibrosBiblioteca, POSICION_BIBLIOTECA
+from ..services.serializacion import columnas_respuesta
+from .bench_modo_bd import esperar_servidor, percentil
+from .datos_sinteticos import sembrar_libros
+
+
+BIBLIOTECAS = 10
+RUTAS = {
+    "libro por código": lambda aleatorio, libros: f"/libros/LIB-{aleatorio.randrange(libros):08d}",
+    "libros por código (20)": lambda aleatorio, libros: "/libros/?codigo=" + ",".join(
+        f"LIB-{aleatorio.randrange(libros):08d}" for _ in range(20)
+    ),
+    "libros por biblioteca": lambda aleatorio, libros: (
+        f"/libros/bibliotecas/{aleatorio.randint(1, BIBLIOTECAS)}/libros?limite=50"
+        f"&despues_de=LIB-{aleatorio.randrange(libros):08d}"
+    ),
+    "buscar sin texto": lambda aleatorio, libros: (
+        f"/libros/buscar?codigo_biblioteca={aleatorio.randint(1, BIBLIOTECAS)}&desplazamiento={aleatorio.randrange(500)}"
+    ),
+    "biblioteca": lambda aleatorio, libros: f"/biblioteca/{aleatorio.randint(1, BIBLIOTECAS)}",
+    "bibliotecas": lambda aleatorio, libros: "/biblioteca/",
+}
+
+
+def memoria_residente_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as estado:
+        for linea in estado:
+            if linea.startswith("VmRSS:"):
+                return round(int(linea.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def bytes_por_libro(ruta_bd: str, muestra: int) -> dict:
+    """tracemalloc de los primeros libros cargados como ORM, como tuplas y en columnas"""
+    motor = create_engine(f"sqlite:///{ruta_bd}")
+    columnas = columnas_respuesta(Libro, LibroRespuesta)
+
+    def medir(cargar):
+        gc.collect()
+        tracemalloc.start()
+        with Session(motor) as sesion:
+            cargado = cargar(sesion)
+            actual, _ = tracemalloc.get_traced_memory()
+            # La sesión guarda una referencia a cada objeto ORM: se cuenta, como en una solicitud real
+        tracemalloc.stop()
+        del cargado
+        return round(actual / muestra, 1)
+
+    def columnas_modelo(sesion: Session):
+        filas = [tuple(fila) for fila in sesion.query(*columnas).order_by(Libro.codigo_libro).limit(muestra)]
+        por_biblioteca = {}
+        for fila in filas:
+            por_biblioteca.setdefault(fila[POSICION_BIBLIOTECA], []).append(fila)
+        del filas
+        return [LibrosBiblioteca(codigo, filas_biblioteca) for codigo, filas_biblioteca in por_biblioteca.items()]
+
+    resultado = {
+        "orm": medir(lambda sesion: sesion.query(Libro).order_by(Libro.codigo_libro).limit(muestra).all()),
+        "tuplas": medir(lambda sesion: [
+            tuple(fila) for fila in sesion.query(*columnas).order_by(Libro.codigo_libro).limit(muestra)
+        ]),
+        "columnas": medir(columnas_modelo),
+    }
+    motor.dispose()
+    return resultado
+
+
+async def generar_carga(url_base: str, libros: int, peticiones: int, concurrencia: int) -> dict:
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url_base, limits=limites, timeout=60) as cliente:
+        semaforo = asyncio.Semaphore(concurrencia)
+        aleatorio = random.Random(7)
+        resultados = {}
+        for nombre, construir in RUTAS.items():
+            rutas = [construir(aleatorio, libros) for _ in range(peticiones)]
+            latencias, errores = [], 0
+
+            async def una_peticion(ruta: str):
+                nonlocal errores
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.get(ruta)
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    if respuesta.status_code >= 400:
+                        errores += 1
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(una_peticion(ruta) for ruta in rutas))
+            duracion = time.perf_counter() - inicio
+            resultados[nombre] = {
+                "peticiones_por_segundo": round(peticiones / duracion, 1),
+                "p50_ms": round(statistics.median(latencias), 2),
+                "p99_ms": round(percentil(latencias, 99), 2),
+                "errores": errores,
+            }
+        return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=100000)
+    parser.add_argument("--peticiones", type=int, default=3000, help="Peticiones por ruta")
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--muestra", type=int, default=20000, help="Libros de la comparación de bytes por libro")
+    parser.add_argument("--puerto", type=int, default=8765)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = os.path.join(directorio, "bench.db")
+        motor = create_engine(f"sqlite:///{ruta_bd}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        sembrar_libros(motor, argumentos.libros, BIBLIOTECAS)
+        motor.dispose()
+        print(f"bytes por libro: {bytes_por_libro(ruta_bd, min(argumentos.muestra, argumentos.libros))}")
+
+        for nombre, valor in (("base de datos", "0"), ("modelo de lectura", "1")):
+            ruta_modo = os.path.join(directorio, f"modelo{valor}.db")
+            shutil.copy(ruta_bd, ruta_modo)
+            entorno = dict(
+                os.environ, BIBLIOTECA_URL_BD=f"sqlite:///{ruta_modo}", BIBLIOTECA_MODELO_LECTURA=valor,
+                BIBLIOTECA_METRICAS="0",
+            )
+            inicio = time.perf_counter()
+            servidor = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(argumentos.puerto), "--log-level", "warning"],
+                env=entorno,
+            )
+            try:
+                url_base = f"http://127.0.0.1:{argumentos.puerto}"
+
+                async def medir_modo():
+                    async with httpx.AsyncClient(base_url=url_base, timeout=60) as cliente:
+                        await esperar_servidor(cliente)
+                        arranque = time.perf_counter() - inicio
+                        estadisticas = (await cliente.get("/modelo-lectura/estadisticas")).json()
+                    carga = await generar_carga(url_base, argumentos.libros, argumentos.peticiones, argumentos.concurrencia)
+                    return arranque, estadisticas, carga
+
+                arranque, estadisticas, carga = asyncio.run(medir_modo())
+                print(f"{nombre}: arranque {arranque:.2f} s, memoria residente {memoria_residente_mb(servidor.pid)} MB")
+                if estadisticas["activo"]:
+                    memoria = estadisticas["memoria"]
+                    print(f"  modelo: {estadisticas['libros']} libros, {memoria['bytes_total'] / 2 ** 20:.1f} MB, "
+                          f"{memoria['bytes_por_libro']} bytes por libro")
+                for ruta, resultado in carga.items():
+                    print(f"  {ruta}: {resultado}")
+            finally:
+                servidor.terminate()
+                servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
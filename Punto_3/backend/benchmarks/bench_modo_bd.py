@@ -0,0 +1,113 @@
+"""Compara la API en modo de base de datos sync y async bajo carga concurrente.
+
+Levanta uvicorn en un subproceso por modo sobre la misma base sembrada y lanza
+peticiones concurrentes de lectura (listados y búsqueda).
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_modo_bd --libros 50000 --peticiones 3000 --concurrencia 32
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from sqlalchemy import create_engine
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from .datos_sinteticos import sembrar_libros
+
+
+RUTAS = [
+    "/libros/bibliotecas/{biblioteca}/libros?limite=50",
+    "/libros/buscar?titulo=memoria&codigo_biblioteca={biblioteca}",
+    "/biblioteca/{biblioteca}",
+]
+
+
+def percentil(valores: list, porcentaje: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * porcentaje / 100))]
+
+
+async def esperar_servidor(cliente: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await cliente.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("uvicorn no respondió")
+
+
+async def generar_carga(url_base: str, peticiones: int, concurrencia: int) -> dict:
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url_base, limits=limites, timeout=60) as cliente:
+        await esperar_servidor(cliente)
+        semaforo = asyncio.Semaphore(concurrencia)
+        latencias, errores = [], 0
+
+        async def una_peticion(numero: int):
+            nonlocal errores
+            ruta = RUTAS[numero % len(RUTAS)].format(biblioteca=numero % 10 + 1)
+            async with semaforo:
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(ruta)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code >= 400:
+                    errores += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una_peticion(numero) for numero in range(peticiones)))
+        duracion = time.perf_counter() - inicio
+
+    return {
+        "peticiones_por_segundo": round(peticiones / duracion, 1),
+        "p50_ms": round(statistics.median(latencias), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "errores": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=50000)
+    parser.add_argument("--peticiones", type=int, default=3000)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--puerto", type=int, default=8765)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = os.path.join(directorio, "bench.db")
+        motor = create_engine(f"sqlite:///{ruta_bd}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        sembrar_libros(motor, argumentos.libros)
+        motor.dispose()
+
+        for modo in ("sync", "async"):
+            # Copia por modo para que ambos partan del mismo estado de caché de SQLite
+            ruta_modo = os.path.join(directorio, f"{modo}.db")
+            shutil.copy(ruta_bd, ruta_modo)
+            entorno = dict(os.environ, BIBLIOTECA_URL_BD=f"sqlite:///{ruta_modo}", BIBLIOTECA_MODO_BD=modo)
+            servidor = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(argumentos.puerto), "--log-level", "warning"],
+                env=entorno,
+            )
+            try:
+                resultado = asyncio.run(generar_carga(
+                    f"http://127.0.0.1:{argumentos.puerto}", argumentos.peticiones, argumentos.concurrencia
+                ))
+            finally:
+                servidor.terminate()
+                servidor.wait()
+            print(f"{modo}: {resultado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Mide el reporte de préstamos en streaming: filas por segundo, bytes enviados y memoria del servidor.
+
+Siembra una base, levanta uvicorn en un subproceso y descarga el historial completo en CSV
+y NDJSON, con y sin gzip, más los modos agregados. La memoria es el pico de memoria anónima
+residente del servidor (RssAnon, muestreada durante la descarga: excluye las páginas de la base
+mapeadas con mmap). Como referencia mide en este proceso, con tracemalloc, el pico de cargar
+el mismo detalle de una vez.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_reportes --libros 50000 --miembros 20000 --prestamos 1000000
+"""
+import argparse
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, time as hora, timedelta
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..repositories.reportes_repository import ReportesPrestamos
+from .bench_modo_bd import esperar_servidor
+from .datos_sinteticos import sembrar_libros, sembrar_prestamos
+
+
+# Los préstamos sintéticos se solicitan en el último año
+RANGO = {"desde": str(date.today() - timedelta(days=366)), "hasta": str(date.today())}
+DESCARGAS = {
+    "csv": {"formato": "csv"},
+    "csv gzip": {"formato": "csv", "gzip": True},
+    "ndjson": {"formato": "ndjson"},
+    "ndjson gzip": {"formato": "ndjson", "gzip": True},
+    "por día": {"agrupar": "dia"},
+    "por categoría": {"agrupar": "categoria"},
+    "por miembro": {"agrupar": "miembro"},
+}
+
+
+def memoria_anonima_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as estado:
+        for linea in estado:
+            if linea.startswith("RssAnon:"):
+                return round(int(linea.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def leer_sin_streaming(ruta_bd: str) -> tuple:
+    """Filas del detalle del reporte y pico de tracemalloc, en MB, de leerlas con .all()"""
+    motor = create_engine(f"sqlite:///{ruta_bd}")
+    consulta = ReportesPrestamos.prestamos(
+        datetime.combine(date.fromisoformat(RANGO["desde"]), hora.min),
+        datetime.combine(date.fromisoformat(RANGO["hasta"]) + timedelta(days=1), hora.min),
+    )
+    gc.collect()
+    tracemalloc.start()
+    with Session(motor) as sesion:
+        filas = sesion.execute(consulta).all()
+        _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cantidad = len(filas)
+    del filas
+    motor.dispose()
+    return cantidad, round(pico / 2 ** 20, 1)
+
+
+async def descargar(cliente: httpx.AsyncClient, pid: int, parametros: dict, filas: int) -> dict:
+    """Descarga el reporte tal como llega, sin descomprimirlo, y cuenta los bytes"""
+    opciones = dict(parametros)
+    cabeceras = {"Accept-Encoding": "gzip" if opciones.pop("gzip", False) else "identity"}
+    enviados, pico = 0, memoria_anonima_mb(pid)
+
+    async def muestrear():
+        nonlocal pico
+        while True:
+            pico = max(pico, memoria_anonima_mb(pid))
+            await asyncio.sleep(0.05)
+
+    muestreo = asyncio.create_task(muestrear())
+    inicio = time.perf_counter()
+    async with cliente.stream("GET", "/reportes/prestamos", params={**RANGO, **opciones}, headers=cabeceras) as respuesta:
+        respuesta.raise_for_status()
+        async for datos in respuesta.aiter_raw():
+            enviados += len(datos)
+    duracion = time.perf_counter() - inicio
+    muestreo.cancel()
+    resultado = {"segundos": round(duracion, 2), "mb_enviados": round(enviados / 2 ** 20, 1), "memoria_pico_mb": pico}
+    if "agrupar" not in opciones:
+        resultado["filas_por_segundo"] = round(filas / duracion)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=50000)
+    parser.add_argument("--miembros", type=int, default=20000)
+    parser.add_argument("--prestamos", type=int, default=1000000)
+    parser.add_argument("--puerto", type=int, default=8766)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = os.path.join(directorio, "bench.db")
+        motor = create_engine(f"sqlite:///{ruta_bd}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        print(f"Sembrando {argumentos.libros} libros, {argumentos.miembros} miembros y {argumentos.prestamos} préstamos...")
+        sembrar_libros(motor, argumentos.libros)
+        sembrar_prestamos(motor, argumentos.miembros, argumentos.prestamos)
+        motor.dispose()
+        filas, pico = leer_sin_streaming(ruta_bd)
+        print(f"sin streaming (.all() de {filas} filas de detalle): pico de {pico} MB en Python")
+
+        entorno = dict(os.environ, BIBLIOTECA_URL_BD=f"sqlite:///{ruta_bd}", BIBLIOTECA_METRICAS="0")
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(argumentos.puerto), "--log-level", "warning"],
+            env=entorno,
+        )
+
+        async def medir():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{argumentos.puerto}", timeout=600) as cliente:
+                await esperar_servidor(cliente)
+                print(f"servidor en reposo: {memoria_anonima_mb(servidor.pid)} MB de memoria anónima")
+                for nombre, parametros in DESCARGAS.items():
+                    print(f"  {nombre}: {await descargar(cliente, servidor.pid, parametros, filas)}")
+
+        try:
+            asyncio.run(medir())
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compara la serialización de listados grandes: ORM + Pydantic frente a tuplas de columnas + orjson.
+
+Para cada esquema de respuesta mide, con las mismas filas:
+  - jsonable_encoder: objetos ORM recorridos por jsonable_encoder y json.dumps (rutas sin response_model)
+  - orm_pydantic: objetos ORM validados con el esquema y codificados por Pydantic (response_model)
+  - columnas_orjson: tuplas de columnas convertidas en diccionarios y codificadas con orjson
+y comprueba que los tres producen el mismo JSON.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.bench_serializacion --filas 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..database.models import Libro, Miembro, Prestamo
+from ..models.schemas import LibroRespuesta, MiembroRespuesta, PrestamoRespuesta
+from ..services.serializacion import codificar_json, columnas_respuesta, filas_como_diccionarios, orjson
+from .datos_sinteticos import sembrar_libros, sembrar_prestamos
+
+
+CASOS = [
+    ("libros", Libro, LibroRespuesta, Libro.codigo_libro),
+    ("miembros", Miembro, MiembroRespuesta, Miembro.numero_miembro),
+    ("prestamos", Prestamo, PrestamoRespuesta, Prestamo.id_prestamo),
+]
+
+
+def medir(funcion, repeticiones: int):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=7)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        motor = create_engine(f"sqlite:///{os.path.join(directorio, 'serializacion.db')}")
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        sembrar_libros(motor, argumentos.filas)
+        sembrar_prestamos(motor, argumentos.filas, argumentos.filas)
+        CrearSesion = sessionmaker(bind=motor, autoflush=False)
+
+        print(f"{argumentos.filas} filas por respuesta, mediana de {argumentos.repeticiones} repeticiones "
+              f"(codificador rápido: {'orjson' if orjson else 'json'})")
+        print(f"{'esquema':<10} {'jsonable_encoder':>17} {'orm_pydantic':>13} {'columnas_orjson':>16} {'mejora':>8}")
+        for nombre, modelo, esquema, columna_clave in CASOS:
+            adaptador = TypeAdapter(List[esquema])
+
+            def con_jsonable_encoder():
+                with CrearSesion() as sesion:
+                    objetos = sesion.query(modelo).order_by(columna_clave).limit(argumentos.filas).all()
+                    return json.dumps(jsonable_encoder(objetos)).encode()
+
+            def con_orm_pydantic():
+                with CrearSesion() as sesion:
+                    objetos = sesion.query(modelo).order_by(columna_clave).limit(argumentos.filas).all()
+                    return adaptador.dump_json(adaptador.validate_python(objetos, from_attributes=True))
+
+            def con_columnas():
+                with CrearSesion() as sesion:
+                    filas = sesion.query(*columnas_respuesta(modelo, esquema)) \
+                        .order_by(columna_clave).limit(argumentos.filas).all()
+                    return codificar_json(filas_como_diccionarios(filas, esquema))
+
+            ms_encoder, json_encoder = medir(con_jsonable_encoder, argumentos.repeticiones)
+            ms_pydantic, json_pydantic = medir(con_orm_pydantic, argumentos.repeticiones)
+            ms_columnas, json_columnas = medir(con_columnas, argumentos.repeticiones)
+
+            # jsonable_encoder incluye los atributos internos del ORM; se compara solo sobre los campos del esquema
+            campos = set(esquema.model_fields)
+            esperado = json.loads(json_pydantic)
+            iguales = esperado == json.loads(json_columnas) and esperado == [
+                {campo: valor for campo, valor in fila.items() if campo in campos} for fila in json.loads(json_encoder)
+            ]
+            print(f"{nombre:<10} {ms_encoder:>14.1f} ms {ms_pydantic:>10.1f} ms {ms_columnas:>13.1f} ms "
+                  f"{ms_pydantic / ms_columnas:>7.1f}x {'' if iguales else ' (JSON DISTINTO)'}")
+        motor.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""Prueba de carga reproducible de la API con resultados en JSON.
+
+1. Siembra una base SQLite temporal con N bibliotecas, M miembros, K libros y L
+   préstamos con distribución sesgada (tipo Zipf): pocas bibliotecas, libros y
+   miembros concentran la mayor parte del inventario y la actividad.
+2. Lanza una mezcla fija de solicitudes (lecturas y préstamos con su devolución),
+   eligiendo los parámetros con el mismo sesgo, contra la app de backend/main.py:
+     - asgi: en el mismo proceso con httpx.ASGITransport (sin red ni servidor)
+     - uvicorn: servidor real en un subproceso con --workers
+3. Reporta por endpoint peticiones por segundo, errores y latencia p50/p95/p99
+   como JSON, para comparar ejecuciones entre commits (--comparar).
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.carga_api --salida carga.json
+    python -m backend.benchmarks.carga_api --modo uvicorn --workers 4 --concurrencia 64
+    python -m backend.benchmarks.carga_api --salida nueva.json --comparar carga.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import httpx
+
+
+# (nombre, peso) de cada operación de la mezcla; "prestar y devolver" registra dos endpoints
+MEZCLA = [
+    ("listar bibliotecas", 2),
+    ("obtener biblioteca", 10),
+    ("libros por biblioteca", 15),
+    ("obtener libro", 20),
+    ("buscar texto", 8),
+    ("buscar campos", 5),
+    ("miembros por biblioteca", 8),
+    ("préstamos por miembro", 12),
+    ("préstamos activos por biblioteca", 5),
+    ("préstamos vencidos", 3),
+    ("prestar y devolver", 12),
+]
+
+
+def percentil(valores: list, porcentaje: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * porcentaje / 100))]
+
+
+def sembrar(url: str, argumentos):
+    """Crea el esquema y siembra los datos sesgados en la base indicada"""
+    from ..database.db import ModeloBase, crear_motor
+    from ..database.migraciones import aplicar_migraciones
+    from .datos_sinteticos import sembrar_libros, sembrar_prestamos
+
+    motor = crear_motor(url)
+    ModeloBase.metadata.create_all(bind=motor)
+    aplicar_migraciones(motor)
+    sembrar_libros(motor, argumentos.libros, argumentos.bibliotecas, argumentos.semilla, sesgo=argumentos.sesgo)
+    sembrar_prestamos(motor, argumentos.miembros, argumentos.prestamos, argumentos.semilla, sesgo=argumentos.sesgo)
+    motor.dispose()
+
+
+def preparar_escenario(url: str, argumentos) -> dict:
+    """Identificadores sembrados, ordenados de más a menos populares, y parejas libres para prestar"""
+    from sqlalchemy import select
+    from ..database.db import crear_motor
+    from ..database.models import Biblioteca, Libro, Miembro
+    from .datos_sinteticos import pesos_zipf
+
+    motor = crear_motor(url)
+    with motor.connect() as conexion:
+        bibliotecas = list(conexion.execute(
+            select(Biblioteca.codigo_biblioteca).order_by(Biblioteca.codigo_biblioteca)
+        ).scalars())
+        libros = list(conexion.execute(select(Libro.codigo_libro).order_by(Libro.codigo_libro)).scalars())
+        miembros = list(conexion.execute(select(Miembro.numero_miembro).order_by(Miembro.numero_miembro)).scalars())
+
+        # Cada pareja usa un libro distinto con copias libres (de los menos populares) y un miembro
+        # sin préstamos, para que los préstamos concurrentes no se rechacen entre sí
+        libres = defaultdict(list)
+        for codigo_libro, codigo_biblioteca in conexion.execute(
+            select(Libro.codigo_libro, Libro.codigo_biblioteca)
+            .where(Libro.cantidad_disponible > 0).order_by(Libro.codigo_libro.desc())
+        ):
+            libres[codigo_biblioteca].append(codigo_libro)
+        parejas = []
+        for numero_miembro, codigo_biblioteca in conexion.execute(
+            select(Miembro.numero_miembro, Miembro.codigo_biblioteca)
+            .where(Miembro.cuenta_activa.is_(True), Miembro.prestamos_activos == 0)
+            .order_by(Miembro.numero_miembro.desc())
+        ):
+            if libres[codigo_biblioteca]:
+                parejas.append((numero_miembro, libres[codigo_biblioteca].pop()))
+            if len(parejas) >= argumentos.concurrencia * 2:
+                break
+    motor.dispose()
+
+    return {
+        "bibliotecas": bibliotecas,
+        "libros": libros,
+        "miembros": miembros,
+        "parejas": parejas,
+        "pesos_bibliotecas": pesos_zipf(len(bibliotecas), argumentos.sesgo),
+        "pesos_libros": pesos_zipf(len(libros), argumentos.sesgo),
+        "pesos_miembros": pesos_zipf(len(miembros), argumentos.sesgo),
+    }
+
+
+def solicitud_lectura(nombre: str, escenario: dict, aleatorio: random.Random):
+    """(ruta, parámetros de consulta) de una lectura de la mezcla, con parámetros sesgados"""
+    from .datos_sinteticos import PALABRAS_TITULO, elegir
+
+    biblioteca = elegir(aleatorio, escenario["bibliotecas"], escenario["pesos_bibliotecas"])
+    if nombre == "listar bibliotecas":
+        return "/biblioteca/", {"limite": 50}
+    if nombre == "obtener biblioteca":
+        return f"/biblioteca/{biblioteca}", {}
+    if nombre == "libros por biblioteca":
+        return f"/libros/bibliotecas/{biblioteca}/libros", {"limite": 50}
+    if nombre == "obtener libro":
+        return f"/libros/{elegir(aleatorio, escenario['libros'], escenario['pesos_libros'])}", {}
+    if nombre == "buscar texto":
+        return "/libros/buscar", {"q": aleatorio.choice(PALABRAS_TITULO[:10]), "limite": 20}
+    if nombre == "buscar campos":
+        return "/libros/buscar", {"titulo": aleatorio.choice(PALABRAS_TITULO), "codigo_biblioteca": biblioteca}
+    if nombre == "miembros por biblioteca":
+        return f"/miembros/bibliotecas/{biblioteca}/miembros", {"limite": 50}
+    if nombre == "préstamos por miembro":
+        return f"/prestamos/miembros/{elegir(aleatorio, escenario['miembros'], escenario['pesos_miembros'])}/prestamos", {}
+    if nombre == "préstamos activos por biblioteca":
+        return f"/prestamos/bibliotecas/{biblioteca}/prestamos-activos", {"limite": 50}
+    if nombre == "préstamos vencidos":
+        return "/prestamos/vencidos", {"codigo_biblioteca": biblioteca, "limite": 50}
+    raise ValueError(nombre)
+
+
+async def ejecutar_carga(cliente: httpx.AsyncClient, escenario: dict, argumentos) -> dict:
+    """Lanza la mezcla de operaciones con la concurrencia indicada y resume las latencias por endpoint"""
+    aleatorio = random.Random(argumentos.semilla)
+    nombres, pesos = zip(*MEZCLA)
+    # El plan se fija antes de empezar para que todas las ejecuciones lancen la misma secuencia
+    plan = aleatorio.choices(nombres, weights=pesos, k=argumentos.calentamiento + argumentos.peticiones)
+    parametros = [aleatorio.random() for _ in plan]
+    parejas = asyncio.Queue()
+    for pareja in escenario["parejas"]:
+        parejas.put_nowait(pareja)
+
+    latencias, errores = defaultdict(list), defaultdict(int)
+    semaforo = asyncio.Semaphore(argumentos.concurrencia)
+
+    async def medir(endpoint: str, registrar: bool, metodo: str, ruta: str, **opciones):
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, **opciones)
+            fallo = respuesta.status_code >= 400
+        except httpx.HTTPError:
+            respuesta, fallo = None, True
+        if registrar:
+            latencias[endpoint].append((time.perf_counter() - inicio) * 1000)
+            if fallo:
+                errores[endpoint] += 1
+        return None if fallo else respuesta
+
+    async def operacion(indice: int):
+        nombre = plan[indice]
+        registrar = indice >= argumentos.calentamiento
+        async with semaforo:
+            if nombre != "prestar y devolver":
+                ruta, consulta = solicitud_lectura(nombre, escenario, random.Random(parametros[indice]))
+                await medir(nombre, registrar, "GET", ruta, params=consulta)
+                return
+            numero_miembro, codigo_libro = await parejas.get()
+            try:
+                respuesta = await medir("crear préstamo", registrar, "POST", "/prestamos/",
+                                        json={"numero_miembro": numero_miembro, "codigo_libro": codigo_libro})
+                if respuesta is not None:
+                    await medir("devolver préstamo", registrar, "PUT",
+                                f"/prestamos/{respuesta.json()['id_prestamo']}/devolver")
+            finally:
+                parejas.put_nowait((numero_miembro, codigo_libro))
+
+    await asyncio.gather(*(operacion(indice) for indice in range(argumentos.calentamiento)))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(operacion(indice) for indice in range(argumentos.calentamiento, len(plan))))
+    duracion = time.perf_counter() - inicio
+
+    def resumen(valores: list, fallidas: int) -> dict:
+        return {
+            "peticiones": len(valores),
+            "errores": fallidas,
+            "peticiones_por_segundo": round(len(valores) / duracion, 1),
+            "p50_ms": round(statistics.median(valores), 2),
+            "p95_ms": round(percentil(valores, 95), 2),
+            "p99_ms": round(percentil(valores, 99), 2),
+        }
+
+    todas = [valor for valores in latencias.values() for valor in valores]
+    return {
+        "duracion_s": round(duracion, 3),
+        "total": resumen(todas, sum(errores.values())),
+        "endpoints": {endpoint: resumen(valores, errores[endpoint]) for endpoint, valores in sorted(latencias.items())},
+    }
+
+
+async def carga_asgi(escenario: dict, argumentos) -> dict:
+    from ..main import app
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://asgi", timeout=60) as cliente:
+        return await ejecutar_carga(cliente, escenario, argumentos)
+
+
+async def carga_uvicorn(escenario: dict, argumentos) -> dict:
+    limites = httpx.Limits(max_connections=argumentos.concurrencia, max_keepalive_connections=argumentos.concurrencia)
+    url_base = f"http://127.0.0.1:{argumentos.puerto}"
+    async with httpx.AsyncClient(base_url=url_base, limits=limites, timeout=60) as cliente:
+        for _ in range(300):
+            try:
+                await cliente.get("/docs")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn no respondió")
+        return await ejecutar_carga(cliente, escenario, argumentos)
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior: dict, actual: dict):
+    """Imprime la variación de p95 y de peticiones por segundo respecto de una ejecución anterior"""
+    for modo, resultado in actual["resultados"].items():
+        base = anterior.get("resultados", {}).get(modo)
+        if not base:
+            continue
+        print(f"\n{modo}: {anterior['metadatos'].get('commit')} -> {actual['metadatos'].get('commit')}")
+        print(f"{'endpoint':<34} {'p95 ms':>18} {'req/s':>20}")
+        filas = [("total", resultado["total"], base["total"])] + [
+            (endpoint, datos, base["endpoints"][endpoint])
+            for endpoint, datos in resultado["endpoints"].items() if endpoint in base["endpoints"]
+        ]
+        for endpoint, datos, previos in filas:
+            variacion = (datos["peticiones_por_segundo"] / previos["peticiones_por_segundo"] - 1) * 100
+            print(f"{endpoint:<34} {previos['p95_ms']:>8.1f} -> {datos['p95_ms']:>7.1f} "
+                  f"{previos['peticiones_por_segundo']:>8.1f} -> {datos['peticiones_por_segundo']:>7.1f} ({variacion:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bibliotecas", type=int, default=20)
+    parser.add_argument("--miembros", type=int, default=20000)
+    parser.add_argument("--libros", type=int, default=50000)
+    parser.add_argument("--prestamos", type=int, default=100000)
+    parser.add_argument("--sesgo", type=float, default=1.1, help="Exponente Zipf de datos y parámetros (0 = uniforme)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--modo", choices=("asgi", "uvicorn", "ambos"), default="ambos")
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--calentamiento", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2, help="Procesos de uvicorn")
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto se imprime)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para mostrar la variación")
+    argumentos = parser.parse_args()
+
+    modos = ("asgi", "uvicorn") if argumentos.modo == "ambos" else (argumentos.modo,)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_base = os.path.join(directorio, "base.db")
+        # La URL del modo asgi se fija antes de importar el backend: el motor de database/db.py
+        # se crea al importarlo y la app en proceso debe apuntar a su copia de la base
+        os.environ["BIBLIOTECA_URL_BD"] = f"sqlite:///{os.path.join(directorio, 'asgi.db')}"
+        print(f"Sembrando {argumentos.bibliotecas} bibliotecas, {argumentos.miembros} miembros, "
+              f"{argumentos.libros} libros y {argumentos.prestamos} préstamos (sesgo {argumentos.sesgo})...",
+              file=sys.stderr)
+        sembrar(f"sqlite:///{ruta_base}", argumentos)
+        escenario = preparar_escenario(f"sqlite:///{ruta_base}", argumentos)
+
+        for modo in modos:
+            # Copia por modo para que ambos partan del mismo estado
+            ruta_modo = os.path.join(directorio, f"{modo}.db")
+            shutil.copy(ruta_base, ruta_modo)
+            url = f"sqlite:///{ruta_modo}"
+            print(f"Ejecutando {argumentos.peticiones} peticiones en modo {modo}...", file=sys.stderr)
+            if modo == "asgi":
+                resultados[modo] = asyncio.run(carga_asgi(escenario, argumentos))
+                continue
+            entorno = dict(os.environ, BIBLIOTECA_URL_BD=url)
+            servidor = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(argumentos.puerto),
+                 "--workers", str(argumentos.workers), "--log-level", "warning"],
+                env=entorno,
+            )
+            try:
+                resultados[modo] = asyncio.run(carga_uvicorn(escenario, argumentos))
+            finally:
+                servidor.terminate()
+                servidor.wait()
+
+    informe = {
+        "metadatos": {
+            "commit": commit_actual(),
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "modo_bd": os.getenv("BIBLIOTECA_MODO_BD", "sync"),
+            "parametros": {
+                clave: valor for clave, valor in vars(argumentos).items() if clave not in ("salida", "comparar")
+            },
+            "mezcla": dict(MEZCLA),
+        },
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if argumentos.salida:
+        with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as archivo:
+            comparar(json.load(archivo), informe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import itertools
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import Engine
+from ..database.models import Biblioteca, Libro, Miembro, Prestamo
+
+
+PALABRAS_TITULO = [
+    "historia", "río", "canción", "noche", "última", "ciudad", "memoria", "jardín", "mar", "sombra",
+    "corazón", "tiempo", "guerra", "paz", "árbol", "camino", "invierno", "verano", "montaña", "ángel",
+    "silencio", "fuego", "agua", "viento", "espejo", "laberinto", "isla", "reino", "sueño", "niño",
+]
+NOMBRES_AUTOR = ["Gabriel", "Isabel", "Julio", "Laura", "Mario", "Rosario", "Jorge", "Ángeles", "Tomás", "Sofía"]
+APELLIDOS_AUTOR = ["García", "Márquez", "Allende", "Cortázar", "Restrepo", "Vargas", "Borges", "Mutis", "Pérez", "Núñez"]
+CATEGORIAS = ["Novela", "Poesía", "Ensayo", "Historia", "Ciencia", "Filosofía", "Infantil", "Biografía"]
+SILABAS = ["ca", "ma", "lo", "ri", "tén", "sa", "dor", "lu", "pe", "ñó", "gra", "vi", "nes", "to", "bre", "cú"]
+
+
+def generar_vocabulario(aleatorio: random.Random, tamano: int = 20000) -> list:
+    """Vocabulario sintético: palabras frecuentes reales seguidas de una cola larga de palabras raras"""
+    vocabulario = list(PALABRAS_TITULO)
+    while len(vocabulario) < tamano:
+        vocabulario.append("".join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))))
+    return vocabulario
+
+
+def pesos_zipf(cantidad: int, sesgo: float) -> Optional[list]:
+    """Pesos acumulados 1/rango^sesgo: los primeros elementos concentran la mayor parte; None si sesgo es 0"""
+    if sesgo <= 0:
+        return None
+    return list(itertools.accumulate(1 / (posicion + 1) ** sesgo for posicion in range(cantidad)))
+
+
+def elegir(aleatorio: random.Random, elementos: Sequence, pesos: Optional[list] = None):
+    """Elige un elemento al azar, uniforme o según pesos acumulados de pesos_zipf"""
+    if pesos is None:
+        return aleatorio.choice(elementos)
+    return aleatorio.choices(elementos, cum_weights=pesos)[0]
+
+
+def sembrar_libros(motor: Engine, cantidad_libros: int, cantidad_bibliotecas: int = 10,
+                   semilla: int = 42, tamano_lote: int = 5000, sesgo: float = 0.0):
+    """Inserta bibliotecas y libros sintéticos reproducibles para los benchmarks.
+
+    Con sesgo > 0 el tamaño de las bibliotecas sigue una distribución tipo Zipf
+    (la biblioteca 1 es la más grande); con 0 los libros se reparten uniformemente.
+    """
+    aleatorio = random.Random(semilla)
+    codigos_biblioteca = list(range(1, cantidad_bibliotecas + 1))
+    pesos_bibliotecas = pesos_zipf(cantidad_bibliotecas, sesgo)
+    vocabulario = generar_vocabulario(aleatorio)
+    # Distribución tipo Zipf: pocas palabras muy frecuentes y muchas raras
+    pesos = list(itertools.accumulate(1 / (posicion + 1) for posicion in range(len(vocabulario))))
+    ahora = datetime.now(timezone.utc)
+
+    with motor.begin() as conexion:
+        conexion.execute(insert(Biblioteca), [
+            {
+                "codigo_biblioteca": codigo,
+                "nombre_institucion": f"Biblioteca {codigo}",
+                "fecha_creacion": ahora,
+                "estado_activo": True,
+            }
+            for codigo in range(1, cantidad_bibliotecas + 1)
+        ])
+
+        lote = []
+        for numero in range(cantidad_libros):
+            titulo = " ".join(aleatorio.choices(vocabulario, cum_weights=pesos, k=aleatorio.randint(2, 5))).capitalize()
+            cantidad_total = aleatorio.randint(1, 5)
+            lote.append({
+                "codigo_libro": f"LIB-{numero:08d}",
+                "titulo_obra": titulo,
+                "autor_principal": f"{aleatorio.choice(NOMBRES_AUTOR)} {aleatorio.choice(APELLIDOS_AUTOR)}",
+                "categoria_tema": aleatorio.choice(CATEGORIAS),
+                "descripcion_contenido": " ".join(aleatorio.choices(vocabulario, cum_weights=pesos, k=12)),
+                "codigo_biblioteca": elegir(aleatorio, codigos_biblioteca, pesos_bibliotecas),
+                "cantidad_total": cantidad_total,
+                "cantidad_disponible": cantidad_total,
+                "estado_conservacion": "Bueno",
+                "fecha_ingreso": ahora,
+            })
+            if len(lote) >= tamano_lote:
+                conexion.execute(insert(Libro), lote)
+                lote = []
+        if lote:
+            conexion.execute(insert(Libro), lote)
+
+
+def sembrar_prestamos(motor: Engine, cantidad_miembros: int, cantidad_prestamos: int,
+                      semilla: int = 42, tamano_lote: int = 5000, sesgo: float = 0.0):
+    """Inserta miembros y un historial de préstamos coherente con las copias y los cupos disponibles.
+
+    Con sesgo > 0 las bibliotecas grandes reciben más miembros y unos pocos miembros
+    y libros (los de número y código más bajos) concentran la mayoría de los préstamos.
+    """
+    aleatorio = random.Random(semilla)
+    ahora = datetime.now(timezone.utc)
+
+    with motor.begin() as conexion:
+        libros_por_biblioteca = defaultdict(list)
+        disponibles = {}
+        for codigo_libro, codigo_biblioteca, cantidad in conexion.execute(
+            select(Libro.codigo_libro, Libro.codigo_biblioteca, Libro.cantidad_disponible).order_by(Libro.codigo_libro)
+        ):
+            libros_por_biblioteca[codigo_biblioteca].append(codigo_libro)
+            disponibles[codigo_libro] = cantidad
+        bibliotecas = sorted(libros_por_biblioteca)
+        pesos_bibliotecas = pesos_zipf(len(bibliotecas), sesgo)
+        pesos_libros = {
+            codigo: pesos_zipf(len(libros), sesgo) for codigo, libros in libros_por_biblioteca.items()
+        }
+
+        miembros = [
+            {
+                "numero_miembro": numero,
+                "nombres_completos": f"{aleatorio.choice(NOMBRES_AUTOR)} {aleatorio.choice(APELLIDOS_AUTOR)}",
+                "documento_identidad": f"DOC-{numero:09d}",
+                "codigo_biblioteca": elegir(aleatorio, bibliotecas, pesos_bibliotecas),
+                "fecha_registro": ahora,
+                "cuenta_activa": True,
+                "limite_prestamos": 3,
+                "prestamos_activos": 0,
+            }
+            for numero in range(1, cantidad_miembros + 1)
+        ]
+        conexion.execute(insert(Miembro), miembros)
+        prestados = defaultdict(int)
+        pesos_miembros = pesos_zipf(len(miembros), sesgo)
+
+        lote = []
+        for _ in range(cantidad_prestamos):
+            miembro = elegir(aleatorio, miembros, pesos_miembros)
+            codigo_biblioteca = miembro["codigo_biblioteca"]
+            codigo_libro = elegir(aleatorio, libros_por_biblioteca[codigo_biblioteca], pesos_libros[codigo_biblioteca])
+            fecha_solicitud = ahora - timedelta(days=aleatorio.randint(0, 365))
+            # La mayoría de préstamos ya fueron devueltos; los pendientes respetan copias y cupos
+            pendiente = (aleatorio.random() < 0.2 and disponibles[codigo_libro] > 0
+                         and miembro["prestamos_activos"] < miembro["limite_prestamos"])
+            fecha_limite = fecha_solicitud + timedelta(days=14)
+            if pendiente:
+                disponibles[codigo_libro] -= 1
+                prestados[codigo_libro] += 1
+                miembro["prestamos_activos"] += 1
+                estado = "Vencido" if fecha_limite < ahora else "Activo"
+            lote.append({
+                "numero_miembro": miembro["numero_miembro"],
+                "codigo_libro": codigo_libro,
+                "fecha_solicitud": fecha_solicitud,
+                "fecha_limite": fecha_limite,
+                "fecha_devolucion": None if pendiente else fecha_limite - timedelta(days=aleatorio.randint(0, 13)),
+                "estado_prestamo": estado if pendiente else "Devuelto",
+                "multa_aplicada": 0,
+            })
+            if len(lote) >= tamano_lote:
+                conexion.execute(insert(Prestamo), lote)
+                lote = []
+        if lote:
+            conexion.execute(insert(Prestamo), lote)
+
+        # Contadores de copias y cupos ocupados por los préstamos pendientes
+        if prestados:
+            conexion.execute(
+                update(Libro).where(Libro.codigo_libro == bindparam("p_codigo"))
+                .values(cantidad_disponible=bindparam("p_disponible")),
+                [{"p_codigo": codigo, "p_disponible": disponibles[codigo]} for codigo in prestados]
+            )
+            conexion.execute(
+                update(Miembro).where(Miembro.numero_miembro == bindparam("p_numero"))
+                .values(prestamos_activos=bindparam("p_activos")),
+                [{"p_numero": miembro["numero_miembro"], "p_activos": miembro["prestamos_activos"]}
+                 for miembro in miembros if miembro["prestamos_activos"]]
+            )
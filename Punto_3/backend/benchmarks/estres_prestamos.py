@@ -0,0 +1,135 @@
+"""Prueba de estrés de préstamos concurrentes sobre un mismo libro.
+
+Lanza muchas solicitudes simultáneas contra un libro con pocas copias y comprueba
+que no se presten más copias de las que existen. Compara el flujo anterior
+(leer, validar y restar en Python) con el UPDATE condicional de GestorBiblioteca
+y cuenta las sentencias SQL por préstamo exitoso.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.estres_prestamos --copias 50 --solicitudes 400 --hilos 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.orm import sessionmaker
+from ..database.db import ModeloBase
+from ..database.migraciones import aplicar_migraciones
+from ..database.models import Biblioteca, Libro, Miembro, Prestamo
+from ..models.schemas import PrestamoCrear
+from ..repositories.biblioteca_repository import GestorBiblioteca
+
+
+def prestamo_anterior(sesion, datos_prestamo: PrestamoCrear) -> Prestamo:
+    """Flujo de préstamo previo al UPDATE condicional, conservado como referencia"""
+    miembro = sesion.query(Miembro).filter(Miembro.numero_miembro == datos_prestamo.numero_miembro).first()
+    if not miembro:
+        raise HTTPException(status_code=404, detail="Miembro no encontrado")
+    libro = sesion.query(Libro).filter(Libro.codigo_libro == datos_prestamo.codigo_libro).first()
+    if not libro:
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    if miembro.codigo_biblioteca != libro.codigo_biblioteca:
+        raise HTTPException(status_code=403, detail="Biblioteca distinta")
+    prestamos_activos = sesion.query(Prestamo).filter(
+        Prestamo.numero_miembro == datos_prestamo.numero_miembro,
+        Prestamo.estado_prestamo == "Activo"
+    ).count()
+    if prestamos_activos >= miembro.limite_prestamos:
+        raise HTTPException(status_code=400, detail="Límite de préstamos alcanzado")
+    if libro.cantidad_disponible <= 0:
+        raise HTTPException(status_code=400, detail="Libro no disponible")
+    nuevo_prestamo = Prestamo(
+        numero_miembro=datos_prestamo.numero_miembro,
+        codigo_libro=datos_prestamo.codigo_libro,
+        fecha_limite=datetime.utcnow() + timedelta(days=datos_prestamo.dias_prestamo)
+    )
+    libro.cantidad_disponible -= 1
+    sesion.add(nuevo_prestamo)
+    sesion.commit()
+    sesion.refresh(nuevo_prestamo)
+    return nuevo_prestamo
+
+
+def ejecutar(nombre: str, procesar, copias: int, solicitudes: int, hilos: int) -> bool:
+    with tempfile.TemporaryDirectory() as directorio:
+        motor = create_engine(
+            f"sqlite:///{os.path.join(directorio, 'estres.db')}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=hilos,
+        )
+        ModeloBase.metadata.create_all(bind=motor)
+        aplicar_migraciones(motor)
+        with motor.begin() as conexion:
+            conexion.execute(insert(Biblioteca).values(codigo_biblioteca=1, nombre_institucion="Estrés"))
+            conexion.execute(insert(Libro).values(
+                codigo_libro="CONCURRIDO", titulo_obra="Libro concurrido", codigo_biblioteca=1,
+                cantidad_total=copias, cantidad_disponible=copias, estado_conservacion="Bueno"
+            ))
+            conexion.execute(insert(Miembro), [
+                {"numero_miembro": numero, "nombres_completos": f"Miembro {numero}",
+                 "documento_identidad": str(numero), "codigo_biblioteca": 1, "limite_prestamos": 3}
+                for numero in range(1, solicitudes + 1)
+            ])
+
+        # Sentencias emitidas por cada hilo durante su solicitud actual
+        contador = threading.local()
+        sentencias_exitosas = []
+
+        @event.listens_for(motor, "before_cursor_execute")
+        def contar(*_):
+            contador.sentencias = getattr(contador, "sentencias", 0) + 1
+
+        CrearSesion = sessionmaker(bind=motor, autoflush=False)
+        barrera = threading.Barrier(hilos)
+
+        def solicitar(numero_miembro: int) -> bool:
+            if numero_miembro <= hilos:
+                barrera.wait()
+            contador.sentencias = 0
+            with CrearSesion() as sesion:
+                try:
+                    procesar(sesion, PrestamoCrear(numero_miembro=numero_miembro, codigo_libro="CONCURRIDO"))
+                except HTTPException:
+                    return False
+            sentencias_exitosas.append(contador.sentencias)
+            return True
+
+        with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+            exitosos = sum(ejecutor.map(solicitar, range(1, solicitudes + 1)))
+
+        with CrearSesion() as sesion:
+            prestamos = sesion.query(func.count(Prestamo.id_prestamo)).scalar()
+            disponible = sesion.query(Libro.cantidad_disponible).filter(Libro.codigo_libro == "CONCURRIDO").scalar()
+        motor.dispose()
+
+    sobreventa = prestamos - copias
+    correcto = prestamos <= copias and disponible == copias - prestamos
+    print(
+        f"{nombre}: exitosos={exitosos} prestamos_creados={prestamos} copias={copias} "
+        f"disponible_final={disponible} sobreventa={max(sobreventa, 0)} "
+        f"sentencias_por_prestamo={sum(sentencias_exitosas) / max(exitosos, 1):.1f} -> {'OK' if correcto else 'INCONSISTENTE'}"
+    )
+    return correcto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copias", type=int, default=50)
+    parser.add_argument("--solicitudes", type=int, default=400)
+    parser.add_argument("--hilos", type=int, default=32)
+    argumentos = parser.parse_args()
+
+    ejecutar("anterior (leer-modificar-escribir)", prestamo_anterior,
+             argumentos.copias, argumentos.solicitudes, argumentos.hilos)
+    correcto = ejecutar("GestorBiblioteca (UPDATE condicional)", GestorBiblioteca.procesar_prestamo,
+                        argumentos.copias, argumentos.solicitudes, argumentos.hilos)
+    sys.exit(0 if correcto else 1)
+
+
+if __name__ == "__main__":
+    main()
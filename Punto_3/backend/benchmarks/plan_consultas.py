@@ -0,0 +1,221 @@
+"""Revisa el plan de ejecución de cada consulta que emiten los endpoints.
+
+Siembra un conjunto grande de datos en una base SQLite temporal, recorre los
+endpoints con TestClient capturando cada sentencia SQL y ejecuta EXPLAIN QUERY
+PLAN sobre ellas. Termina con código 1 si algún plan recorre completa una tabla
+(SCAN) fuera de las permitidas: tablas pequeñas y el índice FTS5.
+
+Uso (desde Punto_3):
+    python -m backend.benchmarks.plan_consultas --libros 50000 --miembros 20000 --prestamos 100000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+
+
+# Tablas que pueden recorrerse completas: bibliotecas y las tablas de control son pequeñas,
+# libros_fts es la tabla virtual FTS5 y siguiente es la CTE recursiva del autocompletado
+# (una fila por sugerencia, acotada por el límite)
+TABLAS_PERMITIDAS = {"bibliotecas", "libros_fts", "version_esquema", "generaciones_cache", "siguiente"}
+PREFIJOS_ANALIZADOS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def recorridos_completos(plan: list) -> list:
+    """Devuelve los pasos del plan que recorren una tabla completa no permitida"""
+    recorridos = []
+    for *_, detalle in plan:
+        if not detalle.startswith("SCAN "):
+            continue
+        tabla = detalle.split()[1]
+        if tabla not in TABLAS_PERMITIDAS and tabla != "CONSTANT":
+            recorridos.append(detalle)
+    return recorridos
+
+
+def solicitudes_a_revisar() -> list:
+    """(etiqueta, método, ruta, opciones) de cada solicitud; la ruta y las opciones se completan con los valores sembrados"""
+    archivo_libros = "codigo_libro,titulo_obra,codigo_biblioteca\nPLAN-IMP-1,Importado,{codigo_biblioteca}\nLIB-00000001,Repetido,1\n"
+    archivo_miembros = '{{"nombres_completos": "Importado", "documento_identidad": "PLAN-IMP", "codigo_biblioteca": {codigo_biblioteca}}}\n'
+    return [
+        ("listar bibliotecas", "GET", "/biblioteca/", lambda v: {"params": {"despues_de": 1}}),
+        ("obtener biblioteca", "GET", "/biblioteca/{codigo_biblioteca}", lambda v: {}),
+        ("estadísticas de biblioteca", "GET", "/biblioteca/{codigo_biblioteca}/estadisticas", lambda v: {}),
+        ("libros por biblioteca", "GET", "/libros/bibliotecas/{codigo_biblioteca}/libros", lambda v: {}),
+        ("libros por biblioteca (cursor)", "GET", "/libros/bibliotecas/{codigo_biblioteca}/libros",
+         lambda v: {"params": {"despues_de": "LIB-00000100"}}),
+        ("libros por biblioteca (ndjson)", "GET", "/libros/bibliotecas/{codigo_biblioteca}/libros",
+         lambda v: {"params": {"formato": "ndjson", "limite": 50}}),
+        ("buscar texto", "GET", "/libros/buscar", lambda v: {"params": {"q": "laberinto"}}),
+        ("buscar campos", "GET", "/libros/buscar", lambda v: {"params": {
+            "titulo": "sombra", "autor": "garcia", "categoria": "novela", "codigo_biblioteca": v["codigo_biblioteca"]
+        }}),
+        ("autocompletar", "GET", "/libros/autocompletar", lambda v: {"params": {"q": "la"}}),
+        ("autocompletar por biblioteca", "GET", "/libros/autocompletar",
+         lambda v: {"params": {"q": "ga", "codigo_biblioteca": v["codigo_biblioteca"]}}),
+        # Un apellido solo aparece detrás del nombre: lo resuelve palabras_libros
+        ("autocompletar apellido", "GET", "/libros/autocompletar", lambda v: {"params": {"q": "garc"}}),
+        ("autocompletar apellido por biblioteca", "GET", "/libros/autocompletar",
+         lambda v: {"params": {"q": "borg", "codigo_biblioteca": v["codigo_biblioteca"]}}),
+        ("libros por código", "GET", "/libros/", lambda v: {"params": {"codigo": f"{v['codigo_libro']},LIB-00000100"}}),
+        ("miembros por número", "GET", "/miembros/", lambda v: {"params": {"numero": f"{v['numero_miembro']},10"}}),
+        ("miembros por biblioteca", "GET", "/miembros/bibliotecas/{codigo_biblioteca}/miembros",
+         lambda v: {"params": {"despues_de": 10}}),
+        ("préstamos por miembro", "GET", "/prestamos/miembros/{numero_miembro}/prestamos", lambda v: {}),
+        ("préstamos por miembro (expand)", "GET", "/prestamos/miembros/{numero_miembro}/prestamos",
+         lambda v: {"params": {"expand": "libro,miembro"}}),
+        ("préstamos activos por biblioteca", "GET", "/prestamos/bibliotecas/{codigo_biblioteca}/prestamos-activos",
+         lambda v: {"params": {"despues_de": 10}}),
+        ("préstamos activos por biblioteca (expand)", "GET",
+         "/prestamos/bibliotecas/{codigo_biblioteca}/prestamos-activos", lambda v: {"params": {"expand": "libro,miembro"}}),
+        ("préstamos vencidos", "GET", "/prestamos/vencidos", lambda v: {"params": {"codigo_biblioteca": v["codigo_biblioteca"]}}),
+        ("reporte de préstamos", "GET", "/reportes/prestamos", lambda v: {"params": v["semana"]}),
+        ("reporte de préstamos por biblioteca", "GET", "/reportes/prestamos",
+         lambda v: {"params": {**v["semana"], "codigo_biblioteca": v["codigo_biblioteca"]}}),
+        ("reporte por día", "GET", "/reportes/prestamos", lambda v: {"params": {**v["semana"], "agrupar": "dia"}}),
+        ("reporte por categoría", "GET", "/reportes/prestamos", lambda v: {"params": {**v["semana"], "agrupar": "categoria"}}),
+        ("reporte por miembro", "GET", "/reportes/prestamos", lambda v: {"params": {**v["semana"], "agrupar": "miembro"}}),
+        ("reporte por miembro de una biblioteca", "GET", "/reportes/prestamos",
+         lambda v: {"params": {**v["semana"], "agrupar": "miembro", "codigo_biblioteca": v["codigo_biblioteca"]}}),
+        ("crear préstamo", "POST", "/prestamos/",
+         lambda v: {"json": {"numero_miembro": v["numero_miembro"], "codigo_libro": v["codigo_libro"]}}),
+        ("préstamo rechazado", "POST", "/prestamos/",
+         lambda v: {"json": {"numero_miembro": v["numero_miembro"], "codigo_libro": "NO-EXISTE"}}),
+        ("devolver préstamo", "PUT", "/prestamos/{id_prestamo}/devolver", lambda v: {}),
+        ("préstamos en lote", "POST", "/prestamos/lote",
+         lambda v: {"json": {"prestamos": [{"numero_miembro": v["numero_miembro"], "codigo_libro": v["codigo_libro"]}]}}),
+        ("devoluciones en lote", "PUT", "/prestamos/lote/devolver", lambda v: {"json": {"ids_prestamo": [v["id_prestamo"]]}}),
+        ("actualizar libro", "PUT", "/libros/{codigo_libro}", lambda v: {"json": v["libro"]}),
+        ("actualizar miembro", "PUT", "/miembros/{numero_miembro}", lambda v: {"json": v["miembro"]}),
+        ("importar libros", "POST", "/libros/importar", lambda v: {"files": {"archivo": (
+            "libros.csv", io.BytesIO(archivo_libros.format(**v).encode()), "text/csv"
+        )}}),
+        ("importar miembros", "POST", "/miembros/importar", lambda v: {"files": {"archivo": (
+            "miembros.ndjson", io.BytesIO(archivo_miembros.format(**v).encode()), "application/x-ndjson"
+        )}}),
+        ("eliminar préstamo", "DELETE", "/prestamos/{id_prestamo}", lambda v: {}),
+        ("eliminar libro", "DELETE", "/libros/PLAN-IMP-1", lambda v: {}),
+        ("eliminar miembro", "DELETE", "/miembros/{miembro_importado}", lambda v: {}),
+        ("eliminar biblioteca", "DELETE", "/biblioteca/{biblioteca_vacia}", lambda v: {}),
+        ("eliminar biblioteca en segundo plano", "DELETE", "/biblioteca/{codigo_biblioteca}",
+         lambda v: {"params": {"en_segundo_plano": True}}),
+        ("estado del trabajo", "GET", "/trabajos/{id_trabajo}", lambda v: {}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libros", type=int, default=50000)
+    parser.add_argument("--miembros", type=int, default=20000)
+    parser.add_argument("--prestamos", type=int, default=100000)
+    parser.add_argument("--bibliotecas", type=int, default=10)
+    parser.add_argument("--mostrar-planes", action="store_true", help="Imprime el plan de todas las consultas")
+    argumentos = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    os.environ["BIBLIOTECA_URL_BD"] = f"sqlite:///{os.path.join(directorio, 'planes.db')}"
+    os.environ["BIBLIOTECA_MODO_BD"] = "sync"
+
+    # Se importan después de fijar la URL para que el motor apunte a la base temporal
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, select
+    from ..database.db import CrearSesion, motor
+    from ..database.migraciones import migrar
+    from ..database.models import Libro, Miembro
+    from ..models.schemas import LibroCrear, MiembroCrear
+    from ..main import app
+    from ..repositories.biblioteca_repository import GestorBiblioteca
+    from .datos_sinteticos import sembrar_libros, sembrar_prestamos
+
+    migrar(motor)
+    print(f"Sembrando {argumentos.libros} libros, {argumentos.miembros} miembros y {argumentos.prestamos} préstamos...")
+    sembrar_libros(motor, argumentos.libros, argumentos.bibliotecas)
+    sembrar_prestamos(motor, argumentos.miembros, argumentos.prestamos)
+
+    with motor.connect() as conexion:
+        numero_miembro, codigo_biblioteca = conexion.execute(
+            select(Miembro.numero_miembro, Miembro.codigo_biblioteca)
+            .where(Miembro.prestamos_activos == 0).limit(1)
+        ).one()
+        codigo_libro = conexion.execute(
+            select(Libro.codigo_libro)
+            .where(Libro.codigo_biblioteca == codigo_biblioteca, Libro.cantidad_disponible > 1).limit(1)
+        ).scalar_one()
+        # Cuerpos de actualización con los datos actuales del libro y del miembro
+        datos_libro = conexion.execute(
+            select(*[getattr(Libro, campo) for campo in LibroCrear.model_fields]).where(Libro.codigo_libro == codigo_libro)
+        ).mappings().one()
+        datos_miembro = conexion.execute(
+            select(*[getattr(Miembro, campo) for campo in MiembroCrear.model_fields])
+            .where(Miembro.numero_miembro == numero_miembro)
+        ).mappings().one()
+
+    cliente = TestClient(app)
+    valores = {
+        "codigo_biblioteca": codigo_biblioteca,
+        "numero_miembro": numero_miembro,
+        "codigo_libro": codigo_libro,
+        "libro": dict(datos_libro),
+        "miembro": dict(datos_miembro),
+        "semana": {"desde": str(date.today() - timedelta(days=7)), "hasta": str(date.today())},
+        "biblioteca_vacia": cliente.post("/biblioteca/", json={"nombre_institucion": "Vacía"}).json()["codigo_biblioteca"],
+    }
+
+    # Sentencias capturadas por endpoint
+    sentencias = defaultdict(dict)
+    etiqueta_actual = [None]
+
+    def capturar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        if etiqueta_actual[0] and sentencia.lstrip().upper().startswith(PREFIJOS_ANALIZADOS):
+            if executemany:
+                parametros = parametros[0]
+            sentencias[etiqueta_actual[0]].setdefault(sentencia, parametros)
+
+    event.listen(motor, "before_cursor_execute", capturar)
+    for etiqueta, metodo, ruta, opciones in solicitudes_a_revisar():
+        ruta = ruta.format(**valores)
+        etiqueta_actual[0] = etiqueta
+        respuesta = cliente.request(metodo, ruta, **opciones(valores))
+        etiqueta_actual[0] = None
+        print(f"  {respuesta.status_code} {metodo} {ruta} ({etiqueta})")
+
+        # Encadena los identificadores creados para las solicitudes siguientes
+        if etiqueta in ("crear préstamo", "préstamos en lote") and respuesta.status_code < 300:
+            cuerpo = respuesta.json()
+            valores["id_prestamo"] = cuerpo.get("id_prestamo") or cuerpo["resultados"][0]["id_prestamo"]
+        elif etiqueta == "eliminar biblioteca en segundo plano":
+            valores["id_trabajo"] = respuesta.json()["id_trabajo"]
+        elif etiqueta == "importar miembros":
+            with motor.connect() as conexion:
+                valores["miembro_importado"] = conexion.execute(
+                    select(Miembro.numero_miembro).where(Miembro.documento_identidad == "PLAN-IMP")
+                ).scalar_one()
+
+    etiqueta_actual[0] = "barrido de vencimientos"
+    with CrearSesion() as sesion:
+        GestorBiblioteca.marcar_prestamos_vencidos(sesion)
+    etiqueta_actual[0] = None
+    event.remove(motor, "before_cursor_execute", capturar)
+
+    fallos = 0
+    with motor.connect() as conexion:
+        for etiqueta, consultas in sentencias.items():
+            for sentencia, parametros in consultas.items():
+                plan = conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sentencia}", parametros).all()
+                recorridos = recorridos_completos(plan)
+                if recorridos or argumentos.mostrar_planes:
+                    print(f"\n[{etiqueta}] {' '.join(sentencia.split())[:300]}")
+                    for *_, detalle in plan:
+                        print(f"    {'!! ' if detalle in recorridos else ''}{detalle}")
+                fallos += len(recorridos)
+
+    total = sum(len(consultas) for consultas in sentencias.values())
+    print(f"\n{total} consultas revisadas en {len(sentencias)} operaciones, {fallos} recorridos completos")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Comandos de administración del sistema de bibliotecas.
+
+Uso (desde Punto_3):
+    python -m backend.cli importar libros catalogo.csv
+    python -m backend.cli importar miembros socios.ndjson --lote 5000
+    python -m backend.cli vencimientos
+    python -m backend.cli migrar
+    python -m backend.cli estadisticas --biblioteca 3
+    python -m backend.cli eventos --retencion-horas 24
+"""
+import argparse
+import sys
+from .database.db import CrearSesion
+
+
+def comando_importar(argumentos) -> int:
+    from .repositories.importacion_repository import ImportadorCatalogo
+
+    try:
+        formato = ImportadorCatalogo.detectar_formato(argumentos.archivo, argumentos.formato)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    importar = ImportadorCatalogo.importar_libros if argumentos.entidad == "libros" else ImportadorCatalogo.importar_miembros
+    with open(argumentos.archivo, encoding="utf-8-sig", newline="") as archivo, CrearSesion() as sesion:
+        resumen = importar(sesion, ImportadorCatalogo.leer_filas(archivo, formato), argumentos.lote)
+
+    print(resumen.model_dump_json(indent=2))
+    return 0 if resumen.total_errores == 0 else 1
+
+
+def comando_vencimientos(argumentos) -> int:
+    from .services.vencimientos import barrer_vencidos
+
+    actualizados = barrer_vencidos(argumentos.lote)
+    print(f"Préstamos vencidos actualizados: {actualizados}")
+    return 0
+
+
+def comando_migrar(argumentos) -> int:
+    from .database.migraciones import bases_del_sistema, migrar_sistema, version_actual
+
+    aplicadas_por_base = dict(migrar_sistema())
+    for fragmento, motor in bases_del_sistema():
+        prefijo = "" if fragmento is None else f"Fragmento {fragmento}: "
+        if aplicadas_por_base[fragmento]:
+            print(f"{prefijo}Migraciones aplicadas: {', '.join(map(str, aplicadas_por_base[fragmento]))}")
+        print(f"{prefijo}Versión del esquema: {version_actual(motor)}")
+    return 0
+
+
+def comando_estadisticas(argumentos) -> int:
+    from .database.db import elegir_fragmento, fragmento_de_biblioteca, fragmentos_de_datos
+    from .repositories.estadisticas_repository import ContadoresBiblioteca
+
+    fragmentos = fragmentos_de_datos() if argumentos.biblioteca is None else [fragmento_de_biblioteca(argumentos.biblioteca)]
+    reconstruidas = 0
+    with CrearSesion() as sesion:
+        for fragmento in fragmentos:
+            elegir_fragmento(sesion, fragmento)
+            reconstruidas += ContadoresBiblioteca.reconstruir(sesion, argumentos.biblioteca)
+            sesion.commit()
+    print(f"Estadísticas reconstruidas: {reconstruidas} biblioteca(s)")
+    return 0
+
+
+def comando_eventos(argumentos) -> int:
+    from .services.eventos import podar_eventos
+
+    eliminados = podar_eventos(argumentos.retencion_horas)
+    print(f"Eventos eliminados: {eliminados}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.cli", description="Administración del sistema de bibliotecas")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = subcomandos.add_parser("importar", help="Importa libros o miembros desde CSV o NDJSON")
+    importar.add_argument("entidad", choices=("libros", "miembros"))
+    importar.add_argument("archivo")
+    importar.add_argument("--formato", choices=("csv", "ndjson"), help="Por defecto se deduce de la extensión")
+    importar.add_argument("--lote", type=int, default=1000, help="Filas por transacción")
+    importar.set_defaults(ejecutar=comando_importar)
+
+    vencimientos = subcomandos.add_parser("vencimientos", help="Marca préstamos vencidos y acumula sus multas")
+    vencimientos.add_argument("--lote", type=int, default=1000, help="Préstamos por UPDATE")
+    vencimientos.set_defaults(ejecutar=comando_vencimientos)
+
+    migrar = subcomandos.add_parser("migrar", help="Crea las tablas y aplica las migraciones pendientes")
+    migrar.set_defaults(ejecutar=comando_migrar)
+
+    estadisticas = subcomandos.add_parser("estadisticas", help="Recalcula los contadores de estadísticas por biblioteca")
+    estadisticas.add_argument("--biblioteca", type=int, help="Por defecto todas las bibliotecas")
+    estadisticas.set_defaults(ejecutar=comando_estadisticas)
+
+    eventos = subcomandos.add_parser("eventos", help="Poda los eventos de disponibilidad más antiguos que la retención")
+    eventos.add_argument("--retencion-horas", type=float, help="Por defecto BIBLIOTECA_EVENTOS_RETENCION_HORAS")
+    eventos.set_defaults(ejecutar=comando_eventos)
+
+    argumentos = parser.parse_args(argv)
+    return argumentos.ejecutar(argumentos)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
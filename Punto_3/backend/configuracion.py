@@ -0,0 +1,77 @@
+import os
+
+
+# URL de la base de datos (por defecto el archivo SQLite local)
+URL_BD = os.getenv("BIBLIOTECA_URL_BD", "sqlite:///./sistema_bibliotecas.db")
+
+# "sync": handlers en el threadpool con Session; "async": AsyncSession sobre el event loop
+MODO_BD = os.getenv("BIBLIOTECA_MODO_BD", "sync").lower()
+
+# URL del motor asíncrono; si no se define se deriva de URL_BD (aiosqlite / asyncpg)
+URL_BD_ASYNC = os.getenv("BIBLIOTECA_URL_BD_ASYNC")
+
+# Segundos entre barridos de préstamos vencidos dentro del proceso (0 lo desactiva)
+INTERVALO_VENCIMIENTOS = float(os.getenv("BIBLIOTECA_INTERVALO_VENCIMIENTOS", "0"))
+
+# Caché de lectura de bibliotecas y libros: entradas por entidad y segundos de vida (0 la desactiva)
+CACHE_CAPACIDAD = int(os.getenv("BIBLIOTECA_CACHE_CAPACIDAD", "2048"))
+CACHE_TTL = float(os.getenv("BIBLIOTECA_CACHE_TTL", "300"))
+
+# Pool de conexiones del motor: conexiones permanentes, adicionales bajo carga, segundos de espera
+# por una conexión libre y segundos antes de reciclarla. Tamaño + desborde cubre los 40 hilos
+# del threadpool de FastAPI para que los handlers sync no queden esperando conexión.
+POOL_TAMANO = int(os.getenv("BIBLIOTECA_POOL_TAMANO", "20"))
+POOL_DESBORDE = int(os.getenv("BIBLIOTECA_POOL_DESBORDE", "20"))
+POOL_ESPERA = float(os.getenv("BIBLIOTECA_POOL_ESPERA", "30"))
+POOL_RECICLAR = int(os.getenv("BIBLIOTECA_POOL_RECICLAR", "1800"))
+
+# Ajustes de SQLite aplicados en cada conexión: modo de diario (WAL permite lectores
+# concurrentes con un escritor), sincronización, milisegundos de espera ante bloqueos,
+# bytes mapeados en memoria y KiB de caché de páginas por conexión
+SQLITE_MODO_DIARIO = os.getenv("BIBLIOTECA_SQLITE_MODO_DIARIO", "WAL").upper()
+SQLITE_SINCRONIZACION = os.getenv("BIBLIOTECA_SQLITE_SINCRONIZACION", "NORMAL").upper()
+SQLITE_ESPERA_BLOQUEO_MS = int(os.getenv("BIBLIOTECA_SQLITE_ESPERA_BLOQUEO_MS", "5000"))
+SQLITE_MMAP_BYTES = int(os.getenv("BIBLIOTECA_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv("BIBLIOTECA_SQLITE_CACHE_KB", "16384"))
+
+# Métricas por solicitud expuestas en /metrics en formato Prometheus ("0" las desactiva)
+METRICAS_ACTIVAS = os.getenv("BIBLIOTECA_METRICAS", "1") != "0"
+
+# Milisegundos a partir de los cuales una sentencia SQL se registra como lenta (0 lo desactiva)
+CONSULTA_LENTA_MS = float(os.getenv("BIBLIOTECA_CONSULTA_LENTA_MS", "0"))
+
+# Sentencias SQL por solicitud a partir de las cuales se avisa de un posible N+1 (0 lo desactiva)
+LIMITE_CONSULTAS_SOLICITUD = int(os.getenv("BIBLIOTECA_LIMITE_CONSULTAS_SOLICITUD", "25"))
+
+# "1" aplica las migraciones pendientes al iniciar la API; por defecto se ejecutan como
+# paso explícito (python -m backend.cli migrar) y el arranque solo comprueba la versión
+MIGRAR_AL_INICIAR = os.getenv("BIBLIOTECA_MIGRAR_AL_INICIAR", "0") == "1"
+
+# Flujo SSE de eventos por biblioteca: segundos entre consultas de eventos nuevos, segundos
+# sin eventos tras los que se envía un latido (detecta clientes desconectados) y eventos por lote
+EVENTOS_INTERVALO = float(os.getenv("BIBLIOTECA_EVENTOS_INTERVALO", "1"))
+EVENTOS_LATIDO = float(os.getenv("BIBLIOTECA_EVENTOS_LATIDO", "15"))
+EVENTOS_LOTE = int(os.getenv("BIBLIOTECA_EVENTOS_LOTE", "200"))
+
+# Horas que se conservan los eventos y segundos entre podas dentro del proceso (0 la desactiva)
+EVENTOS_RETENCION_HORAS = float(os.getenv("BIBLIOTECA_EVENTOS_RETENCION_HORAS", "24"))
+EVENTOS_INTERVALO_PODA = float(os.getenv("BIBLIOTECA_EVENTOS_INTERVALO_PODA", "3600"))
+
+# Fragmentos por biblioteca (0 la desactiva): cada fragmento es un archivo SQLite junto a la base
+# global, con su propio escritor, y guarda los libros, miembros y préstamos de las bibliotecas
+# con codigo_biblioteca % FRAGMENTOS igual a su número. No se debe cambiar con datos cargados.
+FRAGMENTOS = int(os.getenv("BIBLIOTECA_FRAGMENTOS", "0"))
+
+# Escrituras agrupadas ("1" las activa): los préstamos y devoluciones individuales se encolan y
+# una tarea escritora los aplica en una sola transacción por lote. Milisegundos que espera el
+# escritor a más operaciones tras recibir la primera y operaciones máximas por transacción.
+ESCRITURA_AGRUPADA = os.getenv("BIBLIOTECA_ESCRITURA_AGRUPADA", "0") == "1"
+ESCRITURA_VENTANA_MS = float(os.getenv("BIBLIOTECA_ESCRITURA_VENTANA_MS", "2"))
+ESCRITURA_LOTE = int(os.getenv("BIBLIOTECA_ESCRITURA_LOTE", "128"))
+
+# Modelo de lectura en memoria ("1" lo activa): cada proceso carga libros y bibliotecas en
+# columnas por biblioteca y responde listados y consultas por código sin ir a la base. Se pone
+# al día con eventos_biblioteca tras cada confirmación propia y cada MODELO_LECTURA_INTERVALO
+# segundos (escrituras de otros procesos). Solo SQLite.
+MODELO_LECTURA = os.getenv("BIBLIOTECA_MODELO_LECTURA", "0") == "1"
+MODELO_LECTURA_INTERVALO = float(os.getenv("BIBLIOTECA_MODELO_LECTURA_INTERVALO", "0.5"))
@@ -1,17 +1,248 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from .. import configuracion
+from .instrumentacion import instrumentar_motor, medicion_actual, registrar_espera_pool
 
 
-RUTA_BD = "sqlite:///./sistema_bibliotecas.db"
-motor = create_engine(RUTA_BD, connect_args={"check_same_thread": False})
-CrearSesion = sessionmaker(autocommit=False, autoflush=False, bind=motor)
+MODOS_DIARIO_SQLITE = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SINCRONIZACION_SQLITE = ("OFF", "NORMAL", "FULL", "EXTRA")
+# Los miembros y préstamos del fragmento k se numeran desde k * RANGO_IDS_FRAGMENTO, así el id
+# basta para saber en qué fragmento están
+RANGO_IDS_FRAGMENTO = 10 ** 12
+# Tablas que se leen y escriben en la base global aunque la sesión tenga un fragmento elegido
+TABLAS_GLOBALES = frozenset({"trabajos_eliminacion", "directorio_libros"})
+CLAVE_FRAGMENTO = "fragmento"
+
+
+def pragmas_sqlite() -> list:
+    """PRAGMAs que se ejecutan en cada conexión SQLite nueva según la configuración"""
+    if configuracion.SQLITE_MODO_DIARIO not in MODOS_DIARIO_SQLITE:
+        raise ValueError(f"BIBLIOTECA_SQLITE_MODO_DIARIO inválido: {configuracion.SQLITE_MODO_DIARIO}")
+    if configuracion.SQLITE_SINCRONIZACION not in SINCRONIZACION_SQLITE:
+        raise ValueError(f"BIBLIOTECA_SQLITE_SINCRONIZACION inválido: {configuracion.SQLITE_SINCRONIZACION}")
+    return [
+        f"PRAGMA journal_mode={configuracion.SQLITE_MODO_DIARIO}",
+        f"PRAGMA synchronous={configuracion.SQLITE_SINCRONIZACION}",
+        f"PRAGMA busy_timeout={int(configuracion.SQLITE_ESPERA_BLOQUEO_MS)}",
+        f"PRAGMA mmap_size={int(configuracion.SQLITE_MMAP_BYTES)}",
+        # Un valor negativo indica el tamaño en KiB en lugar de páginas
+        f"PRAGMA cache_size=-{int(configuracion.SQLITE_CACHE_KB)}",
+    ]
+
+
+def _registrar_pragmas_sqlite(motor_sync: Engine):
+    sentencias = pragmas_sqlite()
+
+    @event.listens_for(motor_sync, "connect")
+    def aplicar_pragmas(conexion_dbapi, _registro):
+        cursor = conexion_dbapi.cursor()
+        for sentencia in sentencias:
+            cursor.execute(sentencia)
+        cursor.close()
+
+
+def opciones_motor(url: str) -> dict:
+    """Argumentos de create_engine / create_async_engine según el tipo de base de datos"""
+    url_bd = make_url(url)
+    if url_bd.get_backend_name() == "sqlite":
+        opciones = {"connect_args": {"check_same_thread": False}} if url_bd.get_driver_name() == "pysqlite" else {}
+        # Las bases en memoria usan un pool de una conexión; el tamaño solo aplica a archivos
+        if url_bd.database and url_bd.database != ":memory:":
+            opciones.update(pool_size=configuracion.POOL_TAMANO, max_overflow=configuracion.POOL_DESBORDE,
+                            pool_timeout=configuracion.POOL_ESPERA)
+        return opciones
+    return {
+        "pool_size": configuracion.POOL_TAMANO,
+        "max_overflow": configuracion.POOL_DESBORDE,
+        "pool_timeout": configuracion.POOL_ESPERA,
+        "pool_recycle": configuracion.POOL_RECICLAR,
+        # Descarta conexiones cortadas por el servidor antes de entregarlas
+        "pool_pre_ping": True,
+    }
+
+
+def crear_motor(url: str) -> Engine:
+    """Crea el motor sync con el pool, la instrumentación y, en SQLite, los PRAGMAs de rendimiento"""
+    motor_sync = create_engine(url, **opciones_motor(url))
+    if motor_sync.dialect.name == "sqlite":
+        _registrar_pragmas_sqlite(motor_sync)
+    instrumentar_motor(motor_sync)
+    return motor_sync
+
+
+def crear_motor_async(url: str):
+    """Equivalente asíncrono de crear_motor"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    motor_async = create_async_engine(url, **opciones_motor(url))
+    if motor_async.dialect.name == "sqlite":
+        _registrar_pragmas_sqlite(motor_async.sync_engine)
+    instrumentar_motor(motor_async.sync_engine)
+    return motor_async
+
+
+def fragmentacion_activa() -> bool:
+    return configuracion.FRAGMENTOS > 0
+
+
+def fragmentos_de_datos() -> List[Optional[int]]:
+    """Fragmentos que guardan libros, miembros y préstamos; sin fragmentación, [None] (la base global)"""
+    return list(range(configuracion.FRAGMENTOS)) if fragmentacion_activa() else [None]
+
+
+def fragmento_de_biblioteca(codigo_biblioteca: int) -> Optional[int]:
+    return codigo_biblioteca % configuracion.FRAGMENTOS if fragmentacion_activa() else None
+
+
+def fragmento_de_id(id_registro: int) -> Optional[int]:
+    """Fragmento de un número de miembro o id de préstamo"""
+    if not fragmentacion_activa():
+        return None
+    # Un id fuera de todos los rangos no existe: se busca en el fragmento más cercano y no se encuentra
+    return min(max(id_registro // RANGO_IDS_FRAGMENTO, 0), configuracion.FRAGMENTOS - 1)
+
+
+def agrupar_por_fragmento(elementos: Iterable, fragmento_de: Callable[[object], Optional[int]]) -> Dict[Optional[int], list]:
+    """Reparte los elementos por fragmento conservando su orden dentro de cada uno"""
+    grupos = defaultdict(list)
+    for elemento in elementos:
+        grupos[fragmento_de(elemento)].append(elemento)
+    return dict(grupos)
+
+
+def url_fragmento(fragmento: int, url: str) -> str:
+    """URL del archivo del fragmento, junto a la base global: sistema_bibliotecas.fragmento0.db, ..."""
+    url_bd = make_url(url)
+    if url_bd.get_backend_name() != "sqlite" or not url_bd.database or url_bd.database == ":memory:":
+        raise ValueError("BIBLIOTECA_FRAGMENTOS solo admite una base SQLite en archivo")
+    base, extension = os.path.splitext(url_bd.database)
+    return url_bd.set(database=f"{base}.fragmento{fragmento}{extension or '.db'}").render_as_string(hide_password=False)
+
+
+RUTA_BD = configuracion.URL_BD
+motor = crear_motor(RUTA_BD)
 ModeloBase = declarative_base()
 
+# Motores de los fragmentos por (fragmento, asíncrono), se crean al usarse por primera vez
+_motores_fragmento = {}
+_candado_motores = threading.Lock()
+
+
+def motor_fragmento(fragmento: int, asincrono: bool = False):
+    clave = (fragmento, asincrono)
+    motor_bd = _motores_fragmento.get(clave)
+    if motor_bd is None:
+        with _candado_motores:
+            motor_bd = _motores_fragmento.get(clave)
+            if motor_bd is None:
+                if asincrono:
+                    motor_bd = crear_motor_async(url_fragmento(fragmento, url_asincrona(RUTA_BD)))
+                else:
+                    motor_bd = crear_motor(url_fragmento(fragmento, RUTA_BD))
+                _motores_fragmento[clave] = motor_bd
+    return motor_bd
+
+
+class SesionFragmentada(Session):
+    """Sesión que envía las sentencias al fragmento elegido con elegir_fragmento.
+
+    Sin fragmento elegido, y siempre para las TABLAS_GLOBALES, usa el motor global. Una misma
+    sesión puede escribir en la base global y en un fragmento: al confirmar se confirma cada una.
+    """
+
+    asincrona = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        fragmento = self.info.get(CLAVE_FRAGMENTO)
+        if fragmento is None or (mapper is not None and inspect(mapper).local_table.name in TABLAS_GLOBALES):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self.asincrona:
+            return motor_fragmento(fragmento, True).sync_engine
+        return motor_fragmento(fragmento)
+
+
+class SesionFragmentadaAsync(SesionFragmentada):
+    asincrona = True
+
+
+def elegir_fragmento(sesion: Session, fragmento: Optional[int]):
+    """Envía las siguientes sentencias de la sesión al fragmento (None: la base global)"""
+    sesion.info[CLAVE_FRAGMENTO] = fragmento
+
+
+def elegir_por_biblioteca(sesion: Session, codigo_biblioteca: int):
+    elegir_fragmento(sesion, fragmento_de_biblioteca(codigo_biblioteca))
+
+
+def elegir_por_id(sesion: Session, id_registro: int):
+    elegir_fragmento(sesion, fragmento_de_id(id_registro))
+
+
+CrearSesion = sessionmaker(autocommit=False, autoflush=False, bind=motor, class_=SesionFragmentada)
+
+# Motor asíncrono, se crea solo si se usa el modo async
+_motor_async = None
+_crear_sesion_async = None
+
+
+def modo_async() -> bool:
+    return configuracion.MODO_BD == "async"
+
+
+def url_asincrona(url: str) -> str:
+    """Deriva la URL del driver asíncrono equivalente"""
+    if configuracion.URL_BD_ASYNC:
+        return configuracion.URL_BD_ASYNC
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgresql+psycopg2:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+def obtener_sesion_async():
+    """Devuelve la fábrica de AsyncSession, creando el motor asíncrono la primera vez"""
+    global _motor_async, _crear_sesion_async
+    if _crear_sesion_async is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _motor_async = crear_motor_async(url_asincrona(RUTA_BD))
+        _crear_sesion_async = async_sessionmaker(
+            _motor_async, autoflush=False, expire_on_commit=True, sync_session_class=SesionFragmentadaAsync
+        )
+    return _crear_sesion_async
+
+def motor_activo():
+    """Motor que atiende las solicitudes según el modo configurado (el async si ya se creó)"""
+    if modo_async() and _motor_async is not None:
+        return _motor_async
+    return motor
+
 # sesión de DB
 def get_db() -> Session:
     db = CrearSesion()
     try:
+        # Con métricas activas la conexión se toma aquí para medir la espera por el pool
+        if medicion_actual.get() is not None:
+            inicio = time.perf_counter()
+            db.connection()
+            registrar_espera_pool(time.perf_counter() - inicio)
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# sesión asíncrona de DB
+async def get_db_async():
+    async with obtener_sesion_async()() as db:
+        if medicion_actual.get() is not None:
+            inicio = time.perf_counter()
+            await db.connection()
+            registrar_espera_pool(time.perf_counter() - inicio)
+        yield db
@@ -0,0 +1,63 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .. import configuracion
+
+
+registro_sql = logging.getLogger("backend.sql")
+
+
+class MedicionSolicitud:
+    """Consultas y tiempos de base de datos acumulados durante una solicitud HTTP"""
+
+    def __init__(self, ruta: str = ""):
+        self.ruta = ruta
+        self.sentencias = 0
+        self.segundos_bd = 0.0
+        self.segundos_espera_pool = 0.0
+        self.consultas_lentas = 0
+
+
+# Medición de la solicitud en curso; el threadpool y run_sync copian el contexto,
+# así que los handlers sync y async escriben sobre el mismo objeto
+medicion_actual: ContextVar[Optional[MedicionSolicitud]] = ContextVar("medicion_actual", default=None)
+
+
+def instrumentar_motor(motor_sync: Engine):
+    """Cuenta las sentencias y el tiempo en base de datos de cada solicitud y registra las consultas lentas"""
+
+    @event.listens_for(motor_sync, "before_cursor_execute")
+    def antes_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        conexion.info.setdefault("inicios_sentencia", []).append(time.perf_counter())
+
+    @event.listens_for(motor_sync, "after_cursor_execute")
+    def despues_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        segundos = time.perf_counter() - conexion.info["inicios_sentencia"].pop()
+        lenta = 0 < configuracion.CONSULTA_LENTA_MS <= segundos * 1000
+        medicion = medicion_actual.get()
+        if medicion is not None:
+            medicion.sentencias += 1
+            medicion.segundos_bd += segundos
+            medicion.consultas_lentas += lenta
+        if lenta:
+            registro_sql.warning(
+                "Consulta lenta (%.1f ms) en %s: %s", segundos * 1000,
+                medicion.ruta if medicion else "segundo plano", " ".join(sentencia.split())[:500]
+            )
+
+    @event.listens_for(motor_sync, "handle_error")
+    def al_fallar(contexto):
+        # La sentencia fallida no llega a after_cursor_execute
+        inicios = contexto.connection.info.get("inicios_sentencia") if contexto.connection is not None else None
+        if inicios:
+            inicios.pop()
+
+
+def registrar_espera_pool(segundos: float):
+    """Suma a la solicitud en curso el tiempo que se esperó por una conexión del pool"""
+    medicion = medicion_actual.get()
+    if medicion is not None:
+        medicion.segundos_espera_pool += segundos
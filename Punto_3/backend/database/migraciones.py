@@ -0,0 +1,471 @@
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, func, inspect, select, insert, text
+from sqlalchemy.engine import Connection, Engine
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+
+metadatos_migraciones = MetaData()
+
+version_esquema = Table(
+    "version_esquema",
+    metadatos_migraciones,
+    Column("version", Integer, primary_key=True),
+    Column("descripcion", String(200)),
+    Column("fecha_aplicacion", DateTime),
+)
+
+
+def _crear_indice_busqueda(conexion: Connection):
+    """Crea la tabla FTS5 de libros y los triggers que la mantienen sincronizada"""
+    if conexion.dialect.name != "sqlite":
+        return
+
+    conexion.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS libros_fts USING fts5(
+            titulo_obra, autor_principal, categoria_tema, descripcion_contenido,
+            content='libros', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """))
+    conexion.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS libros_fts_insertar AFTER INSERT ON libros BEGIN
+            INSERT INTO libros_fts(rowid, titulo_obra, autor_principal, categoria_tema, descripcion_contenido)
+            VALUES (new.rowid, new.titulo_obra, new.autor_principal, new.categoria_tema, new.descripcion_contenido);
+        END
+    """))
+    conexion.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS libros_fts_eliminar AFTER DELETE ON libros BEGIN
+            INSERT INTO libros_fts(libros_fts, rowid, titulo_obra, autor_principal, categoria_tema, descripcion_contenido)
+            VALUES ('delete', old.rowid, old.titulo_obra, old.autor_principal, old.categoria_tema, old.descripcion_contenido);
+        END
+    """))
+    conexion.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS libros_fts_actualizar
+        AFTER UPDATE OF titulo_obra, autor_principal, categoria_tema, descripcion_contenido ON libros BEGIN
+            INSERT INTO libros_fts(libros_fts, rowid, titulo_obra, autor_principal, categoria_tema, descripcion_contenido)
+            VALUES ('delete', old.rowid, old.titulo_obra, old.autor_principal, old.categoria_tema, old.descripcion_contenido);
+            INSERT INTO libros_fts(rowid, titulo_obra, autor_principal, categoria_tema, descripcion_contenido)
+            VALUES (new.rowid, new.titulo_obra, new.autor_principal, new.categoria_tema, new.descripcion_contenido);
+        END
+    """))
+    # Indexar los libros que ya existían antes de la migración
+    conexion.execute(text("INSERT INTO libros_fts(libros_fts) VALUES ('rebuild')"))
+
+
+def _columna_existe(conexion: Connection, tabla: str, columna: str) -> bool:
+    return any(info["name"] == columna for info in inspect(conexion).get_columns(tabla))
+
+
+def _agregar_contador_prestamos_activos(conexion: Connection):
+    """Agrega miembros.prestamos_activos y lo calcula a partir de los préstamos existentes"""
+    if not _columna_existe(conexion, "miembros", "prestamos_activos"):
+        conexion.execute(text(
+            "ALTER TABLE miembros ADD COLUMN prestamos_activos INTEGER NOT NULL DEFAULT 0"
+        ))
+    conexion.execute(text("""
+        UPDATE miembros SET prestamos_activos = (
+            SELECT COUNT(*) FROM prestamos
+            WHERE prestamos.numero_miembro = miembros.numero_miembro
+              AND prestamos.estado_prestamo = 'Activo'
+        )
+    """))
+
+
+def _crear_indice_vencimientos(conexion: Connection):
+    """Índice para localizar préstamos activos o vencidos por fecha límite"""
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_prestamos_estado_fecha_limite ON prestamos (estado_prestamo, fecha_limite)"
+    ))
+
+
+# (nombre, tabla, columnas) de los índices compuestos de los filtros más usados
+INDICES_COMPUESTOS = [
+    ("ix_prestamos_miembro_estado", "prestamos", "numero_miembro, estado_prestamo"),
+    ("ix_prestamos_libro_estado", "prestamos", "codigo_libro, estado_prestamo"),
+    ("ix_miembros_biblioteca_activa", "miembros", "codigo_biblioteca, cuenta_activa"),
+    ("ix_libros_biblioteca_codigo", "libros", "codigo_biblioteca, codigo_libro"),
+]
+
+
+def _crear_indices_compuestos(conexion: Connection):
+    """Crea los índices compuestos de los filtros por biblioteca, miembro, libro y estado"""
+    for nombre, tabla, columnas in INDICES_COMPUESTOS:
+        conexion.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
+
+
+def _registrar_generaciones_cache(conexion: Connection):
+    """Crea la fila de generación de cada entidad en caché"""
+    for entidad in ("bibliotecas", "libros"):
+        existe = conexion.execute(
+            text("SELECT 1 FROM generaciones_cache WHERE nombre_entidad = :entidad"), {"entidad": entidad}
+        ).first()
+        if not existe:
+            conexion.execute(
+                text("INSERT INTO generaciones_cache (nombre_entidad, generacion) VALUES (:entidad, 0)"),
+                {"entidad": entidad}
+            )
+
+
+# Ajuste de los contadores por un libro: signo 1 al sumar la fila new, -1 al restar la old
+_AJUSTE_LIBRO = """
+    UPDATE estadisticas_biblioteca SET
+        total_titulos = total_titulos + {signo},
+        total_copias = total_copias + {signo} * COALESCE({fila}.cantidad_total, 0),
+        copias_disponibles = copias_disponibles + {signo} * COALESCE({fila}.cantidad_disponible, 0)
+    WHERE codigo_biblioteca = {fila}.codigo_biblioteca;
+"""
+
+# Ajuste por un préstamo; la biblioteca es la del libro prestado
+_AJUSTE_PRESTAMO = """
+    UPDATE estadisticas_biblioteca SET
+        prestamos_activos = prestamos_activos + {signo} * ({fila}.estado_prestamo = 'Activo'),
+        prestamos_vencidos = prestamos_vencidos + {signo} * ({fila}.estado_prestamo = 'Vencido'),
+        multas_acumuladas = multas_acumuladas + {signo} * COALESCE({fila}.multa_aplicada, 0)
+    WHERE codigo_biblioteca = (SELECT codigo_biblioteca FROM libros WHERE codigo_libro = {fila}.codigo_libro);
+"""
+
+TRIGGERS_ESTADISTICAS = {
+    "estadisticas_biblioteca_crear": "AFTER INSERT ON bibliotecas BEGIN "
+        "INSERT OR IGNORE INTO estadisticas_biblioteca (codigo_biblioteca, total_titulos, total_copias, "
+        "copias_disponibles, prestamos_activos, prestamos_vencidos, multas_acumuladas) "
+        "VALUES (new.codigo_biblioteca, 0, 0, 0, 0, 0, 0); END",
+    "estadisticas_biblioteca_eliminar": "AFTER DELETE ON bibliotecas BEGIN "
+        "DELETE FROM estadisticas_biblioteca WHERE codigo_biblioteca = old.codigo_biblioteca; END",
+    "estadisticas_libro_insertar": "AFTER INSERT ON libros BEGIN"
+        + _AJUSTE_LIBRO.format(signo=1, fila="new") + "END",
+    "estadisticas_libro_eliminar": "AFTER DELETE ON libros BEGIN"
+        + _AJUSTE_LIBRO.format(signo=-1, fila="old") + "END",
+    "estadisticas_libro_actualizar":
+        "AFTER UPDATE OF cantidad_total, cantidad_disponible, codigo_biblioteca ON libros BEGIN"
+        + _AJUSTE_LIBRO.format(signo=-1, fila="old") + _AJUSTE_LIBRO.format(signo=1, fila="new") + "END",
+    "estadisticas_prestamo_insertar": "AFTER INSERT ON prestamos BEGIN"
+        + _AJUSTE_PRESTAMO.format(signo=1, fila="new") + "END",
+    "estadisticas_prestamo_eliminar": "AFTER DELETE ON prestamos BEGIN"
+        + _AJUSTE_PRESTAMO.format(signo=-1, fila="old") + "END",
+    "estadisticas_prestamo_actualizar":
+        "AFTER UPDATE OF estado_prestamo, multa_aplicada, codigo_libro ON prestamos BEGIN"
+        + _AJUSTE_PRESTAMO.format(signo=-1, fila="old") + _AJUSTE_PRESTAMO.format(signo=1, fila="new") + "END",
+}
+
+
+def _crear_estadisticas_biblioteca(conexion: Connection):
+    """Triggers que mantienen estadisticas_biblioteca en la misma transacción de cada escritura y cálculo inicial"""
+    from ..repositories.estadisticas_repository import ContadoresBiblioteca
+
+    if conexion.dialect.name == "sqlite":
+        for nombre, definicion in TRIGGERS_ESTADISTICAS.items():
+            conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {definicion}"))
+    ContadoresBiblioteca.reconstruir(conexion)
+
+
+INDICES_AUTOCOMPLETADO = [
+    ("ix_libros_titulo_normalizado", "titulo_normalizado"),
+    ("ix_libros_biblioteca_titulo_normalizado", "codigo_biblioteca, titulo_normalizado"),
+    ("ix_libros_autor_normalizado", "autor_normalizado, autor_principal"),
+    ("ix_libros_biblioteca_autor_normalizado", "codigo_biblioteca, autor_normalizado, autor_principal"),
+]
+
+
+def _crear_columnas_autocompletado(conexion: Connection):
+    """Columnas normalizadas de título y autor, los triggers que las mantienen y sus índices de prefijo"""
+    from ..repositories.autocompletado_repository import AutocompletadoLibros
+
+    for columna, longitud in (("titulo_normalizado", 250), ("autor_normalizado", 150)):
+        if not _columna_existe(conexion, "libros", columna):
+            conexion.execute(text(f"ALTER TABLE libros ADD COLUMN {columna} VARCHAR({longitud})"))
+
+    # Un UPDATE por paso de normalización, cada uno sobre lo que dejó el anterior
+    actualizaciones = [
+        f"UPDATE libros SET titulo_normalizado = {titulo}, autor_normalizado = {autor}"
+        for titulo, autor in zip(
+            AutocompletadoLibros.pasos_normalizacion("{fila}titulo_obra", "titulo_normalizado"),
+            AutocompletadoLibros.pasos_normalizacion("{fila}autor_principal", "autor_normalizado"),
+        )
+    ]
+    if conexion.dialect.name == "sqlite":
+        cuerpo = " ".join(
+            actualizacion.replace("{fila}", "new.") + " WHERE rowid = new.rowid;" for actualizacion in actualizaciones
+        )
+        conexion.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS autocompletado_libro_insertar AFTER INSERT ON libros "
+            # La aplicación ya las calcula al insertar: solo faltan en escrituras externas
+            "WHEN (new.titulo_normalizado IS NULL AND new.titulo_obra IS NOT NULL) "
+            "OR (new.autor_normalizado IS NULL AND new.autor_principal IS NOT NULL) "
+            f"BEGIN {cuerpo} END"
+        ))
+        conexion.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS autocompletado_libro_actualizar "
+            f"AFTER UPDATE OF titulo_obra, autor_principal ON libros BEGIN {cuerpo} END"
+        ))
+    # Normalizar los libros existentes
+    for actualizacion in actualizaciones:
+        conexion.execute(text(actualizacion.replace("{fila}", "")))
+    for nombre, columnas in INDICES_AUTOCOMPLETADO:
+        conexion.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON libros ({columnas})"))
+
+
+# Evento de un libro para su biblioteca; condicion restringe cuándo se registra
+_EVENTO_LIBRO = """
+    INSERT INTO eventos_biblioteca (codigo_biblioteca, entidad, accion, codigo_libro, cantidad_disponible, fecha_evento)
+    SELECT {fila}.codigo_biblioteca, 'libro', '{accion}', {fila}.codigo_libro, {fila}.cantidad_disponible,
+           strftime('%Y-%m-%d %H:%M:%f', 'now')
+    WHERE {condicion};
+"""
+
+# Evento de un préstamo para la biblioteca del libro; si el libro ya no existe no se registra
+_EVENTO_PRESTAMO = """
+    INSERT INTO eventos_biblioteca (codigo_biblioteca, entidad, accion, codigo_libro, id_prestamo,
+                                    numero_miembro, estado_prestamo, fecha_limite, fecha_evento)
+    SELECT codigo_biblioteca, 'prestamo', '{accion}', {fila}.codigo_libro, {fila}.id_prestamo,
+           {fila}.numero_miembro, {fila}.estado_prestamo, {fila}.fecha_limite, strftime('%Y-%m-%d %H:%M:%f', 'now')
+    FROM libros WHERE codigo_libro = {fila}.codigo_libro;
+"""
+
+TRIGGERS_EVENTOS = {
+    "eventos_libro_insertar": "AFTER INSERT ON libros BEGIN"
+        + _EVENTO_LIBRO.format(fila="new", accion="creado", condicion="1") + "END",
+    "eventos_libro_eliminar": "AFTER DELETE ON libros BEGIN"
+        + _EVENTO_LIBRO.format(fila="old", accion="eliminado", condicion="1") + "END",
+    # Al cambiar de biblioteca el libro desaparece de la anterior
+    "eventos_libro_actualizar": "AFTER UPDATE OF cantidad_disponible, codigo_biblioteca ON libros "
+        "WHEN old.cantidad_disponible IS NOT new.cantidad_disponible "
+        "OR old.codigo_biblioteca IS NOT new.codigo_biblioteca BEGIN"
+        + _EVENTO_LIBRO.format(fila="old", accion="eliminado", condicion="old.codigo_biblioteca IS NOT new.codigo_biblioteca")
+        + _EVENTO_LIBRO.format(fila="new", accion="actualizado", condicion="1") + "END",
+    "eventos_prestamo_insertar": "AFTER INSERT ON prestamos BEGIN"
+        + _EVENTO_PRESTAMO.format(fila="new", accion="creado") + "END",
+    "eventos_prestamo_eliminar": "AFTER DELETE ON prestamos BEGIN"
+        + _EVENTO_PRESTAMO.format(fila="old", accion="eliminado") + "END",
+    "eventos_prestamo_actualizar": "AFTER UPDATE OF estado_prestamo, fecha_limite ON prestamos "
+        "WHEN old.estado_prestamo IS NOT new.estado_prestamo OR old.fecha_limite IS NOT new.fecha_limite BEGIN"
+        + _EVENTO_PRESTAMO.format(fila="new", accion="actualizado") + "END",
+}
+
+
+def _crear_eventos_biblioteca(conexion: Connection):
+    """Triggers que registran en eventos_biblioteca cada cambio de disponibilidad y de préstamos"""
+    if conexion.dialect.name != "sqlite":
+        return
+    for nombre, definicion in TRIGGERS_EVENTOS.items():
+        conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {definicion}"))
+
+
+# Columnas de LibroRespuesta que los triggers de la migración 8 no vigilan
+_COLUMNAS_DATOS_LIBRO = (
+    "codigo_libro", "titulo_obra", "autor_principal", "editorial_publicacion", "ano_publicacion", "categoria_tema",
+    "descripcion_contenido", "numero_paginas", "cantidad_total", "ubicacion_estante", "estado_conservacion",
+    "fecha_ingreso",
+)
+
+TRIGGERS_EVENTOS_DATOS = {
+    # Si también cambian las copias o la biblioteca ya registra el evento eventos_libro_actualizar
+    "eventos_libro_datos": f"AFTER UPDATE OF {', '.join(_COLUMNAS_DATOS_LIBRO)} ON libros "
+        "WHEN old.cantidad_disponible IS new.cantidad_disponible AND old.codigo_biblioteca IS new.codigo_biblioteca "
+        "AND (" + " OR ".join(f"old.{columna} IS NOT new.{columna}" for columna in _COLUMNAS_DATOS_LIBRO) + ") BEGIN"
+        + _EVENTO_LIBRO.format(fila="old", accion="eliminado", condicion="old.codigo_libro IS NOT new.codigo_libro")
+        + _EVENTO_LIBRO.format(fila="new", accion="actualizado", condicion="1") + "END",
+    # Al renombrar el libro el código anterior desaparece de la biblioteca
+    "eventos_libro_renombrar": "AFTER UPDATE OF codigo_libro ON libros "
+        "WHEN old.codigo_libro IS NOT new.codigo_libro AND old.codigo_biblioteca IS new.codigo_biblioteca "
+        "AND old.cantidad_disponible IS NOT new.cantidad_disponible BEGIN"
+        + _EVENTO_LIBRO.format(fila="old", accion="eliminado", condicion="1") + "END",
+}
+
+
+def _crear_eventos_datos_libro(conexion: Connection):
+    """Triggers que registran también los cambios de título, autor y demás datos de un libro"""
+    if conexion.dialect.name != "sqlite":
+        return
+    for nombre, definicion in TRIGGERS_EVENTOS_DATOS.items():
+        conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {definicion}"))
+
+
+def _crear_indice_fecha_solicitud(conexion: Connection):
+    """Índice para los reportes de préstamos por rango de fechas de solicitud"""
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_prestamos_fecha_solicitud ON prestamos (fecha_solicitud)"
+    ))
+
+
+# Una fila por palabra de título y autor salvo la primera, con el texto normalizado desde esa
+# palabra. Se parte en palabras con json_each porque los triggers no admiten CTE recursivas; la
+# posición de cada palabra es la suma de las longitudes anteriores más un espacio por cada una.
+# Tabuladores y saltos de línea cuentan como espacios; si aun así el JSON no es válido el libro
+# solo se sugiere por el comienzo del texto
+_INSERTAR_PALABRAS = """
+    INSERT INTO palabras_libros (campo, sufijo, valor, codigo_libro, codigo_biblioteca)
+    SELECT v.campo,
+           substr(v.texto, p.key + 1 + (SELECT total(length(a.value)) FROM json_each(v.arreglo) a WHERE a.key < p.key)),
+           v.texto, v.codigo_libro, v.codigo_biblioteca
+    FROM (SELECT campo, texto, codigo_libro, codigo_biblioteca,
+                 '["' || replace(replace(replace(texto, '\\', '\\\\'), '"', '\\"'), ' ', '","') || '"]' AS arreglo
+          FROM (SELECT 't' AS campo, {espacios_titulo} AS texto, codigo_libro, codigo_biblioteca FROM libros {filtro}
+                UNION ALL
+                SELECT 'a', {espacios_autor}, codigo_libro, codigo_biblioteca FROM libros {filtro})
+          WHERE texto IS NOT NULL AND codigo_biblioteca IS NOT NULL) v,
+         json_each(CASE WHEN json_valid(v.arreglo) THEN v.arreglo ELSE '[]' END) p
+    WHERE p.key > 0 AND p.value <> '';
+"""
+
+
+def _insertar_palabras(filtro: str) -> str:
+    espacios = "replace(replace(replace({columna}, char(9), ' '), char(10), ' '), char(13), ' ')"
+    return _INSERTAR_PALABRAS.format(
+        espacios_titulo=espacios.format(columna="titulo_normalizado"),
+        espacios_autor=espacios.format(columna="autor_normalizado"),
+        filtro=filtro,
+    )
+
+
+# Se leen las columnas de la fila ya guardada y no de new: los triggers de la migración 7
+# pueden normalizarlas después de este. Borrar antes de insertar hace que repetirlo no duplique
+_RECALCULAR_PALABRAS = (
+    " DELETE FROM palabras_libros WHERE codigo_libro = {fila}.codigo_libro;"
+    + _insertar_palabras("WHERE rowid = new.rowid")
+)
+
+TRIGGERS_PALABRAS = {
+    "palabras_libro_insertar": "AFTER INSERT ON libros BEGIN"
+        + _RECALCULAR_PALABRAS.format(fila="new") + "END",
+    "palabras_libro_actualizar":
+        "AFTER UPDATE OF titulo_normalizado, autor_normalizado, codigo_libro, codigo_biblioteca ON libros BEGIN"
+        + _RECALCULAR_PALABRAS.format(fila="old") + "END",
+    "palabras_libro_eliminar": "AFTER DELETE ON libros BEGIN "
+        "DELETE FROM palabras_libros WHERE codigo_libro = old.codigo_libro; END",
+}
+
+
+def _crear_palabras_libros(conexion: Connection):
+    """Triggers que mantienen palabras_libros para autocompletar desde cualquier palabra y carga inicial"""
+    if conexion.dialect.name != "sqlite":
+        return
+    for nombre, definicion in TRIGGERS_PALABRAS.items():
+        conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {definicion}"))
+    conexion.execute(text("DELETE FROM palabras_libros"))
+    conexion.execute(text(_insertar_palabras("")))
+
+
+
+# Préstamos de un libro, sumados a (signo 1) o restados de (-1) la biblioteca de esa fila. Los
+# préstamos se atribuyen a la biblioteca actual de su libro, como en ContadoresBiblioteca.reconstruir
+_AJUSTE_PRESTAMOS_LIBRO = """
+    UPDATE estadisticas_biblioteca SET
+        prestamos_activos = prestamos_activos + {signo} * (
+            SELECT count(*) FROM prestamos WHERE codigo_libro = {fila}.codigo_libro AND estado_prestamo = 'Activo'),
+        prestamos_vencidos = prestamos_vencidos + {signo} * (
+            SELECT count(*) FROM prestamos WHERE codigo_libro = {fila}.codigo_libro AND estado_prestamo = 'Vencido'),
+        multas_acumuladas = multas_acumuladas + {signo} * (
+            SELECT COALESCE(SUM(multa_aplicada), 0) FROM prestamos WHERE codigo_libro = {fila}.codigo_libro)
+    WHERE codigo_biblioteca = {fila}.codigo_biblioteca;
+"""
+
+TRIGGERS_ESTADISTICAS_MOVER = {
+    # Al cambiar de biblioteca (o de código) el historial del libro se va con él
+    "estadisticas_libro_mover": "AFTER UPDATE OF codigo_biblioteca, codigo_libro ON libros "
+        "WHEN old.codigo_biblioteca IS NOT new.codigo_biblioteca OR old.codigo_libro IS NOT new.codigo_libro BEGIN"
+        + _AJUSTE_PRESTAMOS_LIBRO.format(signo=-1, fila="old")
+        + _AJUSTE_PRESTAMOS_LIBRO.format(signo=1, fila="new") + "END",
+}
+
+
+def _mover_prestamos_estadisticas(conexion: Connection):
+    """Trigger que lleva los préstamos y multas de un libro a su nueva biblioteca y recálculo de los contadores"""
+    from ..repositories.estadisticas_repository import ContadoresBiblioteca
+
+    if conexion.dialect.name == "sqlite":
+        for nombre, definicion in TRIGGERS_ESTADISTICAS_MOVER.items():
+            conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {definicion}"))
+    # Los libros movidos antes de esta migración dejaron sus préstamos en la biblioteca anterior
+    ContadoresBiblioteca.reconstruir(conexion)
+
+
+# (version, descripcion, funcion) en orden de aplicación
+MIGRACIONES = [
+    (1, "Índice de búsqueda de texto completo para libros", _crear_indice_busqueda),
+    (2, "Contador de préstamos activos por miembro", _agregar_contador_prestamos_activos),
+    (3, "Índice de préstamos por estado y fecha límite", _crear_indice_vencimientos),
+    (4, "Índices compuestos de préstamos, miembros y libros", _crear_indices_compuestos),
+    (5, "Generaciones de la caché de lectura", _registrar_generaciones_cache),
+    (6, "Contadores de estadísticas por biblioteca", _crear_estadisticas_biblioteca),
+    (7, "Columnas normalizadas para el autocompletado de libros", _crear_columnas_autocompletado),
+    (8, "Registro de eventos de disponibilidad y préstamos por biblioteca", _crear_eventos_biblioteca),
+    (9, "Eventos de cambios en los datos de los libros", _crear_eventos_datos_libro),
+    (10, "Índice de préstamos por fecha de solicitud", _crear_indice_fecha_solicitud),
+    (11, "Palabras de títulos y autores para el autocompletado", _crear_palabras_libros),
+    (12, "Préstamos de un libro al cambiar de biblioteca en las estadísticas", _mover_prestamos_estadisticas),
+]
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+
+def version_actual(motor: Engine) -> int:
+    """Última migración aplicada en la base (0 si nunca se migró)"""
+    with motor.connect() as conexion:
+        if not inspect(conexion).has_table("version_esquema"):
+            return 0
+        return conexion.execute(select(func.max(version_esquema.c.version))).scalar() or 0
+
+
+def aplicar_migraciones(motor: Engine) -> list:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas"""
+    aplicadas = []
+    with motor.begin() as conexion:
+        metadatos_migraciones.create_all(bind=conexion)
+        versiones_existentes = set(conexion.execute(select(version_esquema.c.version)).scalars())
+
+        for version, descripcion, funcion in MIGRACIONES:
+            if version in versiones_existentes:
+                continue
+            funcion(conexion)
+            conexion.execute(insert(version_esquema).values(
+                version=version,
+                descripcion=descripcion,
+                fecha_aplicacion=datetime.now(timezone.utc)
+            ))
+            aplicadas.append(version)
+    return aplicadas
+
+
+def migrar(motor: Engine) -> list:
+    """Crea las tablas que falten y aplica las migraciones pendientes.
+
+    Es el paso explícito de despliegue (python -m backend.cli migrar); la API solo
+    comprueba la versión al iniciar para no inspeccionar el esquema en cada arranque.
+    """
+    from .db import ModeloBase
+    from . import models  # registra las tablas en los metadatos
+
+    ModeloBase.metadata.create_all(bind=motor)
+    return aplicar_migraciones(motor)
+
+
+
+def migrar_fragmento(motor: Engine, fragmento: int) -> list:
+    """Migra la base de un fragmento y hace que sus miembros y préstamos se numeren desde su rango"""
+    from .db import RANGO_IDS_FRAGMENTO
+
+    aplicadas = migrar(motor)
+    with motor.begin() as conexion:
+        # Con AUTOINCREMENT el siguiente id es el mayor entre sqlite_sequence y los ids existentes
+        for tabla in ("miembros", "prestamos"):
+            conexion.execute(text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT :tabla, :inicio "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :tabla)"
+            ), {"tabla": tabla, "inicio": fragmento * RANGO_IDS_FRAGMENTO})
+    return aplicadas
+
+
+def bases_del_sistema() -> List[Tuple[Optional[int], Engine]]:
+    """(fragmento, motor) de la base global (fragmento None) y de cada fragmento si están activos"""
+    from .db import fragmentos_de_datos, motor, motor_fragmento
+
+    return [(None, motor)] + [
+        (fragmento, motor_fragmento(fragmento)) for fragmento in fragmentos_de_datos() if fragmento is not None
+    ]
+
+
+def migrar_sistema() -> List[Tuple[Optional[int], list]]:
+    """Migra la base global y los fragmentos; devuelve (fragmento, versiones aplicadas) de cada base"""
+    return [
+        (fragmento, migrar(motor) if fragmento is None else migrar_fragmento(motor, fragmento))
+        for fragmento, motor in bases_del_sistema()
+    ]
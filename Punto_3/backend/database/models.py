@@ -1,8 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from .db import ModeloBase
 
+
+def normalizado_de(columna: str):
+    """Default que normaliza otra columna de la misma fila al insertar (también en INSERT por lotes)"""
+    def calcular(contexto):
+        from ..repositories.autocompletado_repository import AutocompletadoLibros
+        return AutocompletadoLibros.normalizar(contexto.get_current_parameters().get(columna))
+    return calcular
+
+
 class Biblioteca(ModeloBase):
     __tablename__ = "bibliotecas"
     
@@ -32,10 +41,19 @@ class Miembro(ModeloBase):
     codigo_biblioteca = Column(Integer, ForeignKey("bibliotecas.codigo_biblioteca"), nullable=False)
     cuenta_activa = Column(Boolean, default=True)
     limite_prestamos = Column(Integer, default=3)
+    # Préstamos sin devolver (activos o vencidos), mantenido por GestorBiblioteca al prestar y devolver
+    prestamos_activos = Column(Integer, default=0, server_default="0", nullable=False)
     
     # relacion
     biblioteca_origen = relationship("Biblioteca", back_populates="miembros_asociados")
     historial_prestamos = relationship("Prestamo", back_populates="miembro_solicitante")
+    
+    __table_args__ = (
+        # Miembros activos por biblioteca
+        Index("ix_miembros_biblioteca_activa", "codigo_biblioteca", "cuenta_activa"),
+        # Los números no se reutilizan y en cada fragmento empiezan en su propio rango (migrar_fragmento)
+        {"sqlite_autoincrement": True},
+    )
 
 
 class Libro(ModeloBase):
@@ -61,10 +79,25 @@ class Libro(ModeloBase):
         nullable=False
     )
     fecha_ingreso = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Título y autor en minúsculas y sin acentos para el autocompletado. Se calculan al insertar;
+    # los triggers de la migración 7 cubren las actualizaciones y los INSERT hechos por SQL directo
+    titulo_normalizado = Column(String(250), default=normalizado_de("titulo_obra"))
+    autor_normalizado = Column(String(150), default=normalizado_de("autor_principal"))
     
     # relacion
     biblioteca_propietaria = relationship("Biblioteca", back_populates="inventario_libros")
     registros_prestamo = relationship("Prestamo", back_populates="libro_prestado")
+    
+    __table_args__ = (
+        # Inventario por biblioteca, ordenado por código para la paginación
+        Index("ix_libros_biblioteca_codigo", "codigo_biblioteca", "codigo_libro"),
+        # Autocompletado por prefijo, en todo el catálogo o por biblioteca; los de autor
+        # incluyen el nombre para resolver las sugerencias sin leer la tabla
+        Index("ix_libros_titulo_normalizado", "titulo_normalizado"),
+        Index("ix_libros_biblioteca_titulo_normalizado", "codigo_biblioteca", "titulo_normalizado"),
+        Index("ix_libros_autor_normalizado", "autor_normalizado", "autor_principal"),
+        Index("ix_libros_biblioteca_autor_normalizado", "codigo_biblioteca", "autor_normalizado", "autor_principal"),
+    )
 
 
 class Prestamo(ModeloBase):
@@ -77,6 +110,8 @@ class Prestamo(ModeloBase):
     fecha_limite = Column(DateTime, nullable=False)
     fecha_devolucion = Column(DateTime, nullable=True)
     ESTADO_PRESTAMO_ENUM = ("Activo", "Devuelto", "Vencido")
+    # Préstamos cuyo libro sigue en manos del miembro
+    ESTADOS_PENDIENTES = ("Activo", "Vencido")
     estado_prestamo = Column(
         Enum(*ESTADO_PRESTAMO_ENUM, name="estado_prestamo_enum"),
         default="Activo",
@@ -88,3 +123,121 @@ class Prestamo(ModeloBase):
     # relacion
     miembro_solicitante = relationship("Miembro", back_populates="historial_prestamos")
     libro_prestado = relationship("Libro", back_populates="registros_prestamo")
+    
+    __table_args__ = (
+        # Barrido de vencimientos: préstamos activos por fecha límite
+        Index("ix_prestamos_estado_fecha_limite", "estado_prestamo", "fecha_limite"),
+        # Historial y préstamos pendientes por miembro
+        Index("ix_prestamos_miembro_estado", "numero_miembro", "estado_prestamo"),
+        # Préstamos pendientes de un libro antes de modificarlo o eliminarlo
+        Index("ix_prestamos_libro_estado", "codigo_libro", "estado_prestamo"),
+        # Reportes de préstamos por rango de fechas de solicitud
+        Index("ix_prestamos_fecha_solicitud", "fecha_solicitud"),
+        # Los ids no se reutilizan y en cada fragmento empiezan en su propio rango (migrar_fragmento)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class TrabajoEliminacion(ModeloBase):
+    __tablename__ = "trabajos_eliminacion"
+    
+    id_trabajo = Column(Integer, primary_key=True, index=True)
+    tipo_objetivo = Column(String(20), nullable=False)  # "biblioteca"
+    codigo_objetivo = Column(String(20), nullable=False)
+    ESTADO_TRABAJO_ENUM = ("Pendiente", "En curso", "Completado", "Fallido")
+    ESTADOS_ABIERTOS = ("Pendiente", "En curso")
+    estado_trabajo = Column(
+        Enum(*ESTADO_TRABAJO_ENUM, name="estado_trabajo_enum"),
+        default="Pendiente",
+        nullable=False
+    )
+    total_filas = Column(Integer, default=0)
+    filas_eliminadas = Column(Integer, default=0)
+    detalle_error = Column(Text)
+    fecha_creacion = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    fecha_actualizacion = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index("ix_trabajos_objetivo_estado", "tipo_objetivo", "codigo_objetivo", "estado_trabajo"),
+    )
+
+
+class GeneracionCache(ModeloBase):
+    __tablename__ = "generaciones_cache"
+    
+    # Se incrementa en la misma transacción que modifica la entidad; las cachés de
+    # todos los procesos descartan lo leído con una generación anterior
+    nombre_entidad = Column(String(50), primary_key=True)
+    generacion = Column(Integer, default=0, nullable=False)
+
+
+class EstadisticaBiblioteca(ModeloBase):
+    __tablename__ = "estadisticas_biblioteca"
+    
+    # Contadores mantenidos por triggers en la misma transacción que modifica libros y
+    # préstamos (migración 6); se recalculan con python -m backend.cli estadisticas
+    codigo_biblioteca = Column(Integer, ForeignKey("bibliotecas.codigo_biblioteca"), primary_key=True)
+    total_titulos = Column(Integer, default=0, nullable=False)
+    total_copias = Column(Integer, default=0, nullable=False)
+    copias_disponibles = Column(Integer, default=0, nullable=False)
+    prestamos_activos = Column(Integer, default=0, nullable=False)
+    prestamos_vencidos = Column(Integer, default=0, nullable=False)
+    multas_acumuladas = Column(Integer, default=0, nullable=False)
+
+
+class PalabraLibro(ModeloBase):
+    __tablename__ = "palabras_libros"
+
+    # Título y autor normalizados desde cada palabra que no es la primera, mantenidos por
+    # triggers (migración 11): el autocompletado encuentra "garc" en "gabriel garcia marquez"
+    id_palabra = Column(Integer, primary_key=True)
+    campo = Column(String(1), nullable=False)  # "t" título o "a" autor
+    sufijo = Column(String(250), nullable=False)
+    valor = Column(String(250), nullable=False)  # el texto normalizado completo
+    codigo_libro = Column(String(20), nullable=False)
+    codigo_biblioteca = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Con el valor, los autores distintos que comparten apellido se recorren uno a uno
+        Index("ix_palabras_libros_sufijo", "campo", "sufijo", "valor"),
+        Index("ix_palabras_libros_biblioteca_sufijo", "codigo_biblioteca", "campo", "sufijo", "valor"),
+        Index("ix_palabras_libros_libro", "codigo_libro"),
+    )
+
+
+class EventoBiblioteca(ModeloBase):
+    __tablename__ = "eventos_biblioteca"
+    
+    # Cambios de disponibilidad y de préstamos registrados por triggers en la misma transacción
+    # que los produce (migración 8). El id solo crece, también después de podar, y sirve
+    # para reanudar el flujo SSE de una biblioteca con Last-Event-ID
+    id_evento = Column(Integer, primary_key=True)
+    codigo_biblioteca = Column(Integer, nullable=False)
+    entidad = Column(String(20), nullable=False)  # "libro" o "prestamo"
+    accion = Column(String(20), nullable=False)  # "creado", "actualizado" o "eliminado"
+    codigo_libro = Column(String(20), nullable=False)
+    cantidad_disponible = Column(Integer)
+    id_prestamo = Column(Integer)
+    numero_miembro = Column(Integer)
+    estado_prestamo = Column(String(20))
+    fecha_limite = Column(DateTime)
+    fecha_evento = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    
+    __table_args__ = (
+        # Eventos de una biblioteca posteriores al último recibido
+        Index("ix_eventos_biblioteca_id", "codigo_biblioteca", "id_evento"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class DirectorioLibro(ModeloBase):
+    __tablename__ = "directorio_libros"
+    
+    # Solo se usa con fragmentación (BIBLIOTECA_FRAGMENTOS) y vive en la base global: reserva
+    # cada código de libro en todo el sistema y dice en qué biblioteca, y así en qué fragmento, está
+    codigo_libro = Column(String(20), primary_key=True)
+    codigo_biblioteca = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_directorio_libros_biblioteca", "codigo_biblioteca"),
+    )
@@ -1,29 +1,89 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime, timedelta
-from backend.database.db import motor, ModeloBase
-from backend.services.main import router as service_router
-
-app = FastAPI(
-    title="Sistema de Gestión de Bibliotecas",
-    description="API para gestionar múltiples bibliotecas, miembros y préstamos",
-    version="0.0.1"
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Crear tablas
-ModeloBase.metadata.create_all(bind=motor)
-
-app.include_router(service_router)
\ No newline at end of file
+from backend import configuracion
+
+
+def preparar_esquema():
+    """Aplica las migraciones si BIBLIOTECA_MIGRAR_AL_INICIAR lo pide; si no, solo comprueba la versión"""
+    from backend.database.migraciones import ULTIMA_VERSION, bases_del_sistema, migrar_sistema, version_actual
+
+    if configuracion.MIGRAR_AL_INICIAR:
+        migrar_sistema()
+        return
+    for fragmento, motor in bases_del_sistema():
+        version = version_actual(motor)
+        if version < ULTIMA_VERSION:
+            base = "de la base global" if fragmento is None else f"del fragmento {fragmento}"
+            raise RuntimeError(
+                f"El esquema {base} está en la versión {version} y la aplicación necesita la {ULTIMA_VERSION}: "
+                "ejecute 'python -m backend.cli migrar' o defina BIBLIOTECA_MIGRAR_AL_INICIAR=1"
+            )
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    from starlette.concurrency import run_in_threadpool
+    from backend.services.eliminaciones import reanudar_eliminaciones
+    from backend.services.escrituras import canal_escrituras
+    from backend.services.eventos import poda_periodica
+    from backend.services.modelo_lectura import modelo_catalogo
+    from backend.services.vencimientos import barrido_periodico
+
+    await run_in_threadpool(preparar_esquema)
+    tareas = [asyncio.create_task(run_in_threadpool(reanudar_eliminaciones))]
+    if configuracion.MODELO_LECTURA:
+        # Carga completa antes de aceptar solicitudes; después se sigue el registro de eventos
+        await run_in_threadpool(modelo_catalogo.iniciar)
+        tareas.append(asyncio.create_task(modelo_catalogo.sincronizacion_periodica(configuracion.MODELO_LECTURA_INTERVALO)))
+    if configuracion.INTERVALO_VENCIMIENTOS > 0:
+        tareas.append(asyncio.create_task(barrido_periodico(configuracion.INTERVALO_VENCIMIENTOS)))
+    if configuracion.EVENTOS_INTERVALO_PODA > 0:
+        tareas.append(asyncio.create_task(poda_periodica(configuracion.EVENTOS_INTERVALO_PODA)))
+    if configuracion.ESCRITURA_AGRUPADA:
+        tareas.append(asyncio.create_task(canal_escrituras.escribir(
+            configuracion.ESCRITURA_VENTANA_MS / 1000, configuracion.ESCRITURA_LOTE
+        )))
+    yield
+    for tarea in tareas:
+        tarea.cancel()
+    modelo_catalogo.detener()
+
+
+def crear_app() -> FastAPI:
+    """Construye la aplicación. Los routers y el motor se importan aquí y no al importar el módulo"""
+    from backend.services.main import router as service_router
+
+    app = FastAPI(
+        title="Sistema de Gestión de Bibliotecas",
+        description="API para gestionar múltiples bibliotecas, miembros y préstamos",
+        version="0.0.1",
+        lifespan=ciclo_de_vida
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Siguiente-Cursor"],
+    )
+
+    # Latencia, sentencias SQL y espera por el pool de cada solicitud, expuestas en /metrics
+    if configuracion.METRICAS_ACTIVAS:
+        from backend.services.metricas import MiddlewareMetricas
+
+        app.add_middleware(MiddlewareMetricas)
+
+    app.include_router(service_router)
+    return app
+
+
+def __getattr__(nombre: str):
+    # "backend.main:app" sigue funcionando: la app se crea en el primer acceso y queda en el módulo
+    if nombre == "app":
+        globals()["app"] = crear_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
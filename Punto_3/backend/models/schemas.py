@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import  Optional
+from typing import  List, Optional
 from datetime import datetime
 
 
@@ -67,6 +67,15 @@ class LibroRespuesta(LibroBase):
         from_attributes = True
 
 
+class SugerenciaTitulo(BaseModel):
+    codigo_libro: str
+    titulo_obra: str
+
+class SugerenciasAutocompletado(BaseModel):
+    titulos: List[SugerenciaTitulo] = []
+    autores: List[str] = []
+
+
 class PrestamoBase(BaseModel):
     numero_miembro: int
     codigo_libro: str
@@ -88,4 +97,83 @@ class PrestamoRespuesta(BaseModel):
     multa_aplicada: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class PrestamoExpandido(PrestamoRespuesta):
+    """Préstamo con el libro y el miembro incluidos cuando se piden con expand"""
+    libro: Optional[LibroRespuesta] = None
+    miembro: Optional[MiembroRespuesta] = None
+
+
+class PrestamoLote(BaseModel):
+    prestamos: List[PrestamoCrear] = Field(..., min_length=1, max_length=500)
+
+class DevolucionLote(BaseModel):
+    ids_prestamo: List[int] = Field(..., min_length=1, max_length=500)
+
+class ResultadoLote(BaseModel):
+    indice: int
+    exito: bool
+    codigo_estado: int
+    id_prestamo: Optional[int] = None
+    multa: Optional[int] = None
+    error: Optional[str] = None
+
+class RespuestaLote(BaseModel):
+    exitosos: int
+    fallidos: int
+    resultados: List[ResultadoLote]
+
+
+class ErrorImportacion(BaseModel):
+    fila: int
+    error: str
+
+class ResumenImportacion(BaseModel):
+    procesadas: int = 0
+    insertadas: int = 0
+    total_errores: int = 0
+    errores: List[ErrorImportacion] = []
+
+
+class TrabajoRespuesta(BaseModel):
+    id_trabajo: int
+    tipo_objetivo: str
+    codigo_objetivo: str
+    estado_trabajo: str
+    total_filas: int
+    filas_eliminadas: int
+    detalle_error: Optional[str]
+    fecha_creacion: datetime
+    fecha_actualizacion: datetime
+    
+    class Config:
+        from_attributes = True
+
+class EstadisticasBibliotecaRespuesta(BaseModel):
+    codigo_biblioteca: int
+    total_titulos: int
+    total_copias: int
+    copias_disponibles: int
+    prestamos_activos: int
+    prestamos_vencidos: int
+    multas_acumuladas: int
+    
+    class Config:
+        from_attributes = True
+
+
+class EventoBibliotecaRespuesta(BaseModel):
+    id_evento: int
+    entidad: str
+    accion: str
+    codigo_libro: str
+    cantidad_disponible: Optional[int] = None
+    id_prestamo: Optional[int] = None
+    numero_miembro: Optional[int] = None
+    estado_prestamo: Optional[str] = None
+    fecha_limite: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,207 @@
+import heapq
+from sqlalchemy import case, func, or_, text
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database.models import Libro
+
+
+# Letras acentuadas que se reducen a su base; el resto del ASCII en mayúscula se pasa a minúscula.
+# La misma tabla genera la expresión SQL de los triggers y la normalización del prefijo en Python,
+# así que ambos lados coinciden sin depender de funciones propias registradas en SQLite
+ACENTOS = {
+    "a": "áàâäãÁÀÂÄÃ", "e": "éèêëÉÈÊË", "i": "íìîïÍÌÎÏ", "o": "óòôöõÓÒÔÖÕ",
+    "u": "úùûüÚÙÛÜ", "n": "ñÑ", "c": "çÇ",
+}
+TABLA_NORMALIZACION = str.maketrans(
+    {letra: base for base, letras in ACENTOS.items() for letra in letras}
+    | {chr(codigo): chr(codigo + 32) for codigo in range(ord("A"), ord("Z") + 1)}
+)
+REEMPLAZOS = [(letra, base) for base, letras in ACENTOS.items() for letra in letras]
+# El parser de SQLite admite pocas funciones anidadas: los replace() se reparten en pasos
+REEMPLAZOS_POR_PASO = 16
+# Mayor que cualquier continuación del prefijo al comparar texto
+FIN_PREFIJO = "\U0010ffff"
+
+
+def _consultas(plantilla: str) -> dict:
+    """Sentencia global y por biblioteca, preparadas una sola vez: la latencia se va en SQLite y no en armarlas"""
+    return {
+        False: text(plantilla.format(filtro_biblioteca="")),
+        True: text(plantilla.format(filtro_biblioteca="codigo_biblioteca = :codigo_biblioteca AND")),
+    }
+
+
+CONSULTA_TITULOS = _consultas("""
+    SELECT codigo_libro, titulo_obra FROM libros
+    WHERE {filtro_biblioteca} titulo_normalizado >= :desde AND titulo_normalizado < :hasta
+    ORDER BY titulo_normalizado LIMIT :limite
+""")
+# Muchos libros comparten autor: en lugar de agrupar todas sus filas se salta de un
+# autor distinto al siguiente con una búsqueda en el índice por cada sugerencia
+CONSULTA_AUTORES = _consultas("""
+    WITH RECURSIVE siguiente(autor) AS (
+        SELECT (SELECT autor_normalizado FROM libros
+                WHERE {filtro_biblioteca} autor_normalizado >= :desde AND autor_normalizado < :hasta
+                ORDER BY autor_normalizado LIMIT 1)
+        UNION ALL
+        SELECT (SELECT autor_normalizado FROM libros
+                WHERE {filtro_biblioteca} autor_normalizado > siguiente.autor AND autor_normalizado < :hasta
+                ORDER BY autor_normalizado LIMIT 1)
+        FROM siguiente WHERE siguiente.autor IS NOT NULL
+        LIMIT :limite
+    )
+    SELECT (SELECT autor_principal FROM libros
+            WHERE {filtro_biblioteca} autor_normalizado = siguiente.autor LIMIT 1)
+    FROM siguiente WHERE siguiente.autor IS NOT NULL
+""")
+# Los mismos recorridos sobre palabras_libros encuentran el texto al comienzo de cualquier otra
+# palabra. Un título puede repetirse si dos de sus palabras empiezan igual: se piden de más
+CONSULTA_TITULOS_PALABRAS = _consultas("""
+    SELECT codigo_libro, (SELECT titulo_obra FROM libros WHERE libros.codigo_libro = palabras_libros.codigo_libro)
+    FROM palabras_libros
+    WHERE {filtro_biblioteca} campo = 't' AND sufijo >= :desde AND sufijo < :hasta
+    ORDER BY sufijo LIMIT :limite_palabras
+""")
+# Varios autores comparten apellido: se salta de un (sufijo, valor) distinto al siguiente
+# arrastrando el id de la fila, porque la subconsulta escalar devuelve una sola columna. El
+# siguiente valor con el mismo sufijo y el siguiente sufijo son dos búsquedas estrictas en el
+# índice, sin recorrer los libros repetidos del mismo autor
+CONSULTA_AUTORES_PALABRAS = _consultas("""
+    WITH RECURSIVE siguiente(id_palabra) AS (
+        SELECT (SELECT id_palabra FROM palabras_libros
+                WHERE {filtro_biblioteca} campo = 'a' AND sufijo >= :desde AND sufijo < :hasta
+                ORDER BY sufijo, valor LIMIT 1)
+        UNION ALL
+        SELECT coalesce(
+            (SELECT id_palabra FROM palabras_libros
+             WHERE {filtro_biblioteca} campo = 'a' AND sufijo = anterior.sufijo AND valor > anterior.valor
+             ORDER BY valor LIMIT 1),
+            (SELECT id_palabra FROM palabras_libros
+             WHERE {filtro_biblioteca} campo = 'a' AND sufijo > anterior.sufijo AND sufijo < :hasta
+             ORDER BY sufijo, valor LIMIT 1))
+        FROM siguiente JOIN palabras_libros AS anterior USING (id_palabra)
+        LIMIT :limite_palabras
+    )
+    SELECT (SELECT autor_principal FROM libros WHERE codigo_libro = palabras_libros.codigo_libro)
+    FROM siguiente JOIN palabras_libros USING (id_palabra)
+""")
+
+
+class AutocompletadoLibros:
+
+    @staticmethod
+    def normalizar(texto: Optional[str]) -> Optional[str]:
+        """Minúsculas y sin acentos, igual que pasos_normalizacion en la base de datos"""
+        return texto.translate(TABLA_NORMALIZACION).strip(" ") if texto is not None else None
+
+    @staticmethod
+    def pasos_normalizacion(columna: str, destino: str) -> List[str]:
+        """Expresiones SQL que, asignadas en orden a destino, equivalen a normalizar() sobre columna"""
+        pasos = []
+        for desde in range(0, len(REEMPLAZOS), REEMPLAZOS_POR_PASO):
+            expresion = destino if pasos else f"lower({columna})"
+            for letra, base in REEMPLAZOS[desde:desde + REEMPLAZOS_POR_PASO]:
+                expresion = f"replace({expresion}, '{letra}', '{base}')"
+            pasos.append(expresion)
+        pasos[-1] = f"trim({pasos[-1]})"
+        return pasos
+
+    @staticmethod
+    def usa_indice(sesion: Session) -> bool:
+        """Las columnas normalizadas se mantienen con triggers solo en SQLite"""
+        return sesion.get_bind().dialect.name == "sqlite"
+
+    @staticmethod
+    def sugerir(sesion: Session, texto: str, codigo_biblioteca: Optional[int] = None, limite: int = 10) -> dict:
+        """Títulos y autores que empiezan por el texto y, detrás, los que lo tienen al comienzo de otra palabra.
+
+        Cada lista es un recorrido por rango de un índice sobre la columna normalizada (y si
+        faltan sugerencias, sobre palabras_libros) que se detiene al llegar al límite, sin
+        importar el tamaño del catálogo.
+        """
+        prefijo = AutocompletadoLibros.normalizar(texto).lstrip(" ")
+        if not prefijo:
+            return {"titulos": [], "autores": []}
+        if not AutocompletadoLibros.usa_indice(sesion):
+            return AutocompletadoLibros.sugerir_sin_indice(sesion, prefijo, codigo_biblioteca, limite)
+
+        parametros = {
+            "desde": prefijo, "hasta": prefijo + FIN_PREFIJO, "limite": limite, "limite_palabras": 2 * limite,
+            "codigo_biblioteca": codigo_biblioteca,
+        }
+        por_biblioteca = bool(codigo_biblioteca)
+        titulos = {
+            codigo: titulo for codigo, titulo in sesion.execute(CONSULTA_TITULOS[por_biblioteca], parametros)
+        }
+        if len(titulos) < limite:
+            for codigo, titulo in sesion.execute(CONSULTA_TITULOS_PALABRAS[por_biblioteca], parametros):
+                titulos.setdefault(codigo, titulo)
+        autores = {}
+        for consulta in (CONSULTA_AUTORES, CONSULTA_AUTORES_PALABRAS):
+            if len(autores) >= limite:
+                break
+            for autor in sesion.execute(consulta[por_biblioteca], parametros).scalars():
+                autores.setdefault(AutocompletadoLibros.normalizar(autor), autor)
+        return {
+            "titulos": [{"codigo_libro": codigo, "titulo_obra": titulo} for codigo, titulo in titulos.items()][:limite],
+            "autores": list(autores.values())[:limite],
+        }
+
+    @staticmethod
+    def orden_sugerencia(texto: str, prefijo: str) -> tuple:
+        """Clave del orden de sugerir: primero lo que empieza por el prefijo, luego por la palabra que coincide"""
+        normalizado = AutocompletadoLibros.normalizar(texto)
+        if normalizado.startswith(prefijo):
+            return (0, normalizado)
+        sufijos = [
+            normalizado[posicion + 1:] for posicion, letra in enumerate(normalizado)
+            if letra in " \t\n\r" and normalizado.startswith(prefijo, posicion + 1)
+        ]
+        return (1, min(sufijos, default=normalizado))
+
+    @staticmethod
+    def mezclar_sugerencias(resultados: List[dict], texto: str, limite: int) -> dict:
+        """Une las sugerencias de varios fragmentos en el orden de sugerir, sin autores repetidos"""
+        prefijo = AutocompletadoLibros.normalizar(texto).lstrip(" ")
+        titulos = heapq.merge(
+            *[resultado["titulos"] for resultado in resultados],
+            key=lambda titulo: AutocompletadoLibros.orden_sugerencia(titulo["titulo_obra"], prefijo)
+        )
+        autores = {}
+        for autor in heapq.merge(
+            *[resultado["autores"] for resultado in resultados],
+            key=lambda autor: AutocompletadoLibros.orden_sugerencia(autor, prefijo)
+        ):
+            autores.setdefault(AutocompletadoLibros.normalizar(autor), autor)
+            if len(autores) == limite:
+                break
+        return {"titulos": list(titulos)[:limite], "autores": list(autores.values())}
+
+    @staticmethod
+    def sugerir_sin_indice(sesion: Session, prefijo: str, codigo_biblioteca: Optional[int], limite: int) -> dict:
+        """Autocompletado con LIKE para motores sin las columnas normalizadas mantenidas por triggers"""
+        patron = prefijo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        titulo_minusculas, autor_minusculas = func.lower(Libro.titulo_obra), func.lower(Libro.autor_principal)
+
+        def coincide(columna):
+            return or_(columna.like(patron, escape="\\"), columna.like("% " + patron, escape="\\"))
+
+        def orden(columna):
+            # Como en sugerir: primero lo que empieza por el prefijo
+            return case((columna.like(patron, escape="\\"), 0), else_=1)
+
+        titulos = sesion.query(Libro.codigo_libro, Libro.titulo_obra).filter(coincide(titulo_minusculas))
+        autores = sesion.query(Libro.autor_principal).filter(coincide(autor_minusculas))
+        if codigo_biblioteca:
+            titulos = titulos.filter(Libro.codigo_biblioteca == codigo_biblioteca)
+            autores = autores.filter(Libro.codigo_biblioteca == codigo_biblioteca)
+        return {
+            "titulos": [
+                {"codigo_libro": codigo, "titulo_obra": titulo}
+                for codigo, titulo in titulos.order_by(orden(titulo_minusculas), Libro.titulo_obra).limit(limite)
+            ],
+            "autores": [
+                autor for (autor,) in autores.group_by(Libro.autor_principal)
+                .order_by(orden(autor_minusculas), Libro.autor_principal).limit(limite)
+            ],
+        }
@@ -1,12 +1,20 @@
 from fastapi import  HTTPException
+from sqlalchemy import Integer, bindparam, case, cast, func, insert, or_, select, update
 from sqlalchemy.orm import  Session
+from collections import Counter
 from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Optional
+from .fragmentos_repository import DirectorioFragmentos
+from ..database.db import fragmentacion_activa
 from ..database.models import  Miembro, Libro, Prestamo
-from ..models.schemas import PrestamoCrear
+from ..models.schemas import PrestamoCrear, ResultadoLote
 
 
 class GestorBiblioteca:
     
+    MULTA_POR_DIA = 1000  # $1000 por día de retraso
+    
     @staticmethod
     def verificar_pertenencia_biblioteca(sesion: Session, numero_miembro: int, codigo_biblioteca: int) -> bool:
         """Verifica si un miembro pertenece a una biblioteca específica"""
@@ -15,11 +23,11 @@ class GestorBiblioteca:
     
     @staticmethod
     def contar_prestamos_activos(sesion: Session, numero_miembro: int) -> int:
-        """Cuenta los préstamos activos de un miembro"""
-        return sesion.query(Prestamo).filter(
-            Prestamo.numero_miembro == numero_miembro,
-            Prestamo.estado_prestamo == "Activo"
-        ).count()
+        """Cuenta los préstamos sin devolver (activos o vencidos) de un miembro"""
+        prestamos_activos = sesion.query(Miembro.prestamos_activos).filter(
+            Miembro.numero_miembro == numero_miembro
+        ).scalar()
+        return prestamos_activos or 0
     
     @staticmethod
     def verificar_disponibilidad_libro(sesion: Session, codigo_libro: str) -> bool:
@@ -28,37 +36,99 @@ class GestorBiblioteca:
         return libro and libro.cantidad_disponible > 0
     
     @staticmethod
-    def procesar_prestamo(sesion: Session, datos_prestamo: PrestamoCrear) -> Prestamo:
-        """Procesa un nuevo préstamo con todas las validaciones"""
+    def motivo_rechazo_prestamo(miembro, libro) -> Optional[HTTPException]:
+        """Devuelve el error que impide prestar el libro al miembro, o None si el préstamo es válido"""
         
         # Verificar que el miembro existe
-        miembro = sesion.query(Miembro).filter(Miembro.numero_miembro == datos_prestamo.numero_miembro).first()
         if not miembro:
-            raise HTTPException(status_code=404, detail="Miembro no encontrado")
+            return HTTPException(status_code=404, detail="Miembro no encontrado")
         
         # Verificar que el libro existe
-        libro = sesion.query(Libro).filter(Libro.codigo_libro == datos_prestamo.codigo_libro).first()
         if not libro:
-            raise HTTPException(status_code=404, detail="Libro no encontrado")
+            return HTTPException(status_code=404, detail="Libro no encontrado")
         
         # Verificar que el miembro pertenece a la misma biblioteca que el libro
         if miembro.codigo_biblioteca != libro.codigo_biblioteca:
-            raise HTTPException(
+            return HTTPException(
                 status_code=403, 
                 detail="El miembro solo puede solicitar libros de su biblioteca de origen"
             )
         
         # Verificar límite de préstamos
-        prestamos_activos = GestorBiblioteca.contar_prestamos_activos(sesion, datos_prestamo.numero_miembro)
-        if prestamos_activos >= miembro.limite_prestamos:
-            raise HTTPException(
+        if miembro.prestamos_activos >= miembro.limite_prestamos:
+            return HTTPException(
                 status_code=400, 
                 detail=f"Límite de préstamos alcanzado ({miembro.limite_prestamos})"
             )
         
         # Verificar disponibilidad del libro
         if libro.cantidad_disponible <= 0:
-            raise HTTPException(status_code=400, detail="Libro no disponible")
+            return HTTPException(status_code=400, detail="Libro no disponible")
+        
+        return None
+    
+    @staticmethod
+    def libros_de_otro_fragmento(sesion: Session, codigos: set) -> dict:
+        """Con fragmentación, los libros que no están en el fragmento del miembro son de otra biblioteca.
+
+        Devuelve codigo_libro -> libro con solo su codigo_biblioteca, que basta para el rechazo.
+        """
+        if not fragmentacion_activa() or not codigos:
+            return {}
+        return {
+            codigo: SimpleNamespace(codigo_libro=codigo, codigo_biblioteca=codigo_biblioteca)
+            for codigo, codigo_biblioteca in DirectorioFragmentos.ubicar_libros(sesion, codigos).items()
+        }
+    
+    @staticmethod
+    def diagnosticar_rechazo_prestamo(sesion: Session, datos_prestamo: PrestamoCrear):
+        """Lanza el error que explica por qué no se pudo reservar el préstamo"""
+        miembro = sesion.query(Miembro).filter(Miembro.numero_miembro == datos_prestamo.numero_miembro).first()
+        libro = sesion.query(Libro).filter(Libro.codigo_libro == datos_prestamo.codigo_libro).first() or \
+            GestorBiblioteca.libros_de_otro_fragmento(sesion, {datos_prestamo.codigo_libro}).get(datos_prestamo.codigo_libro)
+        motivo = GestorBiblioteca.motivo_rechazo_prestamo(miembro, libro)
+        # Sin motivo: otra transacción liberó la copia o el cupo entre el UPDATE y la lectura
+        raise motivo or HTTPException(status_code=409, detail="Conflicto de concurrencia, intente de nuevo")
+    
+    @staticmethod
+    def procesar_prestamo(sesion: Session, datos_prestamo: PrestamoCrear) -> Prestamo:
+        """Procesa un nuevo préstamo con todas las validaciones.
+        
+        Las validaciones viajan en los WHERE de dos UPDATE condicionales, así dos
+        solicitudes simultáneas no pueden prestar la misma copia ni superar el límite.
+        """
+        
+        # Reservar un cupo del miembro si no ha alcanzado su límite
+        cupo_miembro = sesion.execute(
+            update(Miembro)
+            .where(
+                Miembro.numero_miembro == datos_prestamo.numero_miembro,
+                Miembro.prestamos_activos < Miembro.limite_prestamos
+            )
+            .values(prestamos_activos=Miembro.prestamos_activos + 1)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Reservar una copia del libro si hay disponibles y es de la biblioteca del miembro
+        copia_libro = None
+        if cupo_miembro.rowcount == 1:
+            biblioteca_miembro = select(Miembro.codigo_biblioteca).where(
+                Miembro.numero_miembro == datos_prestamo.numero_miembro
+            ).scalar_subquery()
+            copia_libro = sesion.execute(
+                update(Libro)
+                .where(
+                    Libro.codigo_libro == datos_prestamo.codigo_libro,
+                    Libro.cantidad_disponible > 0,
+                    Libro.codigo_biblioteca == biblioteca_miembro
+                )
+                .values(cantidad_disponible=Libro.cantidad_disponible - 1)
+                .execution_options(synchronize_session=False)
+            )
+        
+        if copia_libro is None or copia_libro.rowcount != 1:
+            sesion.rollback()
+            GestorBiblioteca.diagnosticar_rechazo_prestamo(sesion, datos_prestamo)
         
         # Crear el préstamo
         fecha_limite = datetime.utcnow() + timedelta(days=datos_prestamo.dias_prestamo)
@@ -69,11 +139,285 @@ class GestorBiblioteca:
             observaciones_adicionales=datos_prestamo.observaciones_adicionales
         )
         
-        # Reducir disponibilidad del libro
-        libro.cantidad_disponible -= 1
-        
         sesion.add(nuevo_prestamo)
         sesion.commit()
         sesion.refresh(nuevo_prestamo)
         
-        return nuevo_prestamo
\ No newline at end of file
+        return nuevo_prestamo
+    
+    @staticmethod
+    def liberar_prestamo(sesion: Session, prestamo: Prestamo):
+        """Devuelve la copia al inventario y el cupo al miembro de un préstamo que deja de estar activo"""
+        sesion.execute(
+            update(Libro)
+            .where(Libro.codigo_libro == prestamo.codigo_libro)
+            .values(cantidad_disponible=Libro.cantidad_disponible + 1)
+            .execution_options(synchronize_session=False)
+        )
+        sesion.execute(
+            update(Miembro)
+            .where(Miembro.numero_miembro == prestamo.numero_miembro, Miembro.prestamos_activos > 0)
+            .values(prestamos_activos=Miembro.prestamos_activos - 1)
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def calcular_multa(prestamo: Prestamo, ahora: datetime) -> int:
+        """Calcula la multa de un préstamo devuelto en la fecha indicada"""
+        if ahora > prestamo.fecha_limite:
+            dias_retraso = (ahora - prestamo.fecha_limite).days
+            return dias_retraso * GestorBiblioteca.MULTA_POR_DIA
+        return prestamo.multa_aplicada or 0
+    
+    @staticmethod
+    def expresion_dias_retraso(sesion: Session, ahora: datetime):
+        """Expresión SQL con los días completos de retraso de un préstamo respecto a 'ahora'"""
+        if sesion.get_bind().dialect.name == "sqlite":
+            return cast(func.julianday(ahora) - func.julianday(Prestamo.fecha_limite), Integer)
+        return cast(func.floor(func.extract("epoch", ahora - Prestamo.fecha_limite) / 86400), Integer)
+    
+    @staticmethod
+    def marcar_prestamos_vencidos(sesion: Session, ahora: Optional[datetime] = None, tamano_lote: int = 1000) -> int:
+        """Marca como vencidos los préstamos fuera de plazo y actualiza su multa acumulada.
+        
+        Cada lote es un único UPDATE sobre los préstamos seleccionados con el índice
+        (estado_prestamo, fecha_limite); se confirma por lote para no bloquear a otros escritores.
+        Devuelve la cantidad de préstamos actualizados.
+        """
+        ahora = ahora or datetime.now()
+        multa_actual = GestorBiblioteca.expresion_dias_retraso(sesion, ahora) * GestorBiblioteca.MULTA_POR_DIA
+        pendientes = select(Prestamo.id_prestamo).where(
+            Prestamo.estado_prestamo.in_(Prestamo.ESTADOS_PENDIENTES),
+            Prestamo.fecha_limite < ahora,
+            or_(
+                Prestamo.estado_prestamo == "Activo",
+                func.coalesce(Prestamo.multa_aplicada, 0) != multa_actual
+            )
+        ).limit(tamano_lote)
+        
+        total = 0
+        while True:
+            resultado = sesion.execute(
+                update(Prestamo)
+                .where(Prestamo.id_prestamo.in_(pendientes.scalar_subquery()))
+                .values(estado_prestamo="Vencido", multa_aplicada=multa_actual)
+                .execution_options(synchronize_session=False)
+            )
+            sesion.commit()
+            total += resultado.rowcount
+            if resultado.rowcount < tamano_lote:
+                return total
+    
+    @staticmethod
+    def procesar_devolucion(sesion: Session, id_prestamo: int) -> Prestamo:
+        """Registra la devolución de un préstamo activo y calcula la multa por retraso"""
+        prestamo = sesion.query(Prestamo).filter(Prestamo.id_prestamo == id_prestamo).first()
+        if not prestamo:
+            raise HTTPException(status_code=404, detail="Préstamo no encontrado")
+        
+        ahora = datetime.now()
+        multa = GestorBiblioteca.calcular_multa(prestamo, ahora)
+        
+        # Cerrar el préstamo solo si sigue activo o vencido (evita devolver dos veces el mismo préstamo)
+        cierre = sesion.execute(
+            update(Prestamo)
+            .where(Prestamo.id_prestamo == id_prestamo, Prestamo.estado_prestamo.in_(Prestamo.ESTADOS_PENDIENTES))
+            .values(fecha_devolucion=ahora, estado_prestamo="Devuelto", multa_aplicada=multa)
+            .execution_options(synchronize_session=False)
+        )
+        if cierre.rowcount != 1:
+            sesion.rollback()
+            raise HTTPException(status_code=400, detail="El préstamo no está activo")
+        
+        GestorBiblioteca.liberar_prestamo(sesion, prestamo)
+        sesion.commit()
+        return prestamo
+    
+    @staticmethod
+    def filas_actualizadas(conexion, sentencia, parametros: List[dict]) -> int:
+        """Ejecuta la sentencia con cada juego de parámetros y devuelve el total de filas afectadas.
+
+        El rowcount de executemany solo es fiable si el dialecto lo admite (asyncpg lo deja
+        en -1); si no, se ejecuta una sentencia por grupo, cuyo rowcount sí lo es.
+        """
+        if conexion.dialect.supports_sane_multi_rowcount:
+            return conexion.execute(sentencia, parametros).rowcount
+        return sum(conexion.execute(sentencia, juego).rowcount for juego in parametros)
+    
+    @staticmethod
+    def procesar_prestamos_lote(sesion: Session, lote: List[PrestamoCrear], confirmar: bool = True) -> List[ResultadoLote]:
+        """Procesa un lote de préstamos en una sola transacción.
+        
+        Lee todos los miembros y libros del lote en dos consultas, valida cada
+        solicitud en orden contra contadores en memoria y aplica las reservas
+        agrupadas por libro y por miembro. Con confirmar=False deja la transacción
+        abierta para que el llamador la confirme junto con otras escrituras.
+        """
+        numeros = {datos.numero_miembro for datos in lote}
+        codigos = {datos.codigo_libro for datos in lote}
+        miembros = {
+            fila.numero_miembro: SimpleNamespace(**fila._mapping)
+            for fila in sesion.query(
+                Miembro.numero_miembro, Miembro.codigo_biblioteca,
+                Miembro.prestamos_activos, Miembro.limite_prestamos
+            ).filter(Miembro.numero_miembro.in_(numeros))
+        }
+        libros = {
+            fila.codigo_libro: SimpleNamespace(**fila._mapping)
+            for fila in sesion.query(
+                Libro.codigo_libro, Libro.codigo_biblioteca, Libro.cantidad_disponible
+            ).filter(Libro.codigo_libro.in_(codigos))
+        }
+        libros.update(GestorBiblioteca.libros_de_otro_fragmento(sesion, codigos - libros.keys()))
+        
+        resultados = []
+        aceptados = []
+        copias_por_libro = Counter()
+        cupos_por_miembro = Counter()
+        for indice, datos in enumerate(lote):
+            miembro = miembros.get(datos.numero_miembro)
+            libro = libros.get(datos.codigo_libro)
+            motivo = GestorBiblioteca.motivo_rechazo_prestamo(miembro, libro)
+            if motivo:
+                resultados.append(ResultadoLote(
+                    indice=indice, exito=False, codigo_estado=motivo.status_code, error=motivo.detail
+                ))
+                continue
+            
+            # Descontar en memoria para validar las siguientes solicitudes del lote
+            miembro.prestamos_activos += 1
+            libro.cantidad_disponible -= 1
+            copias_por_libro[datos.codigo_libro] += 1
+            cupos_por_miembro[datos.numero_miembro] += 1
+            aceptados.append((indice, datos))
+            resultados.append(None)
+        
+        if aceptados:
+            conexion = sesion.connection()
+            copias = GestorBiblioteca.filas_actualizadas(
+                conexion,
+                update(Libro.__table__)
+                .where(
+                    Libro.__table__.c.codigo_libro == bindparam("p_codigo_libro"),
+                    Libro.__table__.c.cantidad_disponible >= bindparam("p_cantidad")
+                )
+                .values(cantidad_disponible=Libro.__table__.c.cantidad_disponible - bindparam("p_cantidad")),
+                [{"p_codigo_libro": codigo, "p_cantidad": cantidad} for codigo, cantidad in copias_por_libro.items()]
+            )
+            cupos = GestorBiblioteca.filas_actualizadas(
+                conexion,
+                update(Miembro.__table__)
+                .where(
+                    Miembro.__table__.c.numero_miembro == bindparam("p_numero_miembro"),
+                    Miembro.__table__.c.prestamos_activos + bindparam("p_cantidad") <= Miembro.__table__.c.limite_prestamos
+                )
+                .values(prestamos_activos=Miembro.__table__.c.prestamos_activos + bindparam("p_cantidad")),
+                [{"p_numero_miembro": numero, "p_cantidad": cantidad} for numero, cantidad in cupos_por_miembro.items()]
+            )
+            if copias != len(copias_por_libro) or cupos != len(cupos_por_miembro):
+                sesion.rollback()
+                raise HTTPException(status_code=409, detail="Conflicto de concurrencia, intente de nuevo")
+            
+            fecha_solicitud = datetime.utcnow()
+            ids_prestamo = sesion.scalars(
+                insert(Prestamo).returning(Prestamo.id_prestamo, sort_by_parameter_order=True),
+                [
+                    {
+                        "numero_miembro": datos.numero_miembro,
+                        "codigo_libro": datos.codigo_libro,
+                        "fecha_solicitud": fecha_solicitud,
+                        "fecha_limite": fecha_solicitud + timedelta(days=datos.dias_prestamo),
+                        "observaciones_adicionales": datos.observaciones_adicionales,
+                    }
+                    for _, datos in aceptados
+                ]
+            ).all()
+            if confirmar:
+                sesion.commit()
+            
+            for (indice, _), id_prestamo in zip(aceptados, ids_prestamo):
+                resultados[indice] = ResultadoLote(
+                    indice=indice, exito=True, codigo_estado=201, id_prestamo=id_prestamo
+                )
+        
+        return resultados
+    
+    @staticmethod
+    def procesar_devoluciones_lote(sesion: Session, ids_prestamo: List[int], confirmar: bool = True) -> List[ResultadoLote]:
+        """Registra la devolución de un lote de préstamos en una sola transacción (sin confirmarla si confirmar=False)"""
+        prestamos = {
+            prestamo.id_prestamo: prestamo
+            for prestamo in sesion.query(Prestamo).filter(Prestamo.id_prestamo.in_(set(ids_prestamo)))
+        }
+        
+        ahora = datetime.now()
+        resultados = []
+        cierres = []
+        copias_por_libro = Counter()
+        cupos_por_miembro = Counter()
+        procesados = set()
+        for indice, id_prestamo in enumerate(ids_prestamo):
+            prestamo = prestamos.get(id_prestamo)
+            if prestamo is None:
+                resultados.append(ResultadoLote(
+                    indice=indice, exito=False, codigo_estado=404, error="Préstamo no encontrado"
+                ))
+                continue
+            if id_prestamo in procesados:
+                resultados.append(ResultadoLote(
+                    indice=indice, exito=False, codigo_estado=400, error="Préstamo repetido en el lote"
+                ))
+                continue
+            procesados.add(id_prestamo)
+            if prestamo.estado_prestamo not in Prestamo.ESTADOS_PENDIENTES:
+                resultados.append(ResultadoLote(
+                    indice=indice, exito=False, codigo_estado=400, error="El préstamo no está activo"
+                ))
+                continue
+            
+            multa = GestorBiblioteca.calcular_multa(prestamo, ahora)
+            cierres.append({"p_id_prestamo": id_prestamo, "p_multa": multa})
+            copias_por_libro[prestamo.codigo_libro] += 1
+            cupos_por_miembro[prestamo.numero_miembro] += 1
+            resultados.append(ResultadoLote(
+                indice=indice, exito=True, codigo_estado=200, id_prestamo=id_prestamo, multa=multa
+            ))
+        
+        if cierres:
+            tabla_prestamos = Prestamo.__table__
+            conexion = sesion.connection()
+            cerrados = GestorBiblioteca.filas_actualizadas(
+                conexion,
+                update(tabla_prestamos)
+                .where(
+                    tabla_prestamos.c.id_prestamo == bindparam("p_id_prestamo"),
+                    # executemany no admite IN expandible; pendiente equivale a no devuelto
+                    tabla_prestamos.c.estado_prestamo != "Devuelto"
+                )
+                .values(fecha_devolucion=ahora, estado_prestamo="Devuelto", multa_aplicada=bindparam("p_multa")),
+                cierres
+            )
+            if cerrados != len(cierres):
+                sesion.rollback()
+                raise HTTPException(status_code=409, detail="Conflicto de concurrencia, intente de nuevo")
+            
+            conexion.execute(
+                update(Libro.__table__)
+                .where(Libro.__table__.c.codigo_libro == bindparam("p_codigo_libro"))
+                .values(cantidad_disponible=Libro.__table__.c.cantidad_disponible + bindparam("p_cantidad")),
+                [{"p_codigo_libro": codigo, "p_cantidad": cantidad} for codigo, cantidad in copias_por_libro.items()]
+            )
+            conexion.execute(
+                update(Miembro.__table__)
+                .where(Miembro.__table__.c.numero_miembro == bindparam("p_numero_miembro"))
+                .values(prestamos_activos=case(
+                    (Miembro.__table__.c.prestamos_activos > bindparam("p_cantidad"),
+                     Miembro.__table__.c.prestamos_activos - bindparam("p_cantidad")),
+                    else_=0
+                )),
+                [{"p_numero_miembro": numero, "p_cantidad": cantidad} for numero, cantidad in cupos_por_miembro.items()]
+            )
+            if confirmar:
+                sesion.commit()
+        
+        return resultados
@@ -0,0 +1,112 @@
+import re
+from sqlalchemy import Table, Column, Integer, MetaData, literal_column, text
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database.models import Libro
+
+
+# Tabla virtual FTS5 creada por las migraciones (no la gestiona create_all)
+libros_fts = Table("libros_fts", MetaData(), Column("rowid", Integer, primary_key=True))
+
+PATRON_PALABRA = re.compile(r"\w+", re.UNICODE)
+
+
+class BuscadorLibros:
+
+    @staticmethod
+    def construir_expresion(texto: str, columna: Optional[str] = None) -> Optional[str]:
+        """Convierte texto libre en una expresión FTS5 de prefijos, opcionalmente limitada a una columna"""
+        palabras = PATRON_PALABRA.findall(texto or "")
+        if not palabras:
+            return None
+        expresion = " ".join(f'"{palabra}"*' for palabra in palabras)
+        if columna:
+            return f"{columna} : ({expresion})"
+        return f"({expresion})"
+
+    @staticmethod
+    def usa_indice(sesion: Session) -> bool:
+        """Indica si la base de datos soporta el índice FTS5"""
+        return sesion.get_bind().dialect.name == "sqlite"
+
+    @staticmethod
+    def buscar(
+        sesion: Session,
+        consulta_libre: Optional[str] = None,
+        titulo: Optional[str] = None,
+        autor: Optional[str] = None,
+        categoria: Optional[str] = None,
+        codigo_biblioteca: Optional[int] = None,
+        limite: int = 50,
+        desplazamiento: int = 0,
+        columnas: Optional[list] = None,
+        incluir_orden: bool = False
+    ) -> List[Libro]:
+        """Busca libros ordenados por relevancia usando el índice de texto completo.
+        
+        Con 'columnas' devuelve tuplas de esas columnas en lugar de objetos Libro. Con
+        'incluir_orden' cada tupla termina con el valor por el que se ordenó, para mezclar
+        los resultados de varios fragmentos.
+        """
+        if not BuscadorLibros.usa_indice(sesion):
+            return BuscadorLibros.buscar_sin_indice(
+                sesion, consulta_libre, titulo, autor, categoria, codigo_biblioteca, limite, desplazamiento, columnas,
+                incluir_orden
+            )
+
+        expresiones = [
+            BuscadorLibros.construir_expresion(consulta_libre),
+            BuscadorLibros.construir_expresion(titulo, "titulo_obra"),
+            BuscadorLibros.construir_expresion(autor, "autor_principal"),
+            BuscadorLibros.construir_expresion(categoria, "categoria_tema"),
+        ]
+        expresiones = [expresion for expresion in expresiones if expresion]
+
+        orden = literal_column("libros_fts.rank") if expresiones else Libro.codigo_libro
+        consulta = sesion.query(*(columnas or [Libro]), *([orden] if incluir_orden else []))
+        if expresiones:
+            consulta = consulta.join(
+                libros_fts, libros_fts.c.rowid == literal_column("libros.rowid")
+            ).filter(
+                text("libros_fts MATCH :expresion").bindparams(expresion=" AND ".join(expresiones))
+            )
+        consulta = consulta.order_by(orden)
+
+        if codigo_biblioteca:
+            consulta = consulta.filter(Libro.codigo_biblioteca == codigo_biblioteca)
+
+        return consulta.limit(limite).offset(desplazamiento).all()
+
+    @staticmethod
+    def buscar_sin_indice(
+        sesion: Session,
+        consulta_libre: Optional[str] = None,
+        titulo: Optional[str] = None,
+        autor: Optional[str] = None,
+        categoria: Optional[str] = None,
+        codigo_biblioteca: Optional[int] = None,
+        limite: int = 50,
+        desplazamiento: int = 0,
+        columnas: Optional[list] = None,
+        incluir_orden: bool = False
+    ) -> List[Libro]:
+        """Búsqueda con LIKE para motores sin FTS5 (y como referencia en los benchmarks)"""
+        consulta = sesion.query(*(columnas or [Libro]), *([Libro.codigo_libro] if incluir_orden else []))
+
+        if consulta_libre:
+            consulta = consulta.filter(
+                Libro.titulo_obra.icontains(consulta_libre)
+                | Libro.autor_principal.icontains(consulta_libre)
+                | Libro.categoria_tema.icontains(consulta_libre)
+                | Libro.descripcion_contenido.icontains(consulta_libre)
+            )
+        if titulo:
+            consulta = consulta.filter(Libro.titulo_obra.contains(titulo))
+        if autor:
+            consulta = consulta.filter(Libro.autor_principal.contains(autor))
+        if categoria:
+            consulta = consulta.filter(Libro.categoria_tema.contains(categoria))
+        if codigo_biblioteca:
+            consulta = consulta.filter(Libro.codigo_biblioteca == codigo_biblioteca)
+
+        return consulta.order_by(Libro.codigo_libro).limit(limite).offset(desplazamiento).all()
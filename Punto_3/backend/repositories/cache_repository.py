@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from .. import configuracion
+from ..database.db import CLAVE_FRAGMENTO
+from ..database.models import Biblioteca, GeneracionCache, Libro
+from ..models.schemas import BibliotecaRespuesta, LibroRespuesta
+
+
+ENTIDADES_CACHE = ("bibliotecas", "libros")
+CLAVE_GENERACIONES = "generaciones_cache"
+CLAVE_ESCRITURA = "cache_invalidada"
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """Caché acotada que descarta la entrada usada hace más tiempo y las que superan su tiempo de vida"""
+
+    def __init__(self, capacidad: int, ttl_segundos: float):
+        self.capacidad = capacidad
+        self.ttl_segundos = ttl_segundos
+        self.entradas = OrderedDict()  # clave -> (generacion, expira, valor)
+        self.aciertos = 0
+        self.fallos = 0
+        self.candado = threading.Lock()
+
+    def obtener(self, clave: Hashable, generacion: int):
+        with self.candado:
+            entrada = self.entradas.get(clave)
+            if entrada is None or entrada[0] != generacion or entrada[1] < time.monotonic():
+                self.fallos += 1
+                return _AUSENTE
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[2]
+
+    def guardar(self, clave: Hashable, generacion: int, valor):
+        if self.capacidad <= 0 or self.ttl_segundos <= 0:
+            return
+        with self.candado:
+            self.entradas[clave] = (generacion, time.monotonic() + self.ttl_segundos, valor)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.capacidad:
+                self.entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self.candado:
+            self.entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self.candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+                "entradas": len(self.entradas),
+                "capacidad": self.capacidad,
+                "ttl_segundos": self.ttl_segundos,
+            }
+
+
+class CacheLecturas:
+    """Caché de lectura en el proceso para bibliotecas y libros.
+    
+    Cada entrada guarda la generación de su entidad leída al inicio de la solicitud
+    desde generaciones_cache. Las escrituras incrementan esa generación en su propia
+    transacción, así la caché sigue siendo correcta con varios procesos. Con fragmentación
+    cada base tiene sus generaciones y las claves incluyen el fragmento de la sesión.
+    """
+    
+    caches = {entidad: CacheLRU(configuracion.CACHE_CAPACIDAD, configuracion.CACHE_TTL) for entidad in ENTIDADES_CACHE}
+    
+    @staticmethod
+    def generaciones(sesion: Session) -> dict:
+        """Lee las generaciones una vez por sesión y base, es decir, una vez por solicitud"""
+        por_fragmento = sesion.info.setdefault(CLAVE_GENERACIONES, {})
+        fragmento = sesion.info.get(CLAVE_FRAGMENTO)
+        generaciones = por_fragmento.get(fragmento)
+        if generaciones is None:
+            generaciones = dict(sesion.execute(
+                select(GeneracionCache.nombre_entidad, GeneracionCache.generacion)
+            ).all())
+            por_fragmento[fragmento] = generaciones
+        return generaciones
+    
+    @staticmethod
+    def leer(sesion: Session, entidad: str, clave: Hashable, cargar: Callable[[], object]):
+        """Devuelve el valor en caché para la clave o lo carga con 'cargar' y lo guarda"""
+        cache = CacheLecturas.caches[entidad]
+        clave = (sesion.info.get(CLAVE_FRAGMENTO), clave)
+        generacion = CacheLecturas.generaciones(sesion).get(entidad, 0)
+        valor = cache.obtener(clave, generacion)
+        if valor is _AUSENTE:
+            valor = cargar()
+            # Lo leído después de una escritura sin confirmar no se comparte con otras solicitudes
+            if not sesion.info.get(CLAVE_ESCRITURA):
+                cache.guardar(clave, generacion, valor)
+        return valor
+    
+    @staticmethod
+    def invalidar(sesion: Session, *entidades: str):
+        """Incrementa la generación de las entidades dentro de la transacción actual"""
+        resultado = sesion.execute(
+            update(GeneracionCache)
+            .where(GeneracionCache.nombre_entidad.in_(entidades))
+            .values(generacion=GeneracionCache.generacion + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount < len(entidades):
+            # Base creada sin aplicar las migraciones: se registran las entidades que falten
+            existentes = set(sesion.scalars(
+                select(GeneracionCache.nombre_entidad).where(GeneracionCache.nombre_entidad.in_(entidades))
+            ))
+            sesion.execute(insert(GeneracionCache), [
+                {"nombre_entidad": entidad, "generacion": 1} for entidad in entidades if entidad not in existentes
+            ])
+        for entidad in entidades:
+            CacheLecturas.caches[entidad].limpiar()
+        sesion.info.get(CLAVE_GENERACIONES, {}).pop(sesion.info.get(CLAVE_FRAGMENTO), None)
+        sesion.info[CLAVE_ESCRITURA] = True
+    
+    @staticmethod
+    def obtener_biblioteca(sesion: Session, codigo_biblioteca: int):
+        """BibliotecaRespuesta de la biblioteca, o None si no existe"""
+        def cargar():
+            biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == codigo_biblioteca).first()
+            return BibliotecaRespuesta.model_validate(biblioteca) if biblioteca else None
+        return CacheLecturas.leer(sesion, "bibliotecas", ("detalle", codigo_biblioteca), cargar)
+    
+    @staticmethod
+    def biblioteca_activa(sesion: Session, codigo_biblioteca: int) -> bool:
+        """Verifica que la biblioteca existe y no se está eliminando"""
+        biblioteca = CacheLecturas.obtener_biblioteca(sesion, codigo_biblioteca)
+        return bool(biblioteca and biblioteca.estado_activo)
+    
+    @staticmethod
+    def datos_libro(sesion: Session, codigo_libro: str) -> Optional[dict]:
+        """Campos de LibroRespuesta del libro salvo cantidad_disponible, o None si no existe.
+
+        Las copias disponibles cambian con cada préstamo y devolución: guardarlas obligaría
+        a invalidar la caché (y escribir en generaciones_cache) en cada uno.
+        """
+        def cargar():
+            libro = sesion.query(Libro).filter(Libro.codigo_libro == codigo_libro).first()
+            return LibroRespuesta.model_validate(libro).model_dump(exclude={"cantidad_disponible"}) if libro else None
+        return CacheLecturas.leer(sesion, "libros", ("detalle", codigo_libro), cargar)
+    
+    @staticmethod
+    def obtener_libro(sesion: Session, codigo_libro: str):
+        """LibroRespuesta del libro, o None si no existe, con las copias disponibles leídas de la base"""
+        datos = CacheLecturas.datos_libro(sesion, codigo_libro)
+        if datos is None:
+            return None
+        disponible = sesion.scalar(select(Libro.cantidad_disponible).where(Libro.codigo_libro == codigo_libro))
+        if disponible is None:
+            return None
+        return LibroRespuesta.model_construct(**datos, cantidad_disponible=disponible)
+    
+    @staticmethod
+    def estadisticas() -> dict:
+        return {entidad: cache.estadisticas() for entidad, cache in CacheLecturas.caches.items()}
@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+from .cache_repository import CacheLecturas
+from .fragmentos_repository import DirectorioFragmentos
+from ..database.db import CLAVE_FRAGMENTO, elegir_fragmento, elegir_por_biblioteca
+from ..database.models import Biblioteca, DirectorioLibro, Libro, Miembro, Prestamo, TrabajoEliminacion
+
+
+TAMANO_LOTE_ELIMINACION = 1000
+# Por encima de estas filas la eliminación de una biblioteca se hace como trabajo en segundo plano
+UMBRAL_ELIMINACION_INMEDIATA = 5000
+
+
+class EliminadorDatos:
+
+    @staticmethod
+    def pasos_biblioteca(codigo_biblioteca: int) -> List[Tuple[type, object]]:
+        """(modelo, condición) de cada tabla a vaciar, de las dependientes a las principales"""
+        miembros_biblioteca = select(Miembro.numero_miembro).where(Miembro.codigo_biblioteca == codigo_biblioteca)
+        libros_biblioteca = select(Libro.codigo_libro).where(Libro.codigo_biblioteca == codigo_biblioteca)
+        return [
+            (Prestamo, Prestamo.numero_miembro.in_(miembros_biblioteca)),
+            # Préstamos de sus libros hechos por miembros de otra biblioteca
+            (Prestamo, Prestamo.codigo_libro.in_(libros_biblioteca)),
+            (Miembro, Miembro.codigo_biblioteca == codigo_biblioteca),
+            (Libro, Libro.codigo_biblioteca == codigo_biblioteca),
+        ]
+
+    @staticmethod
+    def contar_filas_biblioteca(sesion: Session, codigo_biblioteca: int) -> int:
+        """Filas que borrará la eliminación de la biblioteca (préstamos por miembro, miembros y libros)"""
+        pasos = EliminadorDatos.pasos_biblioteca(codigo_biblioteca)
+        return sum(
+            sesion.scalar(select(func.count()).select_from(modelo).where(condicion))
+            for indice, (modelo, condicion) in enumerate(pasos) if indice != 1
+        )
+
+    @staticmethod
+    def eliminar_en_lotes(sesion: Session, modelo, condicion, tamano_lote: int = TAMANO_LOTE_ELIMINACION,
+                          al_avanzar: Optional[Callable[[Session, int], None]] = None) -> int:
+        """Borra con DELETE ... WHERE clave IN (SELECT ... LIMIT n), confirmando cada lote para liberar el bloqueo"""
+        tabla = modelo.__table__
+        columna_clave = tabla.primary_key.columns.values()[0]
+        eliminadas = 0
+        while True:
+            lote = select(columna_clave).where(condicion).limit(tamano_lote)
+            resultado = sesion.execute(delete(tabla).where(columna_clave.in_(lote.scalar_subquery())))
+            if modelo is Libro and resultado.rowcount:
+                CacheLecturas.invalidar(sesion, "libros")
+            if al_avanzar and resultado.rowcount:
+                al_avanzar(sesion, resultado.rowcount)
+            sesion.commit()
+            eliminadas += resultado.rowcount
+            if resultado.rowcount < tamano_lote:
+                return eliminadas
+
+    @staticmethod
+    def eliminar_biblioteca(sesion: Session, codigo_biblioteca: int, tamano_lote: int = TAMANO_LOTE_ELIMINACION,
+                            al_avanzar: Optional[Callable[[Session, int], None]] = None) -> int:
+        """Elimina en lotes los préstamos, miembros y libros de la biblioteca y por último la biblioteca.
+
+        Con fragmentación la sesión debe tener elegido el fragmento de la biblioteca.
+        """
+        eliminadas = 0
+        for modelo, condicion in EliminadorDatos.pasos_biblioteca(codigo_biblioteca):
+            eliminadas += EliminadorDatos.eliminar_en_lotes(sesion, modelo, condicion, tamano_lote, al_avanzar)
+
+        # Lo creado mientras se eliminaba se borra junto con la biblioteca en la última transacción
+        for modelo, condicion in EliminadorDatos.pasos_biblioteca(codigo_biblioteca):
+            eliminadas += sesion.execute(delete(modelo.__table__).where(condicion)).rowcount
+        sesion.execute(delete(Biblioteca.__table__).where(Biblioteca.codigo_biblioteca == codigo_biblioteca))
+        CacheLecturas.invalidar(sesion, "bibliotecas", "libros")
+        fragmento = sesion.info.get(CLAVE_FRAGMENTO)
+        if fragmento is not None:
+            # Se borró la réplica del fragmento: en la misma confirmación se borra la biblioteca
+            # de la base global y se liberan sus códigos de libro
+            elegir_fragmento(sesion, None)
+            sesion.execute(delete(Biblioteca.__table__).where(Biblioteca.codigo_biblioteca == codigo_biblioteca))
+            DirectorioFragmentos.eliminar_libros(sesion, DirectorioLibro.codigo_biblioteca == codigo_biblioteca)
+            CacheLecturas.invalidar(sesion, "bibliotecas")
+            elegir_fragmento(sesion, fragmento)
+        sesion.commit()
+        return eliminadas
+
+    @staticmethod
+    def programar_eliminacion_biblioteca(sesion: Session, biblioteca: Biblioteca, total_filas: int) -> TrabajoEliminacion:
+        """Registra el trabajo de eliminación, o devuelve el que ya esté abierto para la biblioteca"""
+        trabajo = sesion.query(TrabajoEliminacion).filter(
+            TrabajoEliminacion.tipo_objetivo == "biblioteca",
+            TrabajoEliminacion.codigo_objetivo == str(biblioteca.codigo_biblioteca),
+            TrabajoEliminacion.estado_trabajo.in_(TrabajoEliminacion.ESTADOS_ABIERTOS)
+        ).first()
+        if trabajo:
+            return trabajo
+
+        trabajo = TrabajoEliminacion(
+            tipo_objetivo="biblioteca",
+            codigo_objetivo=str(biblioteca.codigo_biblioteca),
+            total_filas=total_filas,
+            filas_eliminadas=0
+        )
+        sesion.add(trabajo)
+        sesion.commit()
+        sesion.refresh(trabajo)
+        return trabajo
+
+    @staticmethod
+    def ejecutar_trabajo(sesion: Session, id_trabajo: int, tamano_lote: int = TAMANO_LOTE_ELIMINACION):
+        """Ejecuta un trabajo de eliminación registrando el avance en la misma transacción de cada lote"""
+        trabajo = sesion.get(TrabajoEliminacion, id_trabajo)
+        if not trabajo or trabajo.estado_trabajo not in TrabajoEliminacion.ESTADOS_ABIERTOS:
+            return
+
+        def actualizar(valores: dict):
+            sesion.execute(
+                update(TrabajoEliminacion)
+                .where(TrabajoEliminacion.id_trabajo == id_trabajo)
+                .values(fecha_actualizacion=datetime.now(timezone.utc), **valores)
+            )
+
+        def al_avanzar(sesion_lote: Session, filas: int):
+            actualizar({"filas_eliminadas": TrabajoEliminacion.filas_eliminadas + filas})
+
+        actualizar({"estado_trabajo": "En curso"})
+        sesion.commit()
+        elegir_por_biblioteca(sesion, int(trabajo.codigo_objetivo))
+        try:
+            EliminadorDatos.eliminar_biblioteca(sesion, int(trabajo.codigo_objetivo), tamano_lote, al_avanzar)
+        except Exception as error:
+            sesion.rollback()
+            actualizar({"estado_trabajo": "Fallido", "detalle_error": str(error)[:1000]})
+            sesion.commit()
+            raise
+        # El total inicial no incluye lo creado durante la eliminación
+        actualizar({
+            "estado_trabajo": "Completado",
+            "total_filas": case(
+                (TrabajoEliminacion.filas_eliminadas > TrabajoEliminacion.total_filas, TrabajoEliminacion.filas_eliminadas),
+                else_=TrabajoEliminacion.total_filas
+            ),
+        })
+        sesion.commit()
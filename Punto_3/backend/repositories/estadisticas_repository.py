@@ -0,0 +1,74 @@
+from sqlalchemy import case, delete, func, insert, select
+from typing import Optional
+from ..database.models import Biblioteca, EstadisticaBiblioteca, Libro, Prestamo
+from ..models.schemas import EstadisticasBibliotecaRespuesta
+
+
+COLUMNAS_ESTADISTICAS = list(EstadisticasBibliotecaRespuesta.model_fields)
+
+
+class ContadoresBiblioteca:
+
+    @staticmethod
+    def usa_triggers(sesion) -> bool:
+        """Los contadores se mantienen con triggers solo en SQLite; en otros motores la tabla no se llena"""
+        return sesion.get_bind().dialect.name == "sqlite"
+
+    @staticmethod
+    def consulta_agregada(codigo_biblioteca: Optional[int] = None):
+        """SELECT que deriva los contadores de cada biblioteca a partir de sus libros y préstamos"""
+        libros = select(
+            Libro.codigo_biblioteca,
+            func.count().label("total_titulos"),
+            func.sum(func.coalesce(Libro.cantidad_total, 0)).label("total_copias"),
+            func.sum(func.coalesce(Libro.cantidad_disponible, 0)).label("copias_disponibles"),
+        ).group_by(Libro.codigo_biblioteca)
+        prestamos = select(
+            Libro.codigo_biblioteca,
+            func.sum(case((Prestamo.estado_prestamo == "Activo", 1), else_=0)).label("prestamos_activos"),
+            func.sum(case((Prestamo.estado_prestamo == "Vencido", 1), else_=0)).label("prestamos_vencidos"),
+            func.sum(func.coalesce(Prestamo.multa_aplicada, 0)).label("multas_acumuladas"),
+        ).join(Libro, Libro.codigo_libro == Prestamo.codigo_libro).group_by(Libro.codigo_biblioteca)
+        consulta = select(Biblioteca.codigo_biblioteca)
+        if codigo_biblioteca is not None:
+            libros = libros.where(Libro.codigo_biblioteca == codigo_biblioteca)
+            prestamos = prestamos.where(Libro.codigo_biblioteca == codigo_biblioteca)
+            consulta = consulta.where(Biblioteca.codigo_biblioteca == codigo_biblioteca)
+
+        libros, prestamos = libros.subquery(), prestamos.subquery()
+        return consulta.add_columns(
+            func.coalesce(libros.c.total_titulos, 0),
+            func.coalesce(libros.c.total_copias, 0),
+            func.coalesce(libros.c.copias_disponibles, 0),
+            func.coalesce(prestamos.c.prestamos_activos, 0),
+            func.coalesce(prestamos.c.prestamos_vencidos, 0),
+            func.coalesce(prestamos.c.multas_acumuladas, 0),
+        ).outerjoin(libros, libros.c.codigo_biblioteca == Biblioteca.codigo_biblioteca) \
+            .outerjoin(prestamos, prestamos.c.codigo_biblioteca == Biblioteca.codigo_biblioteca)
+
+    @staticmethod
+    def reconstruir(conexion, codigo_biblioteca: Optional[int] = None) -> int:
+        """Recalcula los contadores desde libros y préstamos (todas las bibliotecas o una).
+
+        Recibe una Session o una Connection y no confirma: la confirmación queda a cargo
+        de quien llama para que el borrado y la inserción sean una sola transacción.
+        """
+        borrar = delete(EstadisticaBiblioteca)
+        if codigo_biblioteca is not None:
+            borrar = borrar.where(EstadisticaBiblioteca.codigo_biblioteca == codigo_biblioteca)
+        conexion.execute(borrar)
+        resultado = conexion.execute(
+            insert(EstadisticaBiblioteca).from_select(
+                COLUMNAS_ESTADISTICAS, ContadoresBiblioteca.consulta_agregada(codigo_biblioteca)
+            )
+        )
+        return resultado.rowcount
+
+    @staticmethod
+    def obtener(sesion, codigo_biblioteca: int) -> Optional[dict]:
+        """Contadores de una biblioteca: una lectura por clave primaria, sin importar su tamaño"""
+        fila = sesion.execute(
+            select(*[getattr(EstadisticaBiblioteca, campo) for campo in COLUMNAS_ESTADISTICAS])
+            .where(EstadisticaBiblioteca.codigo_biblioteca == codigo_biblioteca)
+        ).first()
+        return dict(zip(COLUMNAS_ESTADISTICAS, fila)) if fila else None
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from .eliminacion_repository import EliminadorDatos
+from ..database.models import EventoBiblioteca
+from ..models.schemas import EventoBibliotecaRespuesta
+
+
+COLUMNAS_EVENTO = list(EventoBibliotecaRespuesta.model_fields)
+TAMANO_LOTE_PODA = 5000
+
+
+class RegistroEventos:
+
+    @staticmethod
+    def disponible(sesion: Session) -> bool:
+        """Los eventos los escriben triggers de SQLite; en otros motores la tabla no se llena"""
+        return sesion.get_bind().dialect.name == "sqlite"
+
+    @staticmethod
+    def limites(sesion: Session) -> Tuple[int, int]:
+        """Primer y último id de evento conservados (0, 0 si no hay eventos)"""
+        # Una subconsulta por extremo: SQLite resuelve cada una con una sola búsqueda en la clave primaria
+        primero, ultimo = sesion.execute(select(
+            select(func.min(EventoBiblioteca.id_evento)).scalar_subquery(),
+            select(func.max(EventoBiblioteca.id_evento)).scalar_subquery(),
+        )).one()
+        return primero or 0, ultimo or 0
+
+    @staticmethod
+    def leer(sesion: Session, codigo_biblioteca: int, despues_de: int, limite: int) -> list:
+        """Eventos de la biblioteca posteriores a despues_de, en orden, como tuplas de COLUMNAS_EVENTO.
+
+        En SQLite hay un solo escritor, así que los ids se confirman en orden y un evento
+        con id menor nunca aparece después de haber leído uno mayor.
+        """
+        return sesion.execute(
+            select(*[getattr(EventoBiblioteca, campo) for campo in COLUMNAS_EVENTO])
+            .where(EventoBiblioteca.codigo_biblioteca == codigo_biblioteca, EventoBiblioteca.id_evento > despues_de)
+            .order_by(EventoBiblioteca.id_evento)
+            .limit(limite)
+        ).all()
+
+    @staticmethod
+    def libros_cambiados(sesion: Session, despues_de: int, hasta: Optional[int] = None) -> List[str]:
+        """Códigos de los libros con eventos posteriores a despues_de y hasta el id hasta (incluido)"""
+        consulta = select(EventoBiblioteca.codigo_libro).distinct().where(
+            EventoBiblioteca.id_evento > despues_de, EventoBiblioteca.entidad == "libro"
+        )
+        if hasta is not None:
+            consulta = consulta.where(EventoBiblioteca.id_evento <= hasta)
+        return list(sesion.scalars(consulta))
+
+    @staticmethod
+    def podar(sesion: Session, antes_de: datetime, tamano_lote: int = TAMANO_LOTE_PODA) -> int:
+        """Elimina por lotes los eventos anteriores a la fecha y devuelve cuántos borró.
+
+        Siempre conserva el último evento: así el id más alto sigue visible y un cliente
+        que vuelve con un id viejo puede detectar que se perdió eventos.
+        """
+        # Los eventos se registran en orden de fecha: el primero reciente marca el corte
+        corte = sesion.scalar(
+            select(EventoBiblioteca.id_evento).where(EventoBiblioteca.fecha_evento >= antes_de)
+            .order_by(EventoBiblioteca.id_evento).limit(1)
+        )
+        if corte is None:
+            corte = RegistroEventos.limites(sesion)[1]
+        return EliminadorDatos.eliminar_en_lotes(
+            sesion, EventoBiblioteca, EventoBiblioteca.id_evento < corte, tamano_lote
+        )
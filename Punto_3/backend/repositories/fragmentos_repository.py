@@ -0,0 +1,107 @@
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+from sqlalchemy.orm import Session
+from .cache_repository import CacheLecturas
+from ..database.db import (
+    CLAVE_FRAGMENTO, elegir_fragmento, fragmentacion_activa, fragmento_de_biblioteca
+)
+from ..database.models import Biblioteca, DirectorioLibro
+
+
+COLUMNAS_BIBLIOTECA = [columna.key for columna in Biblioteca.__table__.columns]
+
+
+class DirectorioFragmentos:
+    """Datos globales que necesita la fragmentación por biblioteca.
+
+    La base global es la fuente de las bibliotecas y guarda el directorio de códigos de
+    libro; cada fragmento tiene una réplica de sus bibliotecas para que las validaciones,
+    los JOIN y los triggers de estadísticas sigan siendo locales. Sin fragmentación todos
+    los métodos se comportan como si hubiera un único fragmento: la base global.
+    """
+
+    @staticmethod
+    def replicar_biblioteca(sesion: Session, biblioteca: Biblioteca):
+        """Copia la biblioteca a su fragmento dentro de la transacción de la sesión.
+
+        Se llama antes de confirmar el alta o el cambio en la base global. Usa INSERT ... ON
+        CONFLICT DO UPDATE: borrar y volver a insertar reiniciaría sus estadísticas.
+        """
+        if not fragmentacion_activa():
+            return
+        sesion.flush()
+        valores = {columna: getattr(biblioteca, columna) for columna in COLUMNAS_BIBLIOTECA}
+        tabla = Biblioteca.__table__
+        sentencia = insert_sqlite(tabla).values(**valores)
+        anterior = sesion.info.get(CLAVE_FRAGMENTO)
+        elegir_fragmento(sesion, fragmento_de_biblioteca(biblioteca.codigo_biblioteca))
+        try:
+            sesion.execute(sentencia.on_conflict_do_update(
+                index_elements=[tabla.c.codigo_biblioteca],
+                set_={columna: sentencia.excluded[columna] for columna in COLUMNAS_BIBLIOTECA if columna != "codigo_biblioteca"}
+            ))
+            CacheLecturas.invalidar(sesion, "bibliotecas")
+        finally:
+            elegir_fragmento(sesion, anterior)
+
+    @staticmethod
+    def ubicar_libros(sesion: Session, codigos: Iterable[str]) -> Dict[str, int]:
+        """codigo_libro -> codigo_biblioteca de los códigos registrados en el directorio"""
+        return dict(sesion.execute(
+            select(DirectorioLibro.codigo_libro, DirectorioLibro.codigo_biblioteca)
+            .where(DirectorioLibro.codigo_libro.in_(set(codigos)))
+        ).all())
+
+    @staticmethod
+    def libro_registrado(sesion: Session, codigo_libro: str) -> bool:
+        """Con fragmentación, si el código ya está reservado por un libro de cualquier fragmento"""
+        return fragmentacion_activa() and bool(DirectorioFragmentos.ubicar_libros(sesion, [codigo_libro]))
+
+    @staticmethod
+    def agrupar_libros(sesion: Session, codigos: List[str]) -> Dict[Optional[int], List[str]]:
+        """Códigos de libro por fragmento, omitiendo los que no existen; sin fragmentación, {None: codigos}"""
+        if not fragmentacion_activa():
+            return {None: codigos}
+        grupos = {}
+        for codigo, codigo_biblioteca in DirectorioFragmentos.ubicar_libros(sesion, codigos).items():
+            grupos.setdefault(fragmento_de_biblioteca(codigo_biblioteca), []).append(codigo)
+        return grupos
+
+    @staticmethod
+    def elegir_por_libro(sesion: Session, codigo_libro: str) -> bool:
+        """Elige el fragmento del libro; False si con fragmentación el código no está en el directorio"""
+        if not fragmentacion_activa():
+            return True
+        codigo_biblioteca = sesion.scalar(
+            select(DirectorioLibro.codigo_biblioteca).where(DirectorioLibro.codigo_libro == codigo_libro)
+        )
+        if codigo_biblioteca is None:
+            return False
+        elegir_fragmento(sesion, fragmento_de_biblioteca(codigo_biblioteca))
+        return True
+
+    @staticmethod
+    def registrar_libros(sesion: Session, libros: List[dict]):
+        """Añade al directorio los libros (diccionarios con codigo_libro y codigo_biblioteca) que se van a insertar"""
+        if fragmentacion_activa() and libros:
+            sesion.execute(insert(DirectorioLibro), [
+                {"codigo_libro": libro["codigo_libro"], "codigo_biblioteca": libro["codigo_biblioteca"]}
+                for libro in libros
+            ])
+
+    @staticmethod
+    def actualizar_libro(sesion: Session, codigo_anterior: str, codigo_libro: str, codigo_biblioteca: int):
+        if fragmentacion_activa():
+            sesion.execute(
+                update(DirectorioLibro)
+                .where(DirectorioLibro.codigo_libro == codigo_anterior)
+                .values(codigo_libro=codigo_libro, codigo_biblioteca=codigo_biblioteca)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def eliminar_libros(sesion: Session, condicion):
+        """Quita del directorio los códigos que cumplen la condición sobre DirectorioLibro"""
+        if fragmentacion_activa():
+            sesion.execute(delete(DirectorioLibro).where(condicion).execution_options(synchronize_session=False))
@@ -0,0 +1,188 @@
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from .cache_repository import CacheLecturas
+from .fragmentos_repository import DirectorioFragmentos
+from ..database.db import (
+    agrupar_por_fragmento, elegir_fragmento, fragmentacion_activa, fragmento_de_biblioteca, fragmentos_de_datos
+)
+from ..database.models import Biblioteca, Libro, Miembro
+from ..models.schemas import ErrorImportacion, LibroCrear, MiembroCrear, ResumenImportacion
+
+
+TAMANO_LOTE_IMPORTACION = 1000
+MAXIMO_ERRORES_REPORTADOS = 1000
+FORMATOS_IMPORTACION = ("csv", "ndjson")
+
+
+class ImportadorCatalogo:
+
+    @staticmethod
+    def detectar_formato(nombre_archivo: Optional[str], formato: Optional[str] = None) -> str:
+        """Usa el formato indicado o lo deduce de la extensión del archivo"""
+        if not formato and nombre_archivo:
+            formato = nombre_archivo.rsplit(".", 1)[-1].lower()
+            formato = "ndjson" if formato in ("jsonl", "json") else formato
+        if formato not in FORMATOS_IMPORTACION:
+            raise ValueError(f"Formato no soportado, use uno de: {', '.join(FORMATOS_IMPORTACION)}")
+        return formato
+
+    @staticmethod
+    def leer_filas(lineas: Iterable[str], formato: str) -> Iterator[Tuple[int, object]]:
+        """Recorre el archivo línea a línea y devuelve (número de fila, datos o error de lectura)"""
+        if formato == "csv":
+            lector = csv.DictReader(lineas)
+            for numero_fila, fila in enumerate(lector, start=2):  # la fila 1 es la cabecera
+                # Las celdas vacías del CSV equivalen a campos sin valor
+                yield numero_fila, {campo: valor for campo, valor in fila.items() if valor not in ("", None)}
+        else:
+            for numero_fila, linea in enumerate(lineas, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    yield numero_fila, json.loads(linea)
+                except json.JSONDecodeError as error:
+                    yield numero_fila, ValueError(f"JSON inválido: {error.msg}")
+
+    @staticmethod
+    def validar_lote(filas: List[Tuple[int, object]], esquema, resumen: ResumenImportacion) -> List[Tuple[int, BaseModel]]:
+        """Valida un lote de filas con el esquema Pydantic y registra los errores"""
+        validas = []
+        for numero_fila, datos in filas:
+            if isinstance(datos, Exception):
+                ImportadorCatalogo.registrar_error(resumen, numero_fila, str(datos))
+                continue
+            try:
+                validas.append((numero_fila, esquema.model_validate(datos)))
+            except ValidationError as error:
+                detalle = "; ".join(
+                    f"{'.'.join(str(parte) for parte in fallo['loc'])}: {fallo['msg']}" for fallo in error.errors()
+                )
+                ImportadorCatalogo.registrar_error(resumen, numero_fila, detalle)
+        return validas
+
+    @staticmethod
+    def registrar_error(resumen: ResumenImportacion, numero_fila: int, error: str):
+        """Cuenta el error y solo conserva los primeros para mantener acotada la memoria"""
+        resumen.total_errores += 1
+        if len(resumen.errores) < MAXIMO_ERRORES_REPORTADOS:
+            resumen.errores.append(ErrorImportacion(fila=numero_fila, error=error))
+
+    @staticmethod
+    def bibliotecas_existentes(sesion: Session, codigos: set) -> set:
+        return set(sesion.scalars(
+            select(Biblioteca.codigo_biblioteca).where(
+                Biblioteca.codigo_biblioteca.in_(codigos), Biblioteca.estado_activo == True
+            )
+        ))
+
+    @staticmethod
+    def libros_existentes(sesion: Session, codigos: set) -> set:
+        """Códigos ya registrados; con fragmentación se consultan en el directorio global"""
+        if fragmentacion_activa():
+            return set(DirectorioFragmentos.ubicar_libros(sesion, codigos))
+        return set(sesion.scalars(select(Libro.codigo_libro).where(Libro.codigo_libro.in_(codigos))))
+
+    @staticmethod
+    def documentos_existentes(sesion: Session, documentos: set) -> set:
+        """Documentos de identidad ya registrados en cualquier fragmento"""
+        existentes = set()
+        for fragmento in fragmentos_de_datos():
+            elegir_fragmento(sesion, fragmento)
+            existentes.update(sesion.scalars(
+                select(Miembro.documento_identidad).where(Miembro.documento_identidad.in_(documentos))
+            ))
+        elegir_fragmento(sesion, None)
+        return existentes
+
+    @staticmethod
+    def insertar_por_fragmento(sesion: Session, modelo, filas: List[dict]):
+        """INSERT múltiple en el fragmento de cada fila; la sesión vuelve a la base global"""
+        grupos = agrupar_por_fragmento(filas, lambda fila: fragmento_de_biblioteca(fila["codigo_biblioteca"]))
+        for fragmento, filas_fragmento in grupos.items():
+            elegir_fragmento(sesion, fragmento)
+            sesion.execute(insert(modelo), filas_fragmento)
+            if modelo is Libro:
+                CacheLecturas.invalidar(sesion, "libros")
+        elegir_fragmento(sesion, None)
+
+    @staticmethod
+    def importar_libros(sesion: Session, filas: Iterable[Tuple[int, object]],
+                        tamano_lote: int = TAMANO_LOTE_IMPORTACION) -> ResumenImportacion:
+        """Importa libros por lotes: una consulta de duplicados y un INSERT múltiple por lote"""
+        resumen = ResumenImportacion()
+        filas = iter(filas)
+        while lote := list(islice(filas, tamano_lote)):
+            resumen.procesadas += len(lote)
+            validas = ImportadorCatalogo.validar_lote(lote, LibroCrear, resumen)
+            if not validas:
+                continue
+
+            bibliotecas = ImportadorCatalogo.bibliotecas_existentes(
+                sesion, {libro.codigo_biblioteca for _, libro in validas}
+            )
+            codigos_existentes = ImportadorCatalogo.libros_existentes(
+                sesion, {libro.codigo_libro for _, libro in validas}
+            )
+
+            nuevos = []
+            for numero_fila, libro in validas:
+                if libro.codigo_biblioteca not in bibliotecas:
+                    ImportadorCatalogo.registrar_error(resumen, numero_fila, "Biblioteca no encontrada")
+                    continue
+                if libro.codigo_libro in codigos_existentes:
+                    ImportadorCatalogo.registrar_error(resumen, numero_fila, "Código de libro ya existe")
+                    continue
+                codigos_existentes.add(libro.codigo_libro)
+                datos_libro = libro.model_dump()
+                datos_libro["cantidad_disponible"] = datos_libro["cantidad_total"]
+                nuevos.append(datos_libro)
+
+            if nuevos:
+                DirectorioFragmentos.registrar_libros(sesion, nuevos)
+                ImportadorCatalogo.insertar_por_fragmento(sesion, Libro, nuevos)
+                sesion.commit()
+                resumen.insertadas += len(nuevos)
+        resumen.errores.sort(key=lambda error: error.fila)
+        return resumen
+
+    @staticmethod
+    def importar_miembros(sesion: Session, filas: Iterable[Tuple[int, object]],
+                          tamano_lote: int = TAMANO_LOTE_IMPORTACION) -> ResumenImportacion:
+        """Importa miembros por lotes detectando documentos de identidad repetidos"""
+        resumen = ResumenImportacion()
+        filas = iter(filas)
+        while lote := list(islice(filas, tamano_lote)):
+            resumen.procesadas += len(lote)
+            validas = ImportadorCatalogo.validar_lote(lote, MiembroCrear, resumen)
+            if not validas:
+                continue
+
+            bibliotecas = ImportadorCatalogo.bibliotecas_existentes(
+                sesion, {miembro.codigo_biblioteca for _, miembro in validas}
+            )
+            documentos_existentes = ImportadorCatalogo.documentos_existentes(
+                sesion, {miembro.documento_identidad for _, miembro in validas}
+            )
+
+            nuevos = []
+            for numero_fila, miembro in validas:
+                if miembro.codigo_biblioteca not in bibliotecas:
+                    ImportadorCatalogo.registrar_error(resumen, numero_fila, "Biblioteca no encontrada")
+                    continue
+                if miembro.documento_identidad in documentos_existentes:
+                    ImportadorCatalogo.registrar_error(resumen, numero_fila, "Documento de identidad ya registrado")
+                    continue
+                documentos_existentes.add(miembro.documento_identidad)
+                nuevos.append(miembro.model_dump())
+
+            if nuevos:
+                ImportadorCatalogo.insertar_por_fragmento(sesion, Miembro, nuevos)
+                sesion.commit()
+                resumen.insertadas += len(nuevos)
+        resumen.errores.sort(key=lambda error: error.fila)
+        return resumen
@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import Select, func, select
+from ..database.models import Biblioteca, Libro, Miembro, Prestamo
+
+
+AGRUPACIONES = ("dia", "categoria", "miembro")
+# Un mismo día o categoría puede aparecer en varios fragmentos; cada miembro vive en uno solo
+# y sus números crecen de un fragmento al siguiente, así que basta leerlos en orden
+AGRUPACIONES_COMBINADAS = ("dia", "categoria")
+
+
+class ReportesPrestamos:
+
+    @staticmethod
+    def filtrar(consulta: Select, desde: datetime, hasta: datetime, codigo_biblioteca: Optional[int]) -> Select:
+        """Préstamos solicitados en [desde, hasta) y, si se indica, de libros de esa biblioteca"""
+        consulta = consulta.where(Prestamo.fecha_solicitud >= desde, Prestamo.fecha_solicitud < hasta)
+        if codigo_biblioteca is not None:
+            consulta = consulta.where(Libro.codigo_biblioteca == codigo_biblioteca)
+        return consulta
+
+    @staticmethod
+    def prestamos(desde: datetime, hasta: datetime, codigo_biblioteca: Optional[int] = None) -> Select:
+        """Una fila por préstamo con su miembro, su libro y la biblioteca del libro, por fecha de solicitud"""
+        # Uniones externas: un préstamo aparece aunque falte su miembro o su libro
+        consulta = (
+            select(
+                Prestamo.id_prestamo, Prestamo.fecha_solicitud, Prestamo.fecha_limite, Prestamo.fecha_devolucion,
+                Prestamo.estado_prestamo, Prestamo.multa_aplicada, Prestamo.numero_miembro,
+                Miembro.nombres_completos, Miembro.documento_identidad, Prestamo.codigo_libro,
+                Libro.titulo_obra, Libro.autor_principal, Libro.categoria_tema,
+                Libro.codigo_biblioteca, Biblioteca.nombre_institucion,
+            )
+            .outerjoin(Miembro, Miembro.numero_miembro == Prestamo.numero_miembro)
+            .outerjoin(Libro, Libro.codigo_libro == Prestamo.codigo_libro)
+            .outerjoin(Biblioteca, Biblioteca.codigo_biblioteca == Libro.codigo_biblioteca)
+        )
+        # El índice de fecha de solicitud resuelve el rango y el orden sin ordenar aparte
+        return ReportesPrestamos.filtrar(consulta, desde, hasta, codigo_biblioteca).order_by(
+            Prestamo.fecha_solicitud, Prestamo.id_prestamo
+        )
+
+    @staticmethod
+    def agregados(agrupacion: str, desde: datetime, hasta: datetime, codigo_biblioteca: Optional[int] = None) -> Select:
+        """Préstamos y multas totales por día de solicitud, por categoría del libro o por miembro"""
+        totales = [
+            func.count().label("prestamos"),
+            func.coalesce(func.sum(Prestamo.multa_aplicada), 0).label("multas_total"),
+        ]
+        if agrupacion == "dia":
+            dia = func.date(Prestamo.fecha_solicitud).label("fecha")
+            consulta = select(dia, *totales).select_from(Prestamo).group_by(dia).order_by(dia)
+            unir_libro = codigo_biblioteca is not None
+        elif agrupacion == "categoria":
+            consulta = (
+                select(Libro.categoria_tema, *totales).select_from(Prestamo)
+                .group_by(Libro.categoria_tema).order_by(Libro.categoria_tema)
+            )
+            unir_libro = True
+        else:
+            # Todas las columnas del miembro en el GROUP BY, que PostgreSQL exige; ordenar por la
+            # misma clave da el mismo orden que por número y le evita a SQLite un segundo ordenamiento
+            clave_miembro = (
+                Prestamo.numero_miembro, Miembro.numero_miembro, Miembro.nombres_completos, Miembro.documento_identidad
+            )
+            consulta = (
+                select(Prestamo.numero_miembro, Miembro.nombres_completos, Miembro.documento_identidad, *totales)
+                .select_from(Prestamo)
+                .outerjoin(Miembro, Miembro.numero_miembro == Prestamo.numero_miembro)
+                .group_by(*clave_miembro).order_by(*clave_miembro)
+            )
+            unir_libro = codigo_biblioteca is not None
+        if unir_libro:
+            consulta = consulta.outerjoin(Libro, Libro.codigo_libro == Prestamo.codigo_libro)
+        return ReportesPrestamos.filtrar(consulta, desde, hasta, codigo_biblioteca)
+
+    @staticmethod
+    def sumar_por_clave(parciales: List[list]) -> list:
+        """Une los agregados de varios fragmentos sumando los totales de las filas con la misma clave"""
+        totales = {}
+        for filas in parciales:
+            for clave, *valores in filas:
+                actual = totales.get(clave)
+                totales[clave] = valores if actual is None else [a + b for a, b in zip(actual, valores)]
+        # Mismo orden que el ORDER BY de SQLite: la clave nula primero
+        return [(clave, *valores) for clave, valores in sorted(
+            totales.items(), key=lambda par: (par[0] is not None, par[0])
+        )]
@@ -0,0 +1,29 @@
+import functools
+import inspect
+from fastapi import Depends
+from ..database.db import get_db_async, modo_async
+
+
+def compatible_async(funcion):
+    """Adapta un handler síncrono al modo de base de datos configurado.
+
+    En modo sync el handler se deja igual (FastAPI lo ejecuta en el threadpool).
+    En modo async se convierte en corrutina que recibe una AsyncSession y ejecuta
+    el cuerpo con run_sync: cada consulta cede el event loop mientras espera al driver.
+    """
+    if not modo_async():
+        return funcion
+
+    firma = inspect.signature(funcion)
+    parametros = [
+        parametro.replace(default=Depends(get_db_async)) if parametro.name == "sesion" else parametro
+        for parametro in firma.parameters.values()
+    ]
+
+    @functools.wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        sesion_async = kwargs.pop("sesion")
+        return await sesion_async.run_sync(lambda sesion: funcion(*args, sesion=sesion, **kwargs))
+
+    envoltura.__signature__ = firma.replace(parameters=parametros)
+    return envoltura
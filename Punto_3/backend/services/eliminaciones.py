@@ -0,0 +1,30 @@
+import logging
+from sqlalchemy import select
+from ..database.db import CrearSesion
+from ..database.models import TrabajoEliminacion
+from ..repositories.eliminacion_repository import EliminadorDatos
+
+
+registro = logging.getLogger(__name__)
+
+
+def ejecutar_eliminacion(id_trabajo: int):
+    """Tarea de fondo: ejecuta el trabajo de eliminación con una sesión propia"""
+    with CrearSesion() as sesion:
+        try:
+            EliminadorDatos.ejecutar_trabajo(sesion, id_trabajo)
+        except Exception:
+            registro.exception("Falló el trabajo de eliminación %s", id_trabajo)
+
+
+def reanudar_eliminaciones():
+    """Retoma los trabajos que quedaron abiertos al detenerse el servidor; borrar de nuevo es seguro"""
+    with CrearSesion() as sesion:
+        pendientes = sesion.scalars(
+            select(TrabajoEliminacion.id_trabajo)
+            .where(TrabajoEliminacion.estado_trabajo.in_(TrabajoEliminacion.ESTADOS_ABIERTOS))
+            .order_by(TrabajoEliminacion.id_trabajo)
+        ).all()
+    for id_trabajo in pendientes:
+        registro.info("Reanudando trabajo de eliminación %s", id_trabajo)
+        ejecutar_eliminacion(id_trabajo)
@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import inspect
+import logging
+from typing import Awaitable, Callable, List, Optional
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from .. import configuracion
+from ..database.db import CrearSesion, agrupar_por_fragmento, elegir_fragmento, fragmento_de_id
+from ..database.instrumentacion import medicion_actual
+from ..database.models import Prestamo
+from ..models.schemas import PrestamoCrear
+from ..repositories.biblioteca_repository import GestorBiblioteca
+
+
+registro = logging.getLogger(__name__)
+PRESTAMO = "prestamo"
+DEVOLUCION = "devolucion"
+
+
+class OperacionPendiente:
+    """Préstamo o devolución encolado junto con el futuro que resuelve la solicitud que lo envió"""
+
+    def __init__(self, tipo: str, datos, fragmento: Optional[int], futuro: asyncio.Future):
+        self.tipo = tipo
+        self.datos = datos
+        self.fragmento = fragmento
+        self.futuro = futuro
+
+
+def aplicar_en_una_transaccion(sesion: Session, operaciones: List[OperacionPendiente]) -> list:
+    """Aplica el lote con las validaciones por elemento de GestorBiblioteca y lo confirma una vez.
+
+    Devuelve por operación el Prestamo creado, la multa de la devolución o la HTTPException
+    que habría respondido la ruta individual. Un conflicto con otro escritor propaga la
+    HTTPException 409 del lote tras deshacer la transacción.
+    """
+    resultados = [None] * len(operaciones)
+    # Las devoluciones van primero: las copias y cupos que liberan sirven a los préstamos del lote
+    primera_devolucion = {}
+    devoluciones = []
+    for indice, operacion in enumerate(operaciones):
+        if operacion.tipo == DEVOLUCION and operacion.datos not in primera_devolucion:
+            primera_devolucion[operacion.datos] = indice
+            devoluciones.append(indice)
+    prestamos = [indice for indice, operacion in enumerate(operaciones) if operacion.tipo == PRESTAMO]
+
+    if devoluciones:
+        parciales = GestorBiblioteca.procesar_devoluciones_lote(
+            sesion, [operaciones[indice].datos for indice in devoluciones], confirmar=False
+        )
+        for indice, resultado in zip(devoluciones, parciales):
+            resultados[indice] = resultado
+    if prestamos:
+        parciales = GestorBiblioteca.procesar_prestamos_lote(
+            sesion, [operaciones[indice].datos for indice in prestamos], confirmar=False
+        )
+        for indice, resultado in zip(prestamos, parciales):
+            resultados[indice] = resultado
+    sesion.commit()
+
+    # Las rutas individuales responden con el préstamo completo: una sola consulta para todo el lote
+    ids_creados = [resultados[indice].id_prestamo for indice in prestamos if resultados[indice].exito]
+    creados = {
+        prestamo.id_prestamo: prestamo
+        for prestamo in sesion.query(Prestamo).filter(Prestamo.id_prestamo.in_(ids_creados))
+    } if ids_creados else {}
+
+    respuestas = []
+    for indice, operacion in enumerate(operaciones):
+        resultado = resultados[indice]
+        if resultado is None:
+            # Devolución repetida en el lote: la primera ya cerró el préstamo
+            primera = resultados[primera_devolucion[operacion.datos]]
+            respuestas.append(
+                HTTPException(status_code=400, detail="El préstamo no está activo") if primera.exito
+                else HTTPException(status_code=primera.codigo_estado, detail=primera.error)
+            )
+        elif not resultado.exito:
+            respuestas.append(HTTPException(status_code=resultado.codigo_estado, detail=resultado.error))
+        elif operacion.tipo == PRESTAMO:
+            respuestas.append(creados[resultado.id_prestamo])
+        else:
+            respuestas.append(resultado.multa)
+    return respuestas
+
+
+def aplicar_individual(sesion: Session, operacion: OperacionPendiente):
+    """Aplica una operación en su propia transacción, como la ruta sin agrupar"""
+    try:
+        if operacion.tipo == PRESTAMO:
+            prestamo = GestorBiblioteca.procesar_prestamo(sesion, operacion.datos)
+            # Fuera de la sesión, para que las confirmaciones siguientes no lo expiren
+            sesion.expunge(prestamo)
+            return prestamo
+        return GestorBiblioteca.procesar_devolucion(sesion, operacion.datos).multa_aplicada
+    except HTTPException as error:
+        return error
+
+
+def aplicar_operaciones(fragmento: Optional[int], operaciones: List[OperacionPendiente]) -> list:
+    """Aplica en el fragmento las operaciones de un lote con una sesión propia"""
+    with CrearSesion() as sesion:
+        elegir_fragmento(sesion, fragmento)
+        try:
+            return aplicar_en_una_transaccion(sesion, operaciones)
+        except HTTPException:
+            # Otro proceso escribió entre la lectura y los UPDATE del lote: se reintenta cada
+            # operación por separado para que el conflicto no rechace a las demás
+            sesion.rollback()
+            return [aplicar_individual(sesion, operacion) for operacion in operaciones]
+
+
+class CanalEscrituras:
+    """Cola de préstamos y devoluciones que una única tarea escritora confirma por lotes.
+
+    Cada solicitud encola su operación y espera su propio resultado. El escritor toma la
+    primera operación, espera hasta la ventana configurada (o hasta llenar el lote) a que
+    lleguen más y aplica cada fragmento en una transacción: un fsync para todo el lote.
+    Mientras se confirma un lote las solicitudes nuevas se acumulan para el siguiente.
+    Si el cliente se desconecta, su operación se aplica igualmente.
+    """
+
+    def __init__(self):
+        self.cola: Optional[asyncio.Queue] = None
+
+    async def escribir(self, ventana_segundos: float, tamano_lote: int):
+        """Tarea de fondo: recoge y aplica lotes hasta que se cancela"""
+        # Las sentencias del escritor no pertenecen a la solicitud que lo haya iniciado
+        medicion_actual.set(None)
+        self.cola = asyncio.Queue()
+        bucle = asyncio.get_running_loop()
+        lote = []
+        try:
+            while True:
+                lote = [await self.cola.get()]
+                limite = bucle.time() + ventana_segundos
+                while len(lote) < tamano_lote:
+                    if not self.cola.empty():
+                        lote.append(self.cola.get_nowait())
+                        continue
+                    restante = limite - bucle.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        lote.append(await asyncio.wait_for(self.cola.get(), restante))
+                    except asyncio.TimeoutError:
+                        break
+                grupos = agrupar_por_fragmento(lote, lambda operacion: operacion.fragmento)
+                # Cada fragmento tiene su propio escritor en SQLite: sus lotes se confirman en paralelo
+                await asyncio.gather(*(self.aplicar(fragmento, operaciones) for fragmento, operaciones in grupos.items()))
+        finally:
+            # Al detener el servidor nadie queda esperando un resultado que no llegará
+            cola, self.cola = self.cola, None
+            while not cola.empty():
+                lote.append(cola.get_nowait())
+            for operacion in lote:
+                operacion.futuro.cancel()
+
+    async def aplicar(self, fragmento: Optional[int], operaciones: List[OperacionPendiente]):
+        try:
+            respuestas = await run_in_threadpool(aplicar_operaciones, fragmento, operaciones)
+        except Exception as error:
+            registro.exception("Falló un lote de %s escrituras agrupadas", len(operaciones))
+            respuestas = [error] * len(operaciones)
+        for operacion, respuesta in zip(operaciones, respuestas):
+            if operacion.futuro.done():
+                continue
+            if isinstance(respuesta, Exception):
+                operacion.futuro.set_exception(respuesta)
+            else:
+                operacion.futuro.set_result(respuesta)
+
+    async def enviar(self, tipo: str, datos, fragmento: Optional[int]):
+        if self.cola is None:
+            raise RuntimeError("La tarea escritora de préstamos y devoluciones no está en marcha")
+        futuro = asyncio.get_running_loop().create_future()
+        self.cola.put_nowait(OperacionPendiente(tipo, datos, fragmento, futuro))
+        return await futuro
+
+    async def prestar(self, prestamo: PrestamoCrear) -> Prestamo:
+        # El préstamo se guarda en el fragmento del miembro
+        return await self.enviar(PRESTAMO, prestamo, fragmento_de_id(prestamo.numero_miembro))
+
+    async def devolver(self, id_prestamo: int) -> int:
+        """Registra la devolución y devuelve la multa aplicada"""
+        return await self.enviar(DEVOLUCION, id_prestamo, fragmento_de_id(id_prestamo))
+
+
+canal_escrituras = CanalEscrituras()
+
+
+def escritura_agrupada(enviar: Callable[..., Awaitable]):
+    """Con BIBLIOTECA_ESCRITURA_AGRUPADA sustituye el handler por la corrutina enviar.
+
+    enviar recibe los mismos parámetros que el handler salvo la sesión, que no necesita:
+    la operación la aplica el escritor con su propia sesión. Sin la opción el handler queda igual.
+    """
+    def decorador(funcion):
+        if not configuracion.ESCRITURA_AGRUPADA:
+            return funcion
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        async def envoltura(**kwargs):
+            return await enviar(**kwargs)
+
+        envoltura.__signature__ = firma.replace(
+            parameters=[parametro for parametro in firma.parameters.values() if parametro.name != "sesion"]
+        )
+        return envoltura
+    return decorador
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from .. import configuracion
+from ..database.db import (
+    CrearSesion, elegir_fragmento, fragmento_de_biblioteca, fragmentos_de_datos, modo_async, obtener_sesion_async
+)
+from ..database.instrumentacion import medicion_actual
+from ..models.schemas import EventoBibliotecaRespuesta
+from ..repositories.eventos_repository import RegistroEventos
+from .serializacion import armador_filas, codificar_json
+
+
+registro = logging.getLogger(__name__)
+armar_evento = armador_filas(EventoBibliotecaRespuesta)
+# Milisegundos que el navegador (EventSource) espera antes de reconectar
+ESPERA_RECONEXION_MS = 3000
+
+
+async def consultar(funcion: Callable[[Session], object], fragmento: Optional[int] = None):
+    """Ejecuta funcion con una sesión propia y breve, sin ocupar una conexión entre sondeos"""
+    if modo_async():
+        async with obtener_sesion_async()() as sesion_async:
+            elegir_fragmento(sesion_async.sync_session, fragmento)
+            return await sesion_async.run_sync(funcion)
+
+    def ejecutar():
+        with CrearSesion() as sesion:
+            elegir_fragmento(sesion, fragmento)
+            return funcion(sesion)
+    return await run_in_threadpool(ejecutar)
+
+
+def formatear_evento(id_evento: int, tipo: str, datos: dict) -> bytes:
+    return f"id: {id_evento}\nevent: {tipo}\ndata: ".encode() + codificar_json(datos) + b"\n\n"
+
+
+def transmitir_eventos(codigo_biblioteca: int, ultimo_recibido: Optional[int]) -> StreamingResponse:
+    """Flujo SSE con los eventos de la biblioteca posteriores a ultimo_recibido.
+
+    Sin ultimo_recibido empieza en el evento más reciente y lo anuncia con "listo". Si los
+    eventos siguientes ya se podaron envía "reinicio": el cliente debe recargar el estado
+    completo. Cada evento lleva valores absolutos (copias disponibles, estado del préstamo),
+    así que aplicarlo dos veces no cambia el resultado.
+    """
+    # Los eventos se registran en el fragmento de la biblioteca y sus ids son propios de esa base
+    fragmento = fragmento_de_biblioteca(codigo_biblioteca)
+
+    async def generar_eventos():
+        # Un flujo abierto por horas no es una solicitud: sus sondeos no cuentan en las métricas
+        medicion_actual.set(None)
+        yield f"retry: {ESPERA_RECONEXION_MS}\n\n".encode()
+
+        primero, ultimo = await consultar(RegistroEventos.limites, fragmento)
+        if ultimo_recibido is None:
+            posicion = ultimo
+            yield formatear_evento(posicion, "listo", {})
+        elif ultimo_recibido > ultimo or ultimo_recibido < primero - 1:
+            posicion = ultimo
+            yield formatear_evento(posicion, "reinicio", {"ultimo_recibido": ultimo_recibido})
+        else:
+            posicion = ultimo_recibido
+
+        sin_eventos = 0.0
+        while True:
+            # Se lee un lote y se espera a que el cliente lo reciba antes de leer el siguiente:
+            # un consumidor lento solo frena su propio flujo y nunca acumula más de un lote
+            eventos = await consultar(
+                lambda sesion: RegistroEventos.leer(sesion, codigo_biblioteca, posicion, configuracion.EVENTOS_LOTE),
+                fragmento
+            )
+            if eventos:
+                yield b"".join(formatear_evento(fila[0], fila[1], armar_evento(fila)) for fila in eventos)
+                posicion = eventos[-1][0]
+                sin_eventos = 0.0
+                if len(eventos) == configuracion.EVENTOS_LOTE:
+                    continue
+            elif sin_eventos >= configuracion.EVENTOS_LATIDO:
+                # Escribir en una conexión cerrada termina el flujo
+                yield b": latido\n\n"
+                sin_eventos = 0.0
+            await asyncio.sleep(configuracion.EVENTOS_INTERVALO)
+            sin_eventos += configuracion.EVENTOS_INTERVALO
+
+    return StreamingResponse(
+        generar_eventos(),
+        media_type="text/event-stream",
+        # Sin caché ni buffer en proxies, para que cada evento llegue al enviarse
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def podar_eventos(retencion_horas: Optional[float] = None) -> int:
+    """Elimina los eventos más antiguos que la retención con una sesión propia"""
+    retencion_horas = configuracion.EVENTOS_RETENCION_HORAS if retencion_horas is None else retencion_horas
+    antes_de = datetime.now(timezone.utc) - timedelta(hours=retencion_horas)
+    eliminados = 0
+    with CrearSesion() as sesion:
+        for fragmento in fragmentos_de_datos():
+            elegir_fragmento(sesion, fragmento)
+            eliminados += RegistroEventos.podar(sesion, antes_de)
+    return eliminados
+
+
+async def poda_periodica(intervalo_segundos: float):
+    """Tarea de fondo: repite la poda de eventos cada intervalo"""
+    while True:
+        try:
+            eliminados = await run_in_threadpool(podar_eventos)
+            if eliminados:
+                registro.info("Poda de eventos: %s eventos eliminados", eliminados)
+        except Exception:
+            registro.exception("Falló la poda de eventos")
+        await asyncio.sleep(intervalo_segundos)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .routes import biblioteca_service, prestamo_service, miembro_service ,libro_service
+from .routes import biblioteca_service, prestamo_service, miembro_service ,libro_service, trabajo_service, cache_service, metricas_service, modelo_lectura_service, reporte_service
 
 
 router = APIRouter()
@@ -7,3 +7,8 @@ router.include_router(biblioteca_service.router)
 router.include_router(prestamo_service.router)
 router.include_router(miembro_service.router)
 router.include_router(libro_service.router)
+router.include_router(trabajo_service.router)
+router.include_router(cache_service.router)
+router.include_router(metricas_service.router)
+router.include_router(modelo_lectura_service.router)
+router.include_router(reporte_service.router)
@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Sequence
+from .. import configuracion
+from ..database.instrumentacion import MedicionSolicitud, medicion_actual
+
+
+registro = logging.getLogger(__name__)
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_SENTENCIAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence) -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class Contador:
+    """Contador acumulado por combinación de etiquetas"""
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self._valores = {}
+        self._candado = threading.Lock()
+
+    def incrementar(self, *valores_etiquetas, cantidad: float = 1):
+        with self._candado:
+            self._valores[valores_etiquetas] = self._valores.get(valores_etiquetas, 0) + cantidad
+
+    def muestras(self) -> list:
+        with self._candado:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}" for clave, valor in valores]
+
+
+class Histograma:
+    """Histograma con cubetas fijas por combinación de etiquetas"""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, limites: Sequence[float], etiquetas: Sequence[str] = ()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.limites = tuple(sorted(limites))
+        self._series = {}
+        self._candado = threading.Lock()
+
+    def observar(self, valor: float, *valores_etiquetas):
+        # Las cubetas de Prometheus son inclusivas: valor <= límite
+        indice = bisect_left(self.limites, valor)
+        with self._candado:
+            serie = self._series.get(valores_etiquetas)
+            if serie is None:
+                serie = self._series[valores_etiquetas] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def muestras(self) -> list:
+        with self._candado:
+            series = sorted((clave, (list(conteos), suma)) for clave, (conteos, suma) in self._series.items())
+        lineas = []
+        for clave, (conteos, suma) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.limites + (float("inf"),), conteos):
+                acumulado += conteo
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas + ('le',), clave + (le,))} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+class Indicador:
+    """Valor instantáneo calculado al exponer las métricas"""
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, funcion: Callable[[], dict], etiquetas: Sequence[str] = ()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.funcion = funcion
+
+    def muestras(self) -> list:
+        return [
+            f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in sorted(self.funcion().items())
+        ]
+
+
+def estado_pool() -> dict:
+    """Conexiones del pool del motor en uso: prestadas, libres y adicionales"""
+    from ..database.db import motor_activo
+
+    pool = motor_activo().pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        ("prestadas",): pool.checkedout(),
+        ("libres",): pool.checkedin(),
+        ("desborde",): max(pool.overflow(), 0),
+    }
+
+
+SOLICITUDES = Contador("biblioteca_solicitudes_total", "Solicitudes HTTP atendidas", ("metodo", "ruta", "estado"))
+DURACION = Histograma(
+    "biblioteca_solicitud_duracion_segundos", "Duración total de la solicitud", LIMITES_SEGUNDOS, ("metodo", "ruta")
+)
+TIEMPO_BD = Histograma(
+    "biblioteca_solicitud_bd_segundos", "Tiempo ejecutando sentencias SQL por solicitud", LIMITES_SEGUNDOS,
+    ("metodo", "ruta")
+)
+SENTENCIAS = Histograma(
+    "biblioteca_solicitud_sentencias_sql", "Sentencias SQL emitidas por solicitud", LIMITES_SENTENCIAS,
+    ("metodo", "ruta")
+)
+ESPERA_POOL = Histograma(
+    "biblioteca_pool_espera_segundos", "Espera por una conexión del pool al abrir la sesión", LIMITES_SEGUNDOS
+)
+CONSULTAS_LENTAS = Contador(
+    "biblioteca_consultas_lentas_total", "Sentencias SQL más lentas que BIBLIOTECA_CONSULTA_LENTA_MS",
+    ("metodo", "ruta")
+)
+POSIBLES_N_MAS_UNO = Contador(
+    "biblioteca_posibles_n_mas_uno_total",
+    "Solicitudes con más sentencias SQL que BIBLIOTECA_LIMITE_CONSULTAS_SOLICITUD", ("metodo", "ruta")
+)
+CONEXIONES_POOL = Indicador("biblioteca_pool_conexiones", "Conexiones del pool por estado", estado_pool, ("estado",))
+
+METRICAS = [
+    SOLICITUDES, DURACION, TIEMPO_BD, SENTENCIAS, ESPERA_POOL, CONSULTAS_LENTAS, POSIBLES_N_MAS_UNO, CONEXIONES_POOL
+]
+
+
+def exponer_metricas() -> str:
+    """Todas las métricas en el formato de texto de Prometheus"""
+    lineas = []
+    for metrica in METRICAS:
+        lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+        lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+        lineas.extend(metrica.muestras())
+    return "\n".join(lineas) + "\n"
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mide cada solicitud: duración, sentencias SQL, tiempo en base de datos y espera por el pool.
+
+    Las métricas se etiquetan con la plantilla de la ruta (/libros/{codigo_libro}) para
+    no crear una serie por cada valor; las rutas inexistentes se agrupan en "sin_ruta".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionSolicitud(f"{scope['method']} {scope['path']}")
+        token = medicion_actual.set(medicion)
+        estado = [500]
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            medicion_actual.reset(token)
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            self.registrar(scope["method"], ruta, estado[0], time.perf_counter() - inicio, medicion)
+
+    @staticmethod
+    def registrar(metodo: str, ruta: str, estado: int, segundos: float, medicion: MedicionSolicitud):
+        SOLICITUDES.incrementar(metodo, ruta, str(estado))
+        DURACION.observar(segundos, metodo, ruta)
+        SENTENCIAS.observar(medicion.sentencias, metodo, ruta)
+        TIEMPO_BD.observar(medicion.segundos_bd, metodo, ruta)
+        if medicion.segundos_espera_pool:
+            ESPERA_POOL.observar(medicion.segundos_espera_pool)
+        if medicion.consultas_lentas:
+            CONSULTAS_LENTAS.incrementar(metodo, ruta, cantidad=medicion.consultas_lentas)
+        limite = configuracion.LIMITE_CONSULTAS_SOLICITUD
+        if limite and medicion.sentencias > limite:
+            POSIBLES_N_MAS_UNO.incrementar(metodo, ruta)
+            registro.warning(
+                "Posible N+1: %s %s emitió %s sentencias SQL (límite %s)", metodo, ruta, medicion.sentencias, limite
+            )
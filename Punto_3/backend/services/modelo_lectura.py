@@ -0,0 +1,555 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+from ..database.db import (
+    CrearSesion, SesionFragmentada, elegir_fragmento, fragmento_de_biblioteca, fragmentos_de_datos, motor
+)
+from ..database.instrumentacion import medicion_actual
+from ..database.models import Biblioteca, Libro
+from ..models.schemas import BibliotecaRespuesta, LibroRespuesta
+from ..repositories.cache_repository import CacheLecturas
+from ..repositories.eventos_repository import RegistroEventos
+from .paginacion import LIMITE_POR_DEFECTO
+from .serializacion import columnas_respuesta
+
+
+registro = logging.getLogger(__name__)
+
+CAMPOS_LIBRO = tuple(LibroRespuesta.model_fields)
+POSICION_CODIGO = CAMPOS_LIBRO.index("codigo_libro")
+POSICION_BIBLIOTECA = CAMPOS_LIBRO.index("codigo_biblioteca")
+POSICION_DISPONIBLE = CAMPOS_LIBRO.index("cantidad_disponible")
+# Enteros que se guardan en array('q') (8 bytes por libro en lugar de un objeto int)
+CAMPOS_ENTEROS = frozenset(CAMPOS_LIBRO.index(campo) for campo in ("cantidad_total", "cantidad_disponible"))
+# Textos con pocos valores distintos: se internan para que los libros compartan una sola cadena
+CAMPOS_INTERNADOS = frozenset(
+    CAMPOS_LIBRO.index(campo)
+    for campo in ("autor_principal", "editorial_publicacion", "categoria_tema", "ubicacion_estante", "estado_conservacion")
+)
+CAMPOS_BIBLIOTECA = tuple(BibliotecaRespuesta.model_fields)
+POSICION_CODIGO_BIBLIOTECA = CAMPOS_BIBLIOTECA.index("codigo_biblioteca")
+POSICION_ACTIVA = CAMPOS_BIBLIOTECA.index("estado_activo")
+TAMANO_LOTE_LECTURA = 5000
+TAMANO_LOTE_CODIGOS = 500
+MAXIMO_EJEMPLOS = 20
+
+
+def _columna(posicion: int, valores: Iterable):
+    if posicion in CAMPOS_ENTEROS:
+        valores = list(valores)
+        try:
+            return array("q", valores)
+        except TypeError:
+            # Filas con NULL (escritas por SQL directo): la columna queda como lista
+            return valores
+    if posicion in CAMPOS_INTERNADOS:
+        return [sys.intern(valor) if isinstance(valor, str) else valor for valor in valores]
+    return list(valores)
+
+
+class LibrosBiblioteca:
+    """Libros de una biblioteca en columnas paralelas ordenadas por codigo_libro.
+
+    Cada campo de LibroRespuesta es una lista (array('q') para las cantidades) en lugar de
+    un objeto por libro; codigo_biblioteca es el mismo para todos y no se guarda por fila.
+    Las copias disponibles se cambian en su sitio; cualquier otro cambio construye una
+    instancia nueva que sustituye a esta, así una lectura nunca ve columnas a medio cambiar.
+    """
+
+    __slots__ = ("codigo_biblioteca", "columnas")
+
+    def __init__(self, codigo_biblioteca: int, filas: List[tuple]):
+        """filas: tuplas en el orden de CAMPOS_LIBRO, ya ordenadas por codigo_libro"""
+        self.codigo_biblioteca = codigo_biblioteca
+        valores = list(zip(*filas)) if filas else [()] * len(CAMPOS_LIBRO)
+        self.columnas = [
+            None if posicion == POSICION_BIBLIOTECA else _columna(posicion, valores_campo)
+            for posicion, valores_campo in enumerate(valores)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.columnas[POSICION_CODIGO])
+
+    @property
+    def codigos(self) -> list:
+        return self.columnas[POSICION_CODIGO]
+
+    def posicion(self, codigo_libro: str) -> Optional[int]:
+        codigos = self.codigos
+        posicion = bisect_left(codigos, codigo_libro)
+        return posicion if posicion < len(codigos) and codigos[posicion] == codigo_libro else None
+
+    def filas(self, desde: int = 0, hasta: Optional[int] = None) -> List[tuple]:
+        hasta = len(self) if hasta is None else min(hasta, len(self))
+        if desde >= hasta:
+            return []
+        return list(zip(*(
+            itertools.repeat(self.codigo_biblioteca, hasta - desde) if columna is None else columna[desde:hasta]
+            for columna in self.columnas
+        )))
+
+    def fila(self, posicion: int) -> tuple:
+        return tuple(self.codigo_biblioteca if columna is None else columna[posicion] for columna in self.columnas)
+
+    def pagina(self, despues_de: Optional[str], limite: int) -> Tuple[List[tuple], Optional[str]]:
+        """Misma página y cursor que leer_pagina sobre codigo_libro"""
+        desde = 0 if despues_de is None else bisect_right(self.codigos, despues_de)
+        filas = self.filas(desde, desde + limite + 1)
+        if len(filas) > limite:
+            filas = filas[:limite]
+            return filas, str(filas[-1][POSICION_CODIGO])
+        return filas, None
+
+    def fijar_disponible(self, posicion: int, cantidad) -> bool:
+        """Cambia las copias disponibles en su sitio; False si la columna no admite el valor"""
+        try:
+            self.columnas[POSICION_DISPONIBLE][posicion] = cantidad
+            return True
+        except TypeError:
+            return False
+
+    def con_cambios(self, cambios: Dict[str, Optional[tuple]]) -> "LibrosBiblioteca":
+        """Copia con las filas de cambios (None elimina el código) en lugar de las actuales"""
+        filas = [fila for fila in self.filas() if fila[POSICION_CODIGO] not in cambios]
+        filas += [fila for fila in cambios.values() if fila is not None]
+        filas.sort(key=lambda fila: fila[POSICION_CODIGO])
+        return LibrosBiblioteca(self.codigo_biblioteca, filas)
+
+
+def _tamano_profundo(raiz, vistos: set) -> int:
+    """Bytes de raiz y de lo que contiene, sin contar dos veces un objeto ya visto"""
+    total = 0
+    pendientes = [raiz]
+    while pendientes:
+        objeto = pendientes.pop()
+        if id(objeto) in vistos:
+            continue
+        vistos.add(id(objeto))
+        total += sys.getsizeof(objeto)
+        if isinstance(objeto, dict):
+            pendientes.extend(objeto.keys())
+            pendientes.extend(objeto.values())
+        elif isinstance(objeto, (list, tuple)):
+            pendientes.extend(objeto)
+    return total
+
+
+def _leer(fragmento: Optional[int], funcion: Callable[[Session], object]):
+    """Ejecuta funcion con una sesión propia en el fragmento; nunca confirma"""
+    with CrearSesion() as sesion:
+        elegir_fragmento(sesion, fragmento)
+        return funcion(sesion)
+
+
+def _consulta_libros(sesion: Session):
+    return sesion.query(*columnas_respuesta(Libro, LibroRespuesta))
+
+
+def _leer_libros(sesion: Session, codigos: List[str]) -> Dict[str, tuple]:
+    leidos = {}
+    for inicio in range(0, len(codigos), TAMANO_LOTE_CODIGOS):
+        for fila in _consulta_libros(sesion).filter(Libro.codigo_libro.in_(codigos[inicio:inicio + TAMANO_LOTE_CODIGOS])):
+            leidos[fila[POSICION_CODIGO]] = tuple(fila)
+    return leidos
+
+
+class ModeloCatalogo:
+    """Modelo de lectura de libros y bibliotecas en la memoria del proceso.
+
+    Se carga completo al iniciar y se mantiene con el registro de eventos de cada base
+    (eventos_biblioteca): por cada libro con eventos nuevos se vuelve a leer su fila, así
+    aplicar un evento dos veces no cambia nada. Las bibliotecas se recargan enteras cuando
+    cambia su generación de caché. Si la poda borró eventos que faltaban por leer se recarga
+    el fragmento. Una sola sincronización a la vez; las lecturas no esperan a ninguna.
+    """
+
+    def __init__(self):
+        self.activo = False
+        self.candado = threading.Lock()
+        # Pasadas de sincronización empezadas y terminadas; van una tras otra, así que la
+        # pasada n ha terminado cuando pasadas_terminadas >= n
+        self.condicion = threading.Condition()
+        self.pasadas_iniciadas = 0
+        self.pasadas_terminadas = 0
+        self.en_curso = False
+        self.libros: Dict[int, LibrosBiblioteca] = {}
+        self.ubicacion: Dict[str, int] = {}  # codigo_libro -> codigo_biblioteca
+        # (filas activas, sus códigos, fila por código de todas), se sustituye completo
+        self.bibliotecas: Tuple[list, list, dict] = ([], [], {})
+        self.generacion_bibliotecas = None
+        self.posiciones: Dict[Optional[int], int] = {}  # último evento aplicado por fragmento
+        self.sincronizaciones = 0
+        self.recargas = 0
+        self.libros_releidos = 0
+        self.ultima_sincronizacion: Optional[datetime] = None
+
+    # --- Lecturas ---
+
+    def fila_libro(self, codigo_libro: str) -> Optional[tuple]:
+        codigo_biblioteca = self.ubicacion.get(codigo_libro)
+        libros = self.libros.get(codigo_biblioteca) if codigo_biblioteca is not None else None
+        posicion = libros.posicion(codigo_libro) if libros else None
+        return None if posicion is None else libros.fila(posicion)
+
+    def pagina_libros(self, codigo_biblioteca: int, despues_de: Optional[str], limite: Optional[int]):
+        libros = self.libros.get(codigo_biblioteca)
+        if libros is None:
+            return [], None
+        return libros.pagina(despues_de, limite or LIMITE_POR_DEFECTO)
+
+    def buscar_libros(self, codigo_biblioteca: Optional[int], limite: int, desplazamiento: int) -> List[tuple]:
+        """Búsqueda sin filtros de texto: libros por codigo_libro, como BuscadorLibros.buscar"""
+        if codigo_biblioteca:
+            libros = self.libros.get(codigo_biblioteca)
+            return libros.filas(desplazamiento, desplazamiento + limite) if libros else []
+        # Cada biblioteca ya está ordenada: se mezclan solo las primeras desplazamiento + limite de cada una
+        mezclados = heapq.merge(
+            *(libros.filas(0, desplazamiento + limite) for libros in list(self.libros.values())),
+            key=lambda fila: fila[POSICION_CODIGO]
+        )
+        return list(itertools.islice(mezclados, desplazamiento, desplazamiento + limite))
+
+    def fila_biblioteca(self, codigo_biblioteca: int) -> Optional[tuple]:
+        return self.bibliotecas[2].get(codigo_biblioteca)
+
+    def pagina_bibliotecas(self, despues_de: Optional[int], limite: Optional[int]):
+        """Bibliotecas activas por código, con el cursor de leer_pagina"""
+        limite = limite or LIMITE_POR_DEFECTO
+        activas, codigos, _ = self.bibliotecas
+        desde = 0 if despues_de is None else bisect_right(codigos, despues_de)
+        filas = activas[desde:desde + limite + 1]
+        if len(filas) > limite:
+            filas = filas[:limite]
+            return filas, str(codigos[desde + limite - 1])
+        return filas, None
+
+    # --- Carga y sincronización ---
+
+    def _cargar_bibliotecas(self):
+        def leer(sesion: Session):
+            # La generación se lee antes: un cambio posterior fuerza otra recarga, nunca se pierde
+            generacion = CacheLecturas.generaciones(sesion).get("bibliotecas")
+            filas = sesion.query(*columnas_respuesta(Biblioteca, BibliotecaRespuesta)).order_by(
+                Biblioteca.codigo_biblioteca
+            ).all()
+            return generacion, [tuple(fila) for fila in filas]
+
+        generacion, filas = _leer(None, leer)
+        activas = [fila for fila in filas if fila[POSICION_ACTIVA]]
+        self.bibliotecas = (
+            activas,
+            [fila[POSICION_CODIGO_BIBLIOTECA] for fila in activas],
+            {fila[POSICION_CODIGO_BIBLIOTECA]: fila for fila in filas},
+        )
+        self.generacion_bibliotecas = generacion
+
+    def _recargar_fragmento(self, fragmento: Optional[int]):
+        """Carga todos los libros del fragmento y sustituye los que tenía en memoria"""
+        def leer(sesion: Session):
+            # La posición se toma antes de leer: los eventos que lleguen durante la lectura se aplican después
+            _, ultimo = RegistroEventos.limites(sesion)
+            nuevos = {}
+            filas = _consulta_libros(sesion).order_by(Libro.codigo_biblioteca, Libro.codigo_libro).execution_options(
+                yield_per=TAMANO_LOTE_LECTURA
+            )
+            for codigo_biblioteca, grupo in itertools.groupby(filas, key=lambda fila: fila[POSICION_BIBLIOTECA]):
+                nuevos[codigo_biblioteca] = LibrosBiblioteca(codigo_biblioteca, [tuple(fila) for fila in grupo])
+            return ultimo, nuevos
+
+        ultimo, nuevos = _leer(fragmento, leer)
+        recarga = fragmento in self.posiciones
+        for codigo_biblioteca, libros in nuevos.items():
+            self.libros[codigo_biblioteca] = libros
+            for codigo_libro in libros.codigos:
+                self.ubicacion[codigo_libro] = codigo_biblioteca
+        if recarga:
+            # Se quitan las bibliotecas y libros del fragmento que ya no están en la base
+            for codigo_biblioteca in [
+                codigo for codigo in self.libros
+                if codigo not in nuevos and fragmento_de_biblioteca(codigo) == fragmento
+            ]:
+                del self.libros[codigo_biblioteca]
+            for codigo_libro in [
+                codigo for codigo, biblioteca in self.ubicacion.items()
+                if fragmento_de_biblioteca(biblioteca) == fragmento
+                and (biblioteca not in nuevos or nuevos[biblioteca].posicion(codigo) is None)
+            ]:
+                del self.ubicacion[codigo_libro]
+        self.posiciones[fragmento] = ultimo
+        self.recargas += 1
+
+    def _aplicar_libros(self, fragmento: Optional[int], codigos: List[str], leidos: Dict[str, tuple]):
+        """Lleva a memoria el estado leído en el fragmento de cada código (ausente en leidos: eliminado)"""
+        cambios: Dict[int, Dict[str, Optional[tuple]]] = {}
+        for codigo_libro in codigos:
+            fila = leidos.get(codigo_libro)
+            anterior = self.ubicacion.get(codigo_libro)
+            if fila is None:
+                # Si el código ya es de un libro de otro fragmento, ese libro sigue existiendo
+                if anterior is not None and fragmento_de_biblioteca(anterior) == fragmento:
+                    cambios.setdefault(anterior, {})[codigo_libro] = None
+                continue
+            codigo_biblioteca = fila[POSICION_BIBLIOTECA]
+            if anterior is not None and anterior != codigo_biblioteca:
+                cambios.setdefault(anterior, {})[codigo_libro] = None
+            libros = self.libros.get(codigo_biblioteca)
+            posicion = libros.posicion(codigo_libro) if libros and anterior == codigo_biblioteca else None
+            if posicion is not None:
+                actual = libros.fila(posicion)
+                if actual == fila:
+                    continue
+                # Préstamos y devoluciones solo cambian las copias disponibles: se escriben en su sitio
+                solo_disponible = all(
+                    actual[indice] == fila[indice] for indice in range(len(fila)) if indice != POSICION_DISPONIBLE
+                )
+                if solo_disponible and libros.fijar_disponible(posicion, fila[POSICION_DISPONIBLE]):
+                    continue
+            cambios.setdefault(codigo_biblioteca, {})[codigo_libro] = fila
+
+        for codigo_biblioteca, cambios_biblioteca in cambios.items():
+            libros = self.libros.get(codigo_biblioteca) or LibrosBiblioteca(codigo_biblioteca, [])
+            libros = libros.con_cambios(cambios_biblioteca)
+            if len(libros):
+                self.libros[codigo_biblioteca] = libros
+            else:
+                self.libros.pop(codigo_biblioteca, None)
+        for codigo_biblioteca, cambios_biblioteca in cambios.items():
+            for codigo_libro, fila in cambios_biblioteca.items():
+                if fila is not None:
+                    self.ubicacion[codigo_libro] = codigo_biblioteca
+                elif self.ubicacion.get(codigo_libro) == codigo_biblioteca:
+                    del self.ubicacion[codigo_libro]
+
+    def _sincronizar_fragmento(self, fragmento: Optional[int]):
+        posicion = self.posiciones.get(fragmento, 0)
+
+        def leer(sesion: Session):
+            primero, ultimo = RegistroEventos.limites(sesion)
+            if ultimo == posicion:
+                return None
+            if primero > posicion + 1 or ultimo < posicion:
+                return ultimo, None, None
+            codigos = RegistroEventos.libros_cambiados(sesion, posicion, ultimo)
+            return ultimo, codigos, _leer_libros(sesion, codigos)
+
+        leido = _leer(fragmento, leer)
+        if leido is None:
+            return
+        ultimo, codigos, leidos = leido
+        if codigos is None:
+            # La poda borró eventos que no se habían aplicado
+            registro.info("Modelo de lectura: se recarga el fragmento %s", fragmento)
+            self._recargar_fragmento(fragmento)
+            return
+        self._aplicar_libros(fragmento, codigos, leidos)
+        self.libros_releidos += len(codigos)
+        self.posiciones[fragmento] = ultimo
+
+    def _sincronizar(self):
+        generacion = _leer(None, lambda sesion: CacheLecturas.generaciones(sesion).get("bibliotecas"))
+        if generacion != self.generacion_bibliotecas:
+            self._cargar_bibliotecas()
+        for fragmento in fragmentos_de_datos():
+            self._sincronizar_fragmento(fragmento)
+        self.sincronizaciones += 1
+        self.ultima_sincronizacion = datetime.now(timezone.utc)
+
+    def sincronizar(self):
+        """Aplica los eventos nuevos de todos los fragmentos.
+
+        Vuelve cuando terminó una pasada que empezó después de la llamada, así que incluye todo
+        lo confirmado antes. Si otra está en curso se espera a que acabe y quien esperaba
+        ejecuta la siguiente por todos los que llegaron mientras tanto.
+        """
+        with self.condicion:
+            objetivo = self.pasadas_iniciadas + 1
+            while self.en_curso:
+                self.condicion.wait()
+            if self.pasadas_terminadas >= objetivo:
+                return
+            self.en_curso = True
+            self.pasadas_iniciadas += 1
+        # Las sentencias del modelo no pertenecen a la solicitud que lo haya provocado
+        token = medicion_actual.set(None)
+        try:
+            with self.candado:
+                self._sincronizar()
+        finally:
+            medicion_actual.reset(token)
+            with self.condicion:
+                self.en_curso = False
+                self.pasadas_terminadas += 1
+                self.condicion.notify_all()
+
+    def _tras_confirmar(self, sesion: Session):
+        # Lectura de lo propio: la solicitud que escribió no responde hasta que el modelo incluye
+        # su cambio. Una sesión puede haber confirmado en varios fragmentos, así que se revisan todos
+        try:
+            if sesion.asincrona:
+                # En modo async el commit corre en el hilo del event loop (dentro de run_sync): la
+                # sincronización, que lee con sesiones síncronas, va al threadpool y la solicitud
+                # la espera sin bloquear el loop
+                await_only(run_in_threadpool(self.sincronizar))
+            else:
+                self.sincronizar()
+        except Exception:
+            # La escritura ya está confirmada; la sincronización periódica la recogerá
+            registro.exception("Falló la sincronización del modelo de lectura tras confirmar")
+
+    def iniciar(self):
+        """Carga completa; desde aquí las rutas de lectura responden desde memoria"""
+        if motor.dialect.name != "sqlite":
+            raise RuntimeError("BIBLIOTECA_MODELO_LECTURA necesita SQLite: se alimenta de eventos_biblioteca")
+        with self.candado:
+            self.libros, self.ubicacion, self.posiciones = {}, {}, {}
+            self._cargar_bibliotecas()
+            for fragmento in fragmentos_de_datos():
+                self._recargar_fragmento(fragmento)
+        event.listen(SesionFragmentada, "after_commit", self._tras_confirmar)
+        self.activo = True
+
+    def detener(self):
+        self.activo = False
+        if event.contains(SesionFragmentada, "after_commit", self._tras_confirmar):
+            event.remove(SesionFragmentada, "after_commit", self._tras_confirmar)
+
+    async def sincronizacion_periodica(self, intervalo_segundos: float):
+        """Tarea de fondo: recoge cada intervalo las escrituras de otros procesos"""
+        medicion_actual.set(None)
+        while True:
+            try:
+                await run_in_threadpool(self.sincronizar)
+            except Exception:
+                registro.exception("Falló la sincronización del modelo de lectura")
+            await asyncio.sleep(intervalo_segundos)
+
+    # --- Informes ---
+
+    def estadisticas(self, memoria: bool = True) -> dict:
+        libros = list(self.libros.values())
+        resultado = {
+            "activo": self.activo,
+            "bibliotecas": len(self.bibliotecas[2]),
+            "bibliotecas_con_libros": len(libros),
+            "libros": sum(len(libros_biblioteca) for libros_biblioteca in libros),
+            "posiciones_eventos": {str(fragmento): posicion for fragmento, posicion in self.posiciones.items()},
+            "sincronizaciones": self.sincronizaciones,
+            "recargas": self.recargas,
+            "libros_releidos": self.libros_releidos,
+            "ultima_sincronizacion": self.ultima_sincronizacion,
+        }
+        if memoria:
+            resultado["memoria"] = self.memoria(libros)
+        return resultado
+
+    def memoria(self, libros: List[LibrosBiblioteca]) -> dict:
+        """Bytes ocupados por campo, índice y bibliotecas (getsizeof recursivo, cada objeto una vez)"""
+        vistos = set()
+        por_campo = dict.fromkeys(CAMPOS_LIBRO, 0)
+        estructuras = 0
+        for libros_biblioteca in libros:
+            estructuras += sys.getsizeof(libros_biblioteca) + sys.getsizeof(libros_biblioteca.columnas)
+            for campo, columna in zip(CAMPOS_LIBRO, libros_biblioteca.columnas):
+                if columna is not None:
+                    por_campo[campo] += _tamano_profundo(columna, vistos)
+        # Las claves del índice son las mismas cadenas de codigo_libro, ya contadas
+        indice = _tamano_profundo(self.ubicacion, vistos) + _tamano_profundo(self.libros, vistos)
+        bibliotecas = _tamano_profundo(self.bibliotecas, vistos)
+        total_libros = sum(por_campo.values()) + estructuras
+        cantidad = sum(len(libros_biblioteca) for libros_biblioteca in libros)
+        return {
+            "bytes_total": total_libros + indice + bibliotecas,
+            "bytes_libros": total_libros,
+            "bytes_por_libro": round(total_libros / cantidad, 1) if cantidad else 0,
+            "bytes_por_campo": por_campo,
+            "bytes_indices": indice,
+            "bytes_bibliotecas": bibliotecas,
+        }
+
+    def verificar(self) -> dict:
+        """Compara el modelo con la base y devuelve las diferencias.
+
+        Se sincroniza y se bloquea la sincronización durante la comparación; los libros con
+        eventos posteriores a la posición del modelo cambiaron mientras se leía y se omiten.
+        """
+        with self.candado:
+            token = medicion_actual.set(None)
+            try:
+                self._sincronizar()
+                return self._comparar()
+            finally:
+                medicion_actual.reset(token)
+
+    def _comparar(self) -> dict:
+        faltantes, sobrantes, distintos = [], [], []
+        revisados = omitidos = 0
+        for fragmento in fragmentos_de_datos():
+            posicion = self.posiciones.get(fragmento, 0)
+
+            def leer(sesion: Session):
+                filas = [
+                    tuple(fila) for fila in
+                    _consulta_libros(sesion).execution_options(yield_per=TAMANO_LOTE_LECTURA)
+                ]
+                # Después de leer los libros: cubre lo escrito mientras se leían
+                return filas, set(RegistroEventos.libros_cambiados(sesion, posicion))
+
+            filas, cambiados = _leer(fragmento, leer)
+            en_base = set()
+            for fila in filas:
+                codigo_libro = fila[POSICION_CODIGO]
+                en_base.add(codigo_libro)
+                if codigo_libro in cambiados:
+                    omitidos += 1
+                    continue
+                revisados += 1
+                en_memoria = self.fila_libro(codigo_libro)
+                if en_memoria is None:
+                    faltantes.append(codigo_libro)
+                elif en_memoria != fila:
+                    distintos.append(codigo_libro)
+            for codigo_biblioteca, libros in list(self.libros.items()):
+                if fragmento_de_biblioteca(codigo_biblioteca) == fragmento:
+                    sobrantes += [
+                        codigo for codigo in libros.codigos if codigo not in en_base and codigo not in cambiados
+                    ]
+
+        def leer_bibliotecas(sesion: Session):
+            filas = sesion.query(*columnas_respuesta(Biblioteca, BibliotecaRespuesta)).all()
+            return {fila[POSICION_CODIGO_BIBLIOTECA]: tuple(fila) for fila in filas}, CacheLecturas.generaciones(sesion).get("bibliotecas")
+
+        bibliotecas, generacion = _leer(None, leer_bibliotecas)
+        bibliotecas_distintas = [] if generacion != self.generacion_bibliotecas else sorted(
+            codigo for codigo in set(bibliotecas) | set(self.bibliotecas[2])
+            if bibliotecas.get(codigo) != self.bibliotecas[2].get(codigo)
+        )
+        return {
+            "consistente": not (faltantes or sobrantes or distintos or bibliotecas_distintas),
+            "libros_revisados": revisados,
+            "libros_omitidos": omitidos,
+            "bibliotecas_revisadas": len(bibliotecas) if generacion == self.generacion_bibliotecas else 0,
+            "faltantes": len(faltantes),
+            "sobrantes": len(sobrantes),
+            "distintos": len(distintos),
+            "bibliotecas_distintas": len(bibliotecas_distintas),
+            "ejemplos": {
+                "faltantes": faltantes[:MAXIMO_EJEMPLOS],
+                "sobrantes": sobrantes[:MAXIMO_EJEMPLOS],
+                "distintos": distintos[:MAXIMO_EJEMPLOS],
+                "bibliotecas_distintas": bibliotecas_distintas[:MAXIMO_EJEMPLOS],
+            },
+        }
+
+
+modelo_catalogo = ModeloCatalogo()
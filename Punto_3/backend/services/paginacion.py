@@ -0,0 +1,149 @@
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query as ConsultaORM, Session
+from typing import Callable, List, Optional, Sequence, Tuple, Type
+from ..database.db import CrearSesion, elegir_fragmento, fragmentos_de_datos, modo_async, obtener_sesion_async
+from .serializacion import Anidado, RespuestaJSONRapida, armador_filas, codificar_json, responder_filas
+
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+TAMANO_LOTE_STREAMING = 500
+CABECERA_CURSOR = "X-Siguiente-Cursor"
+
+
+def parametro_limite():
+    return Query(None, ge=1, le=LIMITE_MAXIMO, description="Máximo de filas a devolver")
+
+
+def parametro_formato():
+    return Query("json", pattern="^(json|ndjson)$", description="json paginado o ndjson en streaming")
+
+
+def separar_claves(valor: str, tipo: type = str, nombre: str = "clave") -> List:
+    """Claves separadas por comas de una consulta por lote, sin repetir y en el orden recibido"""
+    try:
+        claves = list(dict.fromkeys(tipo(clave.strip()) for clave in valor.split(",") if clave.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Valor de {nombre} inválido")
+    if not claves or len(claves) > LIMITE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Se esperan entre 1 y {LIMITE_MAXIMO} valores de {nombre}")
+    return claves
+
+
+def leer_pagina(consulta: ConsultaORM, columna_clave, despues_de, limite: Optional[int]) -> Tuple[list, Optional[str]]:
+    """Aplica paginación por cursor (keyset) sobre la clave primaria y devuelve (filas, siguiente cursor)"""
+    limite = limite or LIMITE_POR_DEFECTO
+    if despues_de is not None:
+        consulta = consulta.filter(columna_clave > despues_de)
+
+    filas = consulta.order_by(columna_clave).limit(limite + 1).all()
+    if len(filas) > limite:
+        filas = filas[:limite]
+        return filas, str(getattr(filas[-1], columna_clave.key))
+    return filas, None
+
+
+def responder_pagina(
+    consulta: ConsultaORM,
+    columna_clave,
+    despues_de,
+    limite: Optional[int],
+    esquema: Type[BaseModel],
+    anidados: Sequence[Anidado] = ()
+) -> RespuestaJSONRapida:
+    """Pagina una consulta de columnas (columnas_respuesta) y la codifica sin validar fila por fila"""
+    filas, cursor = leer_pagina(consulta, columna_clave, despues_de, limite)
+    return responder_filas(filas, esquema, {CABECERA_CURSOR: cursor} if cursor else None, anidados)
+
+
+def responder_pagina_fragmentos(
+    sesion: Session,
+    construir_consulta: Callable[[Session], ConsultaORM],
+    columna_clave,
+    despues_de: Optional[int],
+    limite: Optional[int],
+    esquema: Type[BaseModel],
+    anidados: Sequence[Anidado] = ()
+) -> RespuestaJSONRapida:
+    """responder_pagina sobre todos los fragmentos para listados por número de miembro o id de préstamo.
+
+    Los ids de cada fragmento ocupan un rango propio y creciente, así que leerlos fragmento a
+    fragmento da el mismo orden que la unión ordenada y el cursor sigue siendo el último id.
+    """
+    limite = limite or LIMITE_POR_DEFECTO
+    filas = []
+    for fragmento in fragmentos_de_datos():
+        elegir_fragmento(sesion, fragmento)
+        consulta = construir_consulta(sesion)
+        if despues_de is not None:
+            consulta = consulta.filter(columna_clave > despues_de)
+        filas += consulta.order_by(columna_clave).limit(limite + 1 - len(filas)).all()
+        if len(filas) > limite:
+            break
+    cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        cursor = str(getattr(filas[-1], columna_clave.key))
+    return responder_filas(filas, esquema, {CABECERA_CURSOR: cursor} if cursor else None, anidados)
+
+
+def transmitir_ndjson(
+    construir_consulta: Callable[[Session], ConsultaORM],
+    columna_clave,
+    despues_de,
+    limite: Optional[int],
+    esquema: Type[BaseModel],
+    anidados: Sequence[Anidado] = (),
+    fragmentos: Sequence[Optional[int]] = (None,),
+    sesion_solicitud: Optional[Session] = None
+) -> StreamingResponse:
+    """Envía las filas como NDJSON leyendo por lotes, sin cargar todo el resultado en memoria.
+
+    construir_consulta debe seleccionar las columnas del esquema (columnas_respuesta).
+    Las filas se leen de los fragmentos indicados, uno tras otro y en ese orden.
+    FastAPI cierra la sesión de la dependencia recién al terminar el cuerpo: si se pasa en
+    sesion_solicitud se cierra aquí, para no ocupar una conexión del pool mientras se envía.
+    """
+    if sesion_solicitud is not None:
+        sesion_solicitud.close()
+    armar = armador_filas(esquema, anidados)
+
+    def preparar(consulta: ConsultaORM, restantes: Optional[int]) -> ConsultaORM:
+        if despues_de is not None:
+            consulta = consulta.filter(columna_clave > despues_de)
+        consulta = consulta.order_by(columna_clave)
+        return consulta.limit(restantes) if restantes else consulta
+
+    def generar_filas():
+        # El cuerpo se envía después de que el handler retorna: se lee con una sesión propia
+        with CrearSesion() as sesion:
+            restantes = limite
+            for fragmento in fragmentos:
+                elegir_fragmento(sesion, fragmento)
+                for fila in preparar(construir_consulta(sesion), restantes).yield_per(TAMANO_LOTE_STREAMING):
+                    yield codificar_json(armar(fila)) + b"\n"
+                    if restantes:
+                        restantes -= 1
+                        if not restantes:
+                            return
+
+    async def generar_filas_async():
+        async with obtener_sesion_async()() as sesion_async:
+            restantes = limite
+            for fragmento in fragmentos:
+                elegir_fragmento(sesion_async.sync_session, fragmento)
+                consulta = preparar(construir_consulta(sesion_async.sync_session), restantes)
+                filas = await sesion_async.stream(
+                    consulta.statement.execution_options(yield_per=TAMANO_LOTE_STREAMING)
+                )
+                async for fila in filas:
+                    yield codificar_json(armar(fila)) + b"\n"
+                    if restantes:
+                        restantes -= 1
+                        if not restantes:
+                            return
+
+    generador = generar_filas_async() if modo_async() else generar_filas()
+    return StreamingResponse(generador, media_type="application/x-ndjson")
@@ -0,0 +1,151 @@
+import csv
+import io
+import zlib
+from typing import Callable, Iterable, List, Optional, Sequence
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Date, DateTime, Select
+from ..database.db import CrearSesion, elegir_fragmento, modo_async, obtener_sesion_async
+from .paginacion import TAMANO_LOTE_STREAMING
+from .serializacion import codificar_json
+
+
+TIPOS_MEDIO = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def acepta_gzip(accept_encoding: Optional[str]) -> bool:
+    """Si la cabecera Accept-Encoding admite gzip (sin q=0)"""
+    for opcion in (accept_encoding or "").lower().split(","):
+        nombre, _, parametro = opcion.partition(";")
+        if nombre.strip() not in ("gzip", "*"):
+            continue
+        parametro = parametro.replace(" ", "")
+        try:
+            return not parametro.startswith("q=") or float(parametro[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class CodificadorReporte:
+    """Convierte lotes de filas en bytes CSV o NDJSON y, si se pide, los comprime en gzip al vuelo"""
+
+    def __init__(self, formato: str, columnas: Sequence[str], comprimir: bool, posiciones_fecha: Sequence[int] = ()):
+        self.formato = formato
+        self.columnas = list(columnas)
+        # Columnas de fecha: en CSV van en ISO 8601, como en el JSON
+        self.posiciones_fecha = list(posiciones_fecha)
+        self.compresor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if comprimir else None
+        self.texto = io.StringIO()
+        self.escritor = csv.writer(self.texto, lineterminator="\n")
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self.compresor.compress(datos) if self.compresor else datos
+
+    def inicio(self) -> bytes:
+        """Cabecera del CSV; NDJSON no lleva"""
+        if self.formato == "csv":
+            self.escritor.writerow(self.columnas)
+        return self.comprimir(self.vaciar_texto())
+
+    def vaciar_texto(self) -> bytes:
+        datos = self.texto.getvalue().encode("utf-8")
+        self.texto.seek(0)
+        self.texto.truncate()
+        return datos
+
+    def lote(self, filas: Iterable) -> bytes:
+        if self.formato == "csv":
+            self.escritor.writerows(map(self.fila_csv, filas) if self.posiciones_fecha else filas)
+            datos = self.vaciar_texto()
+        else:
+            datos = b"".join(codificar_json(dict(zip(self.columnas, fila))) + b"\n" for fila in filas)
+        # El compresor retiene lo que aún no llena un bloque: puede devolver b"" hasta el siguiente lote
+        return self.comprimir(datos)
+
+    def fila_csv(self, fila) -> list:
+        fila = list(fila)
+        for posicion in self.posiciones_fecha:
+            if fila[posicion] is not None:
+                fila[posicion] = fila[posicion].isoformat()
+        return fila
+
+    def fin(self) -> bytes:
+        return self.compresor.flush() if self.compresor else b""
+
+
+def transmitir_reporte(
+    consulta: Select,
+    formato: str,
+    comprimir: bool,
+    nombre_archivo: str,
+    fragmentos: Sequence[Optional[int]] = (None,),
+    combinar: Optional[Callable[[List[list]], list]] = None
+) -> StreamingResponse:
+    """Envía el resultado de la consulta en CSV o NDJSON leyendo por lotes con un cursor abierto.
+
+    Los fragmentos se leen uno tras otro y en ese orden, con una sola consulta cada uno. Con
+    combinar, los resultados de todos los fragmentos (agregados, pocas filas) se leen completos
+    y se unen con esa función antes de enviarlos.
+    """
+    columnas = consulta.selected_columns
+    codificador = CodificadorReporte(formato, columnas.keys(), comprimir, [
+        posicion for posicion, columna in enumerate(columnas) if isinstance(columna.type, (Date, DateTime))
+    ])
+    consulta = consulta.execution_options(yield_per=TAMANO_LOTE_STREAMING)
+
+    def partir(filas: list):
+        for inicio in range(0, len(filas), TAMANO_LOTE_STREAMING):
+            yield filas[inicio:inicio + TAMANO_LOTE_STREAMING]
+
+    def generar_lotes():
+        # El cuerpo se envía después de que el handler retorna: se lee con una sesión propia
+        with CrearSesion() as sesion:
+            if combinar:
+                parciales = []
+                for fragmento in fragmentos:
+                    elegir_fragmento(sesion, fragmento)
+                    parciales.append(sesion.execute(consulta).all())
+                yield from partir(combinar(parciales))
+                return
+            for fragmento in fragmentos:
+                elegir_fragmento(sesion, fragmento)
+                yield from sesion.execute(consulta).partitions()
+
+    async def generar_lotes_async():
+        async with obtener_sesion_async()() as sesion_async:
+            if combinar:
+                parciales = []
+                for fragmento in fragmentos:
+                    elegir_fragmento(sesion_async.sync_session, fragmento)
+                    parciales.append((await sesion_async.execute(consulta)).all())
+                for lote in partir(combinar(parciales)):
+                    yield lote
+                return
+            for fragmento in fragmentos:
+                elegir_fragmento(sesion_async.sync_session, fragmento)
+                resultado = await sesion_async.stream(consulta)
+                async for lote in resultado.partitions():
+                    yield lote
+
+    # Un lote que el compresor aún retiene entero no produce un fragmento vacío
+    def generar_cuerpo():
+        yield codificador.inicio()
+        for lote in generar_lotes():
+            datos = codificador.lote(lote)
+            if datos:
+                yield datos
+        yield codificador.fin()
+
+    async def generar_cuerpo_async():
+        yield codificador.inicio()
+        async for lote in generar_lotes_async():
+            datos = codificador.lote(lote)
+            if datos:
+                yield datos
+        yield codificador.fin()
+
+    cabeceras = {"Content-Disposition": f'attachment; filename="{nombre_archivo}.{formato}"', "Vary": "Accept-Encoding"}
+    if comprimir:
+        cabeceras["Content-Encoding"] = "gzip"
+    generador = generar_cuerpo_async() if modo_async() else generar_cuerpo()
+    return StreamingResponse(generador, media_type=TIPOS_MEDIO[formato], headers=cabeceras)
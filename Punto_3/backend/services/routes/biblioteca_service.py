@@ -1,33 +1,113 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import BackgroundTasks, HTTPException, Depends, Header, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter
-from ...models.schemas import BibliotecaRespuesta, BibliotecaCrear
-from ...database.models import Biblioteca, Prestamo, Miembro, Libro
-from ...database.db import get_db  
+from ...models.schemas import BibliotecaRespuesta, BibliotecaCrear, EstadisticasBibliotecaRespuesta
+from ...database.models import Biblioteca
+from ...database.db import elegir_por_biblioteca, get_db
+from ...repositories.cache_repository import CacheLecturas
+from ...repositories.estadisticas_repository import ContadoresBiblioteca
+from ...repositories.eventos_repository import RegistroEventos
+from ...repositories.eliminacion_repository import EliminadorDatos, UMBRAL_ELIMINACION_INMEDIATA
+from ...repositories.fragmentos_repository import DirectorioFragmentos
+from ..eliminaciones import ejecutar_eliminacion
+from ..eventos import consultar, transmitir_eventos
+from ..asincrono import compatible_async
+from ..modelo_lectura import modelo_catalogo
+from ..paginacion import CABECERA_CURSOR, leer_pagina, parametro_formato, parametro_limite, transmitir_ndjson
+from ..serializacion import RespuestaJSONRapida, armador_filas, columnas_respuesta, filas_como_diccionarios
 
 router = APIRouter(prefix="/biblioteca", tags=["Biblioteca"])
+armar_biblioteca = armador_filas(BibliotecaRespuesta)
 
 @router.post("/", response_model=BibliotecaRespuesta, status_code=status.HTTP_201_CREATED)
+@compatible_async
 def crear_biblioteca(biblioteca: BibliotecaCrear, sesion: Session = Depends(get_db)):
     nueva_biblioteca = Biblioteca(**biblioteca.dict())
     sesion.add(nueva_biblioteca)
+    DirectorioFragmentos.replicar_biblioteca(sesion, nueva_biblioteca)
+    CacheLecturas.invalidar(sesion, "bibliotecas")
     sesion.commit()
     sesion.refresh(nueva_biblioteca)
     return nueva_biblioteca
 
 @router.get("/", response_model=List[BibliotecaRespuesta])
-def listar_bibliotecas(sesion: Session = Depends(get_db)):
-    return sesion.query(Biblioteca).filter(Biblioteca.estado_activo == True).all()
+@compatible_async
+def listar_bibliotecas(
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[int] = None,
+    formato: str = parametro_formato(),
+    sesion: Session = Depends(get_db)
+):
+    def consulta(sesion_consulta: Session):
+        return sesion_consulta.query(*columnas_respuesta(Biblioteca, BibliotecaRespuesta)).filter(
+            Biblioteca.estado_activo == True
+        )
+
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Biblioteca.codigo_biblioteca, despues_de, limite, BibliotecaRespuesta, sesion_solicitud=sesion
+        )
+
+    if modelo_catalogo.activo:
+        filas, cursor = modelo_catalogo.pagina_bibliotecas(despues_de, limite)
+        return RespuestaJSONRapida(filas_como_diccionarios(filas, BibliotecaRespuesta),
+                                   headers={CABECERA_CURSOR: cursor} if cursor else None)
+
+    def cargar_pagina():
+        filas, cursor = leer_pagina(consulta(sesion), Biblioteca.codigo_biblioteca, despues_de, limite)
+        return filas_como_diccionarios(filas, BibliotecaRespuesta), cursor
+
+    filas, cursor = CacheLecturas.leer(sesion, "bibliotecas", ("lista", despues_de, limite), cargar_pagina)
+    return RespuestaJSONRapida(filas, headers={CABECERA_CURSOR: cursor} if cursor else None)
 
 @router.get("/{codigo_biblioteca}", response_model=BibliotecaRespuesta)
+@compatible_async
 def obtener_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
-    biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == codigo_biblioteca).first()
+    if modelo_catalogo.activo:
+        fila = modelo_catalogo.fila_biblioteca(codigo_biblioteca)
+        if fila is None:
+            raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
+        return RespuestaJSONRapida(armar_biblioteca(fila))
+    biblioteca = CacheLecturas.obtener_biblioteca(sesion, codigo_biblioteca)
     if not biblioteca:
         raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
     return biblioteca
 
+@router.get("/{codigo_biblioteca}/estadisticas", response_model=EstadisticasBibliotecaRespuesta)
+@compatible_async
+def obtener_estadisticas_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
+    if not ContadoresBiblioteca.usa_triggers(sesion):
+        # Calcularlas al leer recorrería todos los libros y préstamos de la biblioteca en cada consulta
+        raise HTTPException(
+            status_code=501, detail="Las estadísticas necesitan SQLite: los contadores los mantienen sus triggers"
+        )
+    elegir_por_biblioteca(sesion, codigo_biblioteca)
+    estadisticas = ContadoresBiblioteca.obtener(sesion, codigo_biblioteca)
+    if estadisticas is None:
+        raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
+    return estadisticas
+
+@router.get("/{codigo_biblioteca}/eventos")
+async def eventos_biblioteca(
+    codigo_biblioteca: int,
+    desde: Optional[int] = Query(None, ge=0, description="Último id de evento recibido"),
+    last_event_id: Optional[int] = Header(None, ge=0)
+):
+    # Flujo SSE de cambios de disponibilidad y préstamos; al reconectar, EventSource envía Last-Event-ID.
+    # Sin get_db: FastAPI cerraría su sesión al terminar el flujo y cada cliente ocuparía una conexión
+    disponible, activa = await consultar(lambda sesion: (
+        RegistroEventos.disponible(sesion), CacheLecturas.biblioteca_activa(sesion, codigo_biblioteca)
+    ))
+    if not disponible:
+        # Sin eventos el flujo solo enviaría latidos y el cliente mostraría datos viejos
+        raise HTTPException(status_code=501, detail="El flujo de eventos necesita SQLite: los eventos los registran sus triggers")
+    if not activa:
+        raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
+    return transmitir_eventos(codigo_biblioteca, last_event_id if last_event_id is not None else desde)
+
 @router.put("/{codigo_biblioteca}", response_model=BibliotecaRespuesta)
+@compatible_async
 def actualizar_biblioteca(codigo_biblioteca: int, biblioteca: BibliotecaCrear, sesion: Session = Depends(get_db)):
     biblioteca_bd = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == codigo_biblioteca).first()
     if not biblioteca_bd:
@@ -36,34 +116,47 @@ def actualizar_biblioteca(codigo_biblioteca: int, biblioteca: BibliotecaCrear, s
     for campo, valor in biblioteca.dict().items():
         setattr(biblioteca_bd, campo, valor)
     
+    DirectorioFragmentos.replicar_biblioteca(sesion, biblioteca_bd)
+    CacheLecturas.invalidar(sesion, "bibliotecas")
     sesion.commit()
     sesion.refresh(biblioteca_bd)
     return biblioteca_bd
 
 @router.delete("/{codigo_biblioteca}")
-def eliminar_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
+@compatible_async
+def eliminar_biblioteca(
+    codigo_biblioteca: int,
+    respuesta: Response,
+    tareas: BackgroundTasks,
+    en_segundo_plano: Optional[bool] = Query(None, description="Por defecto solo si hay muchas filas que borrar"),
+    sesion: Session = Depends(get_db)
+):
     biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == codigo_biblioteca).first()
     if not biblioteca:
         raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
     
-    # Eliminar en cascada: préstamos -> miembros -> libros -> biblioteca
-    # Eliminar préstamos de miembros de esta biblioteca
-    prestamos = sesion.query(Prestamo).join(Miembro).filter(Miembro.codigo_biblioteca == codigo_biblioteca).all()
-    for prestamo in prestamos:
-        sesion.delete(prestamo)
-    
-    # Eliminar miembros de esta biblioteca
-    miembros = sesion.query(Miembro).filter(Miembro.codigo_biblioteca == codigo_biblioteca).all()
-    for miembro in miembros:
-        sesion.delete(miembro)
+    # Se oculta de los listados y deja de aceptar altas mientras se elimina
+    biblioteca.estado_activo = False
+    DirectorioFragmentos.replicar_biblioteca(sesion, biblioteca)
+    CacheLecturas.invalidar(sesion, "bibliotecas")
+    sesion.commit()
     
-    # Eliminar libros de esta biblioteca
-    libros = sesion.query(Libro).filter(Libro.codigo_biblioteca == codigo_biblioteca).all()
-    for libro in libros:
-        sesion.delete(libro)
+    # Sus datos están en su fragmento; los trabajos de eliminación se guardan en la base global
+    elegir_por_biblioteca(sesion, codigo_biblioteca)
+    total_filas = EliminadorDatos.contar_filas_biblioteca(sesion, codigo_biblioteca)
+    if en_segundo_plano is None:
+        en_segundo_plano = total_filas > UMBRAL_ELIMINACION_INMEDIATA
     
-    # Eliminar la biblioteca
-    sesion.delete(biblioteca)
-    sesion.commit()
+    if en_segundo_plano:
+        trabajo = EliminadorDatos.programar_eliminacion_biblioteca(sesion, biblioteca, total_filas)
+        tareas.add_task(ejecutar_eliminacion, trabajo.id_trabajo)
+        respuesta.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "mensaje": "Eliminación de la biblioteca programada",
+            "id_trabajo": trabajo.id_trabajo,
+            "estado": f"/trabajos/{trabajo.id_trabajo}"
+        }
     
-    return {"mensaje": "Biblioteca y todos sus datos asociados eliminados exitosamente"}
\ No newline at end of file
+    # Eliminar en cascada por lotes: préstamos -> miembros -> libros -> biblioteca
+    EliminadorDatos.eliminar_biblioteca(sesion, codigo_biblioteca)
+    return {"mensaje": "Biblioteca y todos sus datos asociados eliminados exitosamente"}
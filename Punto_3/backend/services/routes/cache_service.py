@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from ...repositories.cache_repository import CacheLecturas
+
+router = APIRouter(prefix="/cache", tags=["Caché"])
+
+@router.get("/estadisticas")
+def estadisticas_cache():
+    """Aciertos, fallos y ocupación de la caché de este proceso"""
+    return CacheLecturas.estadisticas()
@@ -1,80 +1,215 @@
-from fastapi import HTTPException, Depends, status
+import heapq
+import io
+from fastapi import HTTPException, Depends, File, UploadFile, Query, status
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi import APIRouter
-from ...database.models import Biblioteca,Libro, Prestamo
-from ...models.schemas import  LibroCrear, LibroRespuesta
-from ...database.db import get_db  
+from ...database.models import DirectorioLibro, Libro, Prestamo
+from ...models.schemas import  LibroCrear, LibroRespuesta, ResumenImportacion, SugerenciasAutocompletado
+from ...database.db import (
+    elegir_fragmento, elegir_por_biblioteca, fragmento_de_biblioteca, fragmentos_de_datos, get_db
+)
+from ...repositories.cache_repository import CacheLecturas
+from ...repositories.eliminacion_repository import EliminadorDatos
+from ...repositories.importacion_repository import ImportadorCatalogo
+from ...repositories.busqueda_repository import BuscadorLibros
+from ...repositories.autocompletado_repository import AutocompletadoLibros
+from ...repositories.fragmentos_repository import DirectorioFragmentos
+from ..asincrono import compatible_async
+from ..modelo_lectura import modelo_catalogo
+from ..paginacion import (
+    CABECERA_CURSOR, parametro_formato, parametro_limite, responder_pagina, separar_claves, transmitir_ndjson
+)
+from ..serializacion import RespuestaJSONRapida, armador_filas, columnas_respuesta, responder_filas
 
 router = APIRouter(prefix="/libros", tags=["Libros"])
+armar_libro = armador_filas(LibroRespuesta)
 
 @router.post("/", response_model=LibroRespuesta, status_code=status.HTTP_201_CREATED)
+@compatible_async
 def crear_libro(libro: LibroCrear, sesion: Session = Depends(get_db)):
+    elegir_por_biblioteca(sesion, libro.codigo_biblioteca)
+    
     # Verificar que la biblioteca existe
-    biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == libro.codigo_biblioteca).first()
-    if not biblioteca:
+    if not CacheLecturas.biblioteca_activa(sesion, libro.codigo_biblioteca):
         raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
     
-    # Verificar que el código del libro no existe
-    libro_existente = sesion.query(Libro).filter(Libro.codigo_libro == libro.codigo_libro).first()
-    if libro_existente:
+    # Verificar que el código del libro no existe (con fragmentos, en el directorio global)
+    if CacheLecturas.datos_libro(sesion, libro.codigo_libro) or \
+            DirectorioFragmentos.libro_registrado(sesion, libro.codigo_libro):
         raise HTTPException(status_code=400, detail="Código de libro ya existe")
     
     datos_libro = libro.dict()
     datos_libro["cantidad_disponible"] = datos_libro["cantidad_total"]
+    DirectorioFragmentos.registrar_libros(sesion, [datos_libro])
     nuevo_libro = Libro(**datos_libro)
     sesion.add(nuevo_libro)
+    CacheLecturas.invalidar(sesion, "libros")
     sesion.commit()
     sesion.refresh(nuevo_libro)
     return nuevo_libro
 
+@router.post("/importar", response_model=ResumenImportacion)
+@compatible_async
+def importar_libros(
+    archivo: UploadFile = File(...),
+    formato: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    sesion: Session = Depends(get_db)
+):
+    try:
+        formato = ImportadorCatalogo.detectar_formato(archivo.filename, formato)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    lineas = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+    return ImportadorCatalogo.importar_libros(sesion, ImportadorCatalogo.leer_filas(lineas, formato))
+
+@router.get("/", response_model=List[LibroRespuesta])
+@compatible_async
+def obtener_libros(
+    codigo: str = Query(..., description="Códigos de libro separados por comas: a,b,c"),
+    sesion: Session = Depends(get_db)
+):
+    # Todos los códigos se resuelven con un solo IN; se responden en el orden pedido y se omiten los inexistentes
+    codigos = separar_claves(codigo, nombre="codigo")
+    if modelo_catalogo.activo:
+        filas = (modelo_catalogo.fila_libro(clave) for clave in codigos)
+        return responder_filas([fila for fila in filas if fila is not None], LibroRespuesta)
+    libros = []
+    for fragmento, codigos_fragmento in DirectorioFragmentos.agrupar_libros(sesion, codigos).items():
+        elegir_fragmento(sesion, fragmento)
+        libros += sesion.query(*columnas_respuesta(Libro, LibroRespuesta)).filter(
+            Libro.codigo_libro.in_(codigos_fragmento)
+        ).all()
+    posiciones = {clave: posicion for posicion, clave in enumerate(codigos)}
+    return responder_filas(sorted(libros, key=lambda libro: posiciones[libro.codigo_libro]), LibroRespuesta)
+
 @router.get("/bibliotecas/{codigo_biblioteca}/libros", response_model=List[LibroRespuesta])
-def listar_libros_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
-    return sesion.query(Libro).filter(Libro.codigo_biblioteca == codigo_biblioteca).all()
+@compatible_async
+def listar_libros_biblioteca(
+    codigo_biblioteca: int,
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[str] = None,
+    formato: str = parametro_formato(),
+    sesion: Session = Depends(get_db)
+):
+    def consulta(sesion_consulta: Session):
+        return sesion_consulta.query(*columnas_respuesta(Libro, LibroRespuesta)).filter(
+            Libro.codigo_biblioteca == codigo_biblioteca
+        )
+
+    if modelo_catalogo.activo and formato == "json":
+        filas, cursor = modelo_catalogo.pagina_libros(codigo_biblioteca, despues_de, limite)
+        return responder_filas(filas, LibroRespuesta, {CABECERA_CURSOR: cursor} if cursor else None)
+    fragmento = fragmento_de_biblioteca(codigo_biblioteca)
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Libro.codigo_libro, despues_de, limite, LibroRespuesta, fragmentos=[fragmento],
+            sesion_solicitud=sesion
+        )
+    elegir_fragmento(sesion, fragmento)
+    return responder_pagina(consulta(sesion), Libro.codigo_libro, despues_de, limite, LibroRespuesta)
 
-@router.get("/buscar")
+@router.get("/buscar", response_model=List[LibroRespuesta])
+@compatible_async
 def buscar_libros(
+    q: Optional[str] = None,
     titulo: Optional[str] = None,
     autor: Optional[str] = None,
     categoria: Optional[str] = None,
     codigo_biblioteca: Optional[int] = None,
+    limite: int = Query(50, ge=1, le=200),
+    desplazamiento: int = Query(0, ge=0),
     sesion: Session = Depends(get_db)
 ):
-    consulta = sesion.query(Libro)
-    
-    if titulo:
-        consulta = consulta.filter(Libro.titulo_obra.contains(titulo))
-    if autor:
-        consulta = consulta.filter(Libro.autor_principal.contains(autor))
-    if categoria:
-        consulta = consulta.filter(Libro.categoria_tema.contains(categoria))
-    if codigo_biblioteca:
-        consulta = consulta.filter(Libro.codigo_biblioteca == codigo_biblioteca)
-    
-    return consulta.all()
+    # Sin filtros de texto el orden es por código y se responde desde el modelo de lectura; con texto hace falta FTS5
+    if modelo_catalogo.activo and not (q or titulo or autor or categoria):
+        return responder_filas(modelo_catalogo.buscar_libros(codigo_biblioteca, limite, desplazamiento), LibroRespuesta)
+    filtros = dict(consulta_libre=q, titulo=titulo, autor=autor, categoria=categoria, codigo_biblioteca=codigo_biblioteca)
+    columnas = columnas_respuesta(Libro, LibroRespuesta)
+    fragmentos = [fragmento_de_biblioteca(codigo_biblioteca)] if codigo_biblioteca else fragmentos_de_datos()
+    if len(fragmentos) == 1:
+        elegir_fragmento(sesion, fragmentos[0])
+        libros = BuscadorLibros.buscar(
+            sesion, **filtros, limite=limite, desplazamiento=desplazamiento, columnas=columnas
+        )
+        return responder_filas(libros, LibroRespuesta)
+    
+    # Cada fragmento devuelve sus primeros desplazamiento + limite resultados con su criterio de
+    # orden en la última columna; se mezclan y se corta la página. La relevancia de FTS5 se
+    # calcula con las frecuencias de cada fragmento
+    por_fragmento = []
+    for fragmento in fragmentos:
+        elegir_fragmento(sesion, fragmento)
+        por_fragmento.append(BuscadorLibros.buscar(
+            sesion, **filtros, limite=desplazamiento + limite, columnas=columnas, incluir_orden=True
+        ))
+    mezclados = heapq.merge(*por_fragmento, key=lambda fila: fila[-1])
+    return responder_filas(
+        [fila[:-1] for fila in list(mezclados)[desplazamiento:desplazamiento + limite]], LibroRespuesta
+    )
+
+@router.get("/autocompletar", response_model=SugerenciasAutocompletado)
+@compatible_async
+def autocompletar_libros(
+    q: str = Query(..., min_length=1, max_length=100),
+    codigo_biblioteca: Optional[int] = None,
+    limite: int = Query(10, ge=1, le=50),
+    sesion: Session = Depends(get_db)
+):
+    fragmentos = [fragmento_de_biblioteca(codigo_biblioteca)] if codigo_biblioteca else fragmentos_de_datos()
+    if len(fragmentos) == 1:
+        elegir_fragmento(sesion, fragmentos[0])
+        return RespuestaJSONRapida(AutocompletadoLibros.sugerir(sesion, q, codigo_biblioteca, limite))
+    
+    por_fragmento = []
+    for fragmento in fragmentos:
+        elegir_fragmento(sesion, fragmento)
+        por_fragmento.append(AutocompletadoLibros.sugerir(sesion, q, codigo_biblioteca, limite))
+    return RespuestaJSONRapida(AutocompletadoLibros.mezclar_sugerencias(por_fragmento, q, limite))
+
+@router.get("/{codigo_libro}", response_model=LibroRespuesta)
+@compatible_async
+def obtener_libro(codigo_libro: str, sesion: Session = Depends(get_db)):
+    if modelo_catalogo.activo:
+        fila = modelo_catalogo.fila_libro(codigo_libro)
+        if fila is None:
+            raise HTTPException(status_code=404, detail="Libro no encontrado")
+        return RespuestaJSONRapida(armar_libro(fila))
+    libro = DirectorioFragmentos.elegir_por_libro(sesion, codigo_libro) and \
+        CacheLecturas.obtener_libro(sesion, codigo_libro)
+    if not libro:
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    return libro
 
 @router.put("/{codigo_libro}", response_model=LibroRespuesta)
+@compatible_async
 def actualizar_libro(codigo_libro: str, libro: LibroCrear, sesion: Session = Depends(get_db)):
-    libro_bd = sesion.query(Libro).filter(Libro.codigo_libro == codigo_libro).first()
+    libro_bd = DirectorioFragmentos.elegir_por_libro(sesion, codigo_libro) and \
+        sesion.query(Libro).filter(Libro.codigo_libro == codigo_libro).first()
     if not libro_bd:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
     
     # Si se cambia el código del libro, verificar que el nuevo no exista
     if libro.codigo_libro != codigo_libro:
         libro_existente = sesion.query(Libro).filter(Libro.codigo_libro == libro.codigo_libro).first()
-        if libro_existente:
+        if libro_existente or DirectorioFragmentos.libro_registrado(sesion, libro.codigo_libro):
             raise HTTPException(status_code=400, detail="El nuevo código de libro ya existe")
     
     # Verificar que la biblioteca existe si se está cambiando
     if libro.codigo_biblioteca != libro_bd.codigo_biblioteca:
-        biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == libro.codigo_biblioteca).first()
-        if not biblioteca:
+        # Cambiar de fragmento exigiría mover el libro y su historial a otra base
+        if fragmento_de_biblioteca(libro.codigo_biblioteca) != fragmento_de_biblioteca(libro_bd.codigo_biblioteca):
+            raise HTTPException(status_code=409, detail="La nueva biblioteca está en otro fragmento de la base de datos")
+        
+        if not CacheLecturas.biblioteca_activa(sesion, libro.codigo_biblioteca):
             raise HTTPException(status_code=404, detail="Nueva biblioteca no encontrada")
         
         # Verificar que no tenga préstamos activos antes de cambiar de biblioteca
         prestamos_activos = sesion.query(Prestamo).filter(
             Prestamo.codigo_libro == codigo_libro,
-            Prestamo.estado_prestamo == "Activo"
+            Prestamo.estado_prestamo.in_(Prestamo.ESTADOS_PENDIENTES)
         ).count()
         
         if prestamos_activos > 0:
@@ -95,32 +230,36 @@ def actualizar_libro(codigo_libro: str, libro: LibroCrear, sesion: Session = Dep
         else:
             setattr(libro_bd, campo, valor)
     
+    DirectorioFragmentos.actualizar_libro(sesion, codigo_libro, libro.codigo_libro, libro.codigo_biblioteca)
+    CacheLecturas.invalidar(sesion, "libros")
     sesion.commit()
     sesion.refresh(libro_bd)
     return libro_bd
 
 @router.delete("/{codigo_libro}")
+@compatible_async
 def eliminar_libro(codigo_libro: str, sesion: Session = Depends(get_db)):
-    libro = sesion.query(Libro).filter(Libro.codigo_libro == codigo_libro).first()
+    libro = DirectorioFragmentos.elegir_por_libro(sesion, codigo_libro) and \
+        sesion.query(Libro).filter(Libro.codigo_libro == codigo_libro).first()
     if not libro:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
     
     # Verificar que no tenga préstamos activos
     prestamos_activos = sesion.query(Prestamo).filter(
         Prestamo.codigo_libro == codigo_libro,
-        Prestamo.estado_prestamo == "Activo"
+        Prestamo.estado_prestamo.in_(Prestamo.ESTADOS_PENDIENTES)
     ).count()
     
     if prestamos_activos > 0:
         raise HTTPException(status_code=400, detail="No se puede eliminar libro con préstamos activos")
     
-    # Eliminar historial de préstamos del libro
-    prestamos_historial = sesion.query(Prestamo).filter(Prestamo.codigo_libro == codigo_libro).all()
-    for prestamo in prestamos_historial:
-        sesion.delete(prestamo)
+    # Eliminar historial de préstamos del libro por lotes
+    EliminadorDatos.eliminar_en_lotes(sesion, Prestamo, Prestamo.codigo_libro == codigo_libro)
     
     # Eliminar el libro
-    sesion.delete(libro)
+    sesion.execute(delete(Libro).where(Libro.codigo_libro == codigo_libro))
+    DirectorioFragmentos.eliminar_libros(sesion, DirectorioLibro.codigo_libro == codigo_libro)
+    CacheLecturas.invalidar(sesion, "libros")
     sesion.commit()
     
     return {"mensaje": "Libro y su historial eliminados exitosamente"}
\ No newline at end of file
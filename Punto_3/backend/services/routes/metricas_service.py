@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..metricas import TIPO_CONTENIDO, exponer_metricas
+
+router = APIRouter(tags=["Métricas"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metricas():
+    """Latencia, sentencias SQL, tiempo en base de datos y pool de este proceso en formato Prometheus"""
+    return PlainTextResponse(exponer_metricas(), media_type=TIPO_CONTENIDO)
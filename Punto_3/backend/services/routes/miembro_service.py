@@ -1,18 +1,31 @@
-from fastapi import HTTPException, Depends, status
+import io
+from fastapi import HTTPException, Depends, File, Query, UploadFile, status
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter
-from ...database.models import Biblioteca, Miembro, Prestamo
-from ...models.schemas import MiembroCrear, MiembroRespuesta
-from ...database.db import get_db  
+from ...database.models import Miembro, Prestamo
+from ...models.schemas import MiembroCrear, MiembroRespuesta, ResumenImportacion
+from ...database.db import (
+    agrupar_por_fragmento, elegir_fragmento, elegir_por_biblioteca, elegir_por_id, fragmento_de_biblioteca,
+    fragmento_de_id, get_db
+)
+from ...repositories.cache_repository import CacheLecturas
+from ...repositories.eliminacion_repository import EliminadorDatos
+from ...repositories.importacion_repository import ImportadorCatalogo
+from ..asincrono import compatible_async
+from ..paginacion import parametro_formato, parametro_limite, responder_pagina, separar_claves, transmitir_ndjson
+from ..serializacion import columnas_respuesta, responder_filas
 
 router = APIRouter(prefix="/miembros", tags=["Miembros"])
 
 @router.post("/", response_model=MiembroRespuesta, status_code=status.HTTP_201_CREATED)
+@compatible_async
 def crear_miembro(miembro: MiembroCrear, sesion: Session = Depends(get_db)):
+    elegir_por_biblioteca(sesion, miembro.codigo_biblioteca)
+    
     # Verificar que la biblioteca existe
-    biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == miembro.codigo_biblioteca).first()
-    if not biblioteca:
+    if not CacheLecturas.biblioteca_activa(sesion, miembro.codigo_biblioteca):
         raise HTTPException(status_code=404, detail="Biblioteca no encontrada")
     
     nuevo_miembro = Miembro(**miembro.dict())
@@ -21,32 +34,81 @@ def crear_miembro(miembro: MiembroCrear, sesion: Session = Depends(get_db)):
     sesion.refresh(nuevo_miembro)
     return nuevo_miembro
 
+@router.post("/importar", response_model=ResumenImportacion)
+@compatible_async
+def importar_miembros(
+    archivo: UploadFile = File(...),
+    formato: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    sesion: Session = Depends(get_db)
+):
+    try:
+        formato = ImportadorCatalogo.detectar_formato(archivo.filename, formato)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    lineas = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+    return ImportadorCatalogo.importar_miembros(sesion, ImportadorCatalogo.leer_filas(lineas, formato))
+
+@router.get("/", response_model=List[MiembroRespuesta])
+@compatible_async
+def obtener_miembros(
+    numero: str = Query(..., description="Números de miembro separados por comas: 1,2,3"),
+    sesion: Session = Depends(get_db)
+):
+    # Todos los números se resuelven con un solo IN; se responden en el orden pedido y se omiten los inexistentes
+    numeros = separar_claves(numero, int, "numero")
+    miembros = []
+    for fragmento, numeros_fragmento in agrupar_por_fragmento(numeros, fragmento_de_id).items():
+        elegir_fragmento(sesion, fragmento)
+        miembros += sesion.query(*columnas_respuesta(Miembro, MiembroRespuesta)).filter(
+            Miembro.numero_miembro.in_(numeros_fragmento)
+        ).all()
+    posiciones = {clave: posicion for posicion, clave in enumerate(numeros)}
+    return responder_filas(sorted(miembros, key=lambda miembro: posiciones[miembro.numero_miembro]), MiembroRespuesta)
+
 @router.get("/bibliotecas/{codigo_biblioteca}/miembros", response_model=List[MiembroRespuesta])
-def listar_miembros_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
-    return sesion.query(Miembro).filter(
-        Miembro.codigo_biblioteca == codigo_biblioteca,
-        Miembro.cuenta_activa == True
-    ).all()
+@compatible_async
+def listar_miembros_biblioteca(
+    codigo_biblioteca: int,
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[int] = None,
+    formato: str = parametro_formato(),
+    sesion: Session = Depends(get_db)
+):
+    def consulta(sesion_consulta: Session):
+        return sesion_consulta.query(*columnas_respuesta(Miembro, MiembroRespuesta)).filter(
+            Miembro.codigo_biblioteca == codigo_biblioteca,
+            Miembro.cuenta_activa == True
+        )
+
+    fragmento = fragmento_de_biblioteca(codigo_biblioteca)
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Miembro.numero_miembro, despues_de, limite, MiembroRespuesta, fragmentos=[fragmento],
+            sesion_solicitud=sesion
+        )
+    elegir_fragmento(sesion, fragmento)
+    return responder_pagina(consulta(sesion), Miembro.numero_miembro, despues_de, limite, MiembroRespuesta)
 
 @router.put("/{numero_miembro}", response_model=MiembroRespuesta)
+@compatible_async
 def actualizar_miembro(numero_miembro: int, miembro: MiembroCrear, sesion: Session = Depends(get_db)):
+    elegir_por_id(sesion, numero_miembro)
     miembro_bd = sesion.query(Miembro).filter(Miembro.numero_miembro == numero_miembro).first()
     if not miembro_bd:
         raise HTTPException(status_code=404, detail="Miembro no encontrado")
     
     # Verificar que la nueva biblioteca existe si se está cambiando
     if miembro.codigo_biblioteca != miembro_bd.codigo_biblioteca:
-        biblioteca = sesion.query(Biblioteca).filter(Biblioteca.codigo_biblioteca == miembro.codigo_biblioteca).first()
-        if not biblioteca:
+        # El número de miembro indica su fragmento: no puede pasar a una biblioteca de otro
+        if fragmento_de_biblioteca(miembro.codigo_biblioteca) != fragmento_de_biblioteca(miembro_bd.codigo_biblioteca):
+            raise HTTPException(status_code=409, detail="La nueva biblioteca está en otro fragmento de la base de datos")
+        
+        if not CacheLecturas.biblioteca_activa(sesion, miembro.codigo_biblioteca):
             raise HTTPException(status_code=404, detail="Nueva biblioteca no encontrada")
         
         # Verificar que no tenga préstamos activos antes de cambiar de biblioteca
-        prestamos_activos = sesion.query(Prestamo).filter(
-            Prestamo.numero_miembro == numero_miembro,
-            Prestamo.estado_prestamo == "Activo"
-        ).count()
-        
-        if prestamos_activos > 0:
+        if miembro_bd.prestamos_activos > 0:
             raise HTTPException(status_code=400, detail="No se puede cambiar de biblioteca con préstamos activos")
     
     for campo, valor in miembro.dict().items():
@@ -57,27 +119,22 @@ def actualizar_miembro(numero_miembro: int, miembro: MiembroCrear, sesion: Sessi
     return miembro_bd
 
 @router.delete("/{numero_miembro}")
+@compatible_async
 def eliminar_miembro(numero_miembro: int, sesion: Session = Depends(get_db)):
+    elegir_por_id(sesion, numero_miembro)
     miembro = sesion.query(Miembro).filter(Miembro.numero_miembro == numero_miembro).first()
     if not miembro:
         raise HTTPException(status_code=404, detail="Miembro no encontrado")
     
     # Verificar que no tenga préstamos activos
-    prestamos_activos = sesion.query(Prestamo).filter(
-        Prestamo.numero_miembro == numero_miembro,
-        Prestamo.estado_prestamo == "Activo"
-    ).count()
-    
-    if prestamos_activos > 0:
+    if miembro.prestamos_activos > 0:
         raise HTTPException(status_code=400, detail="No se puede eliminar miembro con préstamos activos")
     
-    # Eliminar historial de préstamos del miembro
-    prestamos_historial = sesion.query(Prestamo).filter(Prestamo.numero_miembro == numero_miembro).all()
-    for prestamo in prestamos_historial:
-        sesion.delete(prestamo)
+    # Eliminar historial de préstamos del miembro por lotes
+    EliminadorDatos.eliminar_en_lotes(sesion, Prestamo, Prestamo.numero_miembro == numero_miembro)
     
     # Eliminar el miembro
-    sesion.delete(miembro)
+    sesion.execute(delete(Miembro).where(Miembro.numero_miembro == numero_miembro))
     sesion.commit()
     
     return {"mensaje": "Miembro y su historial eliminados exitosamente"}
\ No newline at end of file
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Query
+from ..modelo_lectura import modelo_catalogo
+
+router = APIRouter(prefix="/modelo-lectura", tags=["Modelo de lectura"])
+
+@router.get("/estadisticas")
+def estadisticas_modelo_lectura(
+    memoria: bool = Query(True, description="Incluye los bytes ocupados (recorre todo el modelo)")
+):
+    """Tamaño, posición en el registro de eventos y memoria del modelo de lectura de este proceso"""
+    return modelo_catalogo.estadisticas(memoria)
+
+@router.get("/verificar")
+def verificar_modelo_lectura():
+    """Compara el modelo de lectura con la base de datos y cuenta las diferencias"""
+    if not modelo_catalogo.activo:
+        raise HTTPException(status_code=409, detail="El modelo de lectura no está activo (BIBLIOTECA_MODELO_LECTURA=1)")
+    return modelo_catalogo.verificar()
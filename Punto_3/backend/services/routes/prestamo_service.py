@@ -1,68 +1,227 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional, Sequence, Tuple
 from fastapi import APIRouter
-from ...models.schemas import PrestamoCrear, PrestamoRespuesta
-from ...database.models import Libro,Miembro,Prestamo
+from ...models.schemas import (
+    LibroRespuesta, MiembroRespuesta, PrestamoCrear, PrestamoExpandido, PrestamoRespuesta, PrestamoLote,
+    DevolucionLote, RespuestaLote, ResultadoLote
+)
+from ...database.models import Libro, Miembro, Prestamo
 from ...repositories.biblioteca_repository import GestorBiblioteca
-from ...database.db import get_db  
-from datetime import datetime
+from ...database.db import (
+    agrupar_por_fragmento, elegir_fragmento, elegir_por_id, fragmento_de_biblioteca, fragmento_de_id,
+    fragmentos_de_datos, get_db
+)
+from ..asincrono import compatible_async
+from ..escrituras import canal_escrituras, escritura_agrupada
+from ..paginacion import (
+    parametro_formato, parametro_limite, responder_pagina, responder_pagina_fragmentos, transmitir_ndjson
+)
+from ..serializacion import columnas_respuesta
 
 router = APIRouter(prefix="/prestamos", tags=["Prestamos"])
 
+# Relaciones que se pueden incluir con expand: (modelo, esquema, relación en Prestamo)
+EXPANSIONES = {
+    "libro": (Libro, LibroRespuesta, Prestamo.libro_prestado),
+    "miembro": (Miembro, MiembroRespuesta, Prestamo.miembro_solicitante),
+}
+
+
+def parametro_expandir():
+    return Query(
+        None, pattern="^(libro|miembro)(,(libro|miembro))?$",
+        description="Incluye el libro y/o el miembro de cada préstamo: libro, miembro o libro,miembro"
+    )
+
+
+def leer_expansiones(expand: Optional[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(expand.split(","))) if expand else ()
+
+
+def consultar_prestamos(sesion: Session, expansiones: Tuple[str, ...], unir_miembro: bool = False):
+    """Columnas del préstamo seguidas de las de cada expansión, unidas en la misma consulta.
+
+    Las relaciones son muchos a uno, así que el JOIN no multiplica filas y la página
+    completa con sus libros y miembros se resuelve en una sola sentencia.
+    unir_miembro indica que el llamador filtra por columnas de Miembro.
+    """
+    columnas = columnas_respuesta(Prestamo, PrestamoRespuesta)
+    for nombre in expansiones:
+        modelo, esquema, _ = EXPANSIONES[nombre]
+        columnas += columnas_respuesta(modelo, esquema)
+    consulta = sesion.query(*columnas).select_from(Prestamo)
+    if unir_miembro:
+        consulta = consulta.join(Prestamo.miembro_solicitante)
+    for nombre in expansiones:
+        relacion = EXPANSIONES[nombre][2]
+        if not (unir_miembro and nombre == "miembro"):
+            consulta = consulta.outerjoin(relacion)
+    return consulta
+
+
+def anidados_prestamo(expansiones: Tuple[str, ...]) -> list:
+    return [(nombre, EXPANSIONES[nombre][1]) for nombre in expansiones]
+
+
+def procesar_por_fragmento(
+    sesion: Session,
+    elementos: Sequence,
+    fragmento_de: Callable[[object], Optional[int]],
+    procesar: Callable[[Session, list], List[ResultadoLote]]
+) -> List[ResultadoLote]:
+    """Procesa el lote de cada fragmento por separado y devuelve los resultados con los índices del lote completo.
+
+    Cada fragmento se confirma en su propia transacción: si el lote abarca varios, un conflicto
+    de concurrencia en uno rechaza solo sus elementos en lugar de toda la solicitud.
+    """
+    grupos = agrupar_por_fragmento(range(len(elementos)), lambda indice: fragmento_de(elementos[indice]))
+    resultados = [None] * len(elementos)
+    for fragmento, indices in grupos.items():
+        elegir_fragmento(sesion, fragmento)
+        try:
+            parciales = procesar(sesion, [elementos[indice] for indice in indices])
+        except HTTPException as error:
+            if len(grupos) == 1:
+                raise
+            parciales = [
+                ResultadoLote(indice=posicion, exito=False, codigo_estado=error.status_code, error=error.detail)
+                for posicion in range(len(indices))
+            ]
+        for resultado in parciales:
+            resultado.indice = indices[resultado.indice]
+            resultados[resultado.indice] = resultado
+    return resultados
+
 @router.post("/", response_model=PrestamoRespuesta, status_code=status.HTTP_201_CREATED)
+@escritura_agrupada(canal_escrituras.prestar)
+@compatible_async
 def crear_prestamo(prestamo: PrestamoCrear, sesion: Session = Depends(get_db)):
+    # El préstamo se guarda en el fragmento del miembro, que es también el de sus libros
+    elegir_por_id(sesion, prestamo.numero_miembro)
     return GestorBiblioteca.procesar_prestamo(sesion, prestamo)
 
-@router.get("/miembros/{numero_miembro}/prestamos", response_model=List[PrestamoRespuesta])
-def listar_prestamos_miembro(numero_miembro: int, sesion: Session = Depends(get_db)):
-    return sesion.query(Prestamo).filter(Prestamo.numero_miembro == numero_miembro).all()
+@router.post("/lote", response_model=RespuestaLote)
+@compatible_async
+def crear_prestamos_lote(lote: PrestamoLote, sesion: Session = Depends(get_db)):
+    resultados = procesar_por_fragmento(
+        sesion, lote.prestamos, lambda datos: fragmento_de_id(datos.numero_miembro),
+        GestorBiblioteca.procesar_prestamos_lote
+    )
+    exitosos = sum(1 for resultado in resultados if resultado.exito)
+    return RespuestaLote(exitosos=exitosos, fallidos=len(resultados) - exitosos, resultados=resultados)
+
+@router.get("/vencidos", response_model=List[PrestamoRespuesta])
+@compatible_async
+def listar_prestamos_vencidos(
+    codigo_biblioteca: Optional[int] = None,
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[int] = None,
+    formato: str = parametro_formato(),
+    sesion: Session = Depends(get_db)
+):
+    def consulta(sesion_consulta: Session):
+        consulta_vencidos = sesion_consulta.query(*columnas_respuesta(Prestamo, PrestamoRespuesta)).filter(
+            Prestamo.estado_prestamo == "Vencido"
+        )
+        if codigo_biblioteca:
+            consulta_vencidos = consulta_vencidos.join(Miembro).filter(Miembro.codigo_biblioteca == codigo_biblioteca)
+        return consulta_vencidos
+
+    fragmentos = [fragmento_de_biblioteca(codigo_biblioteca)] if codigo_biblioteca else fragmentos_de_datos()
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta, fragmentos=fragmentos,
+            sesion_solicitud=sesion
+        )
+    if len(fragmentos) == 1:
+        elegir_fragmento(sesion, fragmentos[0])
+        return responder_pagina(consulta(sesion), Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta)
+    return responder_pagina_fragmentos(sesion, consulta, Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta)
+
+@router.put("/lote/devolver", response_model=RespuestaLote)
+@compatible_async
+def devolver_libros_lote(lote: DevolucionLote, sesion: Session = Depends(get_db)):
+    resultados = procesar_por_fragmento(
+        sesion, lote.ids_prestamo, fragmento_de_id, GestorBiblioteca.procesar_devoluciones_lote
+    )
+    exitosos = sum(1 for resultado in resultados if resultado.exito)
+    return RespuestaLote(exitosos=exitosos, fallidos=len(resultados) - exitosos, resultados=resultados)
 
-@router.get("/bibliotecas/{codigo_biblioteca}/prestamos-activos")
-def prestamos_activos_biblioteca(codigo_biblioteca: int, sesion: Session = Depends(get_db)):
-    prestamos = sesion.query(Prestamo).join(Miembro).filter(
-        Miembro.codigo_biblioteca == codigo_biblioteca,
-        Prestamo.estado_prestamo == "Activo"
-    ).all()
-    return prestamos
+@router.get("/miembros/{numero_miembro}/prestamos", response_model=List[PrestamoExpandido])
+@compatible_async
+def listar_prestamos_miembro(
+    numero_miembro: int,
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[int] = None,
+    formato: str = parametro_formato(),
+    expand: Optional[str] = parametro_expandir(),
+    sesion: Session = Depends(get_db)
+):
+    expansiones = leer_expansiones(expand)
+    anidados = anidados_prestamo(expansiones)
+
+    def consulta(sesion_consulta: Session):
+        return consultar_prestamos(sesion_consulta, expansiones).filter(Prestamo.numero_miembro == numero_miembro)
+
+    fragmento = fragmento_de_id(numero_miembro)
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta, anidados, [fragmento], sesion
+        )
+    elegir_fragmento(sesion, fragmento)
+    return responder_pagina(consulta(sesion), Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta, anidados)
+
+@router.get("/bibliotecas/{codigo_biblioteca}/prestamos-activos", response_model=List[PrestamoExpandido])
+@compatible_async
+def prestamos_activos_biblioteca(
+    codigo_biblioteca: int,
+    limite: Optional[int] = parametro_limite(),
+    despues_de: Optional[int] = None,
+    formato: str = parametro_formato(),
+    expand: Optional[str] = parametro_expandir(),
+    sesion: Session = Depends(get_db)
+):
+    expansiones = leer_expansiones(expand)
+    anidados = anidados_prestamo(expansiones)
+
+    def consulta(sesion_consulta: Session):
+        return consultar_prestamos(sesion_consulta, expansiones, unir_miembro=True).filter(
+            Miembro.codigo_biblioteca == codigo_biblioteca,
+            Prestamo.estado_prestamo == "Activo"
+        )
+
+    fragmento = fragmento_de_biblioteca(codigo_biblioteca)
+    if formato == "ndjson":
+        return transmitir_ndjson(
+            consulta, Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta, anidados, [fragmento], sesion
+        )
+    elegir_fragmento(sesion, fragmento)
+    return responder_pagina(consulta(sesion), Prestamo.id_prestamo, despues_de, limite, PrestamoRespuesta, anidados)
+
+async def devolver_agrupado(id_prestamo: int):
+    multa = await canal_escrituras.devolver(id_prestamo)
+    return {"mensaje": "Libro devuelto exitosamente", "multa": multa}
 
 @router.put("/{id_prestamo}/devolver")
+@escritura_agrupada(devolver_agrupado)
+@compatible_async
 def devolver_libro(id_prestamo: int, sesion: Session = Depends(get_db)):
-    prestamo = sesion.query(Prestamo).filter(Prestamo.id_prestamo == id_prestamo).first()
-    if not prestamo:
-        raise HTTPException(status_code=404, detail="Préstamo no encontrado")
-    
-    if prestamo.estado_prestamo != "Activo":
-        raise HTTPException(status_code=400, detail="El préstamo no está activo")
-    
-    # Actualizar préstamo
-    prestamo.fecha_devolucion = datetime.now()
-    prestamo.estado_prestamo = "Devuelto"
-    
-    # Calcular multa si hay retraso
-    if datetime.now() > prestamo.fecha_limite:
-        dias_retraso = (datetime.now() - prestamo.fecha_limite).days
-        prestamo.multa_aplicada = dias_retraso * 1000  # $1000 por día de retraso
-    
-    # Incrementar disponibilidad del libro
-    libro = sesion.query(Libro).filter(Libro.codigo_libro == prestamo.codigo_libro).first()
-    if libro:
-        libro.cantidad_disponible += 1
-    
-    sesion.commit()
+    elegir_por_id(sesion, id_prestamo)
+    prestamo = GestorBiblioteca.procesar_devolucion(sesion, id_prestamo)
     return {"mensaje": "Libro devuelto exitosamente", "multa": prestamo.multa_aplicada}
 
 @router.delete("/{id_prestamo}")
+@compatible_async
 def eliminar_prestamo(id_prestamo: int, sesion: Session = Depends(get_db)):
+    elegir_por_id(sesion, id_prestamo)
     prestamo = sesion.query(Prestamo).filter(Prestamo.id_prestamo == id_prestamo).first()
     if not prestamo:
         raise HTTPException(status_code=404, detail="Préstamo no encontrado")
     
-    # Si el préstamo está activo, devolver la disponibilidad al libro
-    if prestamo.estado_prestamo == "Activo":
-        libro = sesion.query(Libro).filter(Libro.codigo_libro == prestamo.codigo_libro).first()
-        if libro:
-            libro.cantidad_disponible += 1
+    # Si el préstamo está activo o vencido, devolver la disponibilidad al libro y el cupo al miembro
+    if prestamo.estado_prestamo in Prestamo.ESTADOS_PENDIENTES:
+        GestorBiblioteca.liberar_prestamo(sesion, prestamo)
     
     # Eliminar el préstamo
     sesion.delete(prestamo)
@@ -0,0 +1,41 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from ...database.db import fragmento_de_biblioteca, fragmentos_de_datos
+from ...repositories.reportes_repository import AGRUPACIONES, AGRUPACIONES_COMBINADAS, ReportesPrestamos
+from ..reportes import acepta_gzip, transmitir_reporte
+
+router = APIRouter(prefix="/reportes", tags=["Reportes"])
+
+@router.get("/prestamos")
+def reporte_prestamos(
+    desde: date = Query(..., description="Primer día de solicitud incluido"),
+    hasta: date = Query(..., description="Último día de solicitud incluido"),
+    codigo_biblioteca: Optional[int] = Query(None, description="Solo préstamos de libros de esta biblioteca"),
+    agrupar: Optional[str] = Query(
+        None, pattern=f"^({'|'.join(AGRUPACIONES)})$",
+        description="Totales de préstamos y multas por día, categoría o miembro en lugar del detalle"
+    ),
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Historial de préstamos de un rango de fechas con su miembro, libro y multa, en streaming.
+
+    Se comprime en gzip si el cliente lo acepta. Con fragmentación se recorren los fragmentos
+    uno tras otro: el detalle sale ordenado por fecha dentro de cada fragmento.
+    """
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="La fecha hasta es anterior a la fecha desde")
+    inicio = datetime.combine(desde, time.min)
+    fin = datetime.combine(hasta + timedelta(days=1), time.min)
+    # Los préstamos de los libros de una biblioteca están en el fragmento de esa biblioteca
+    fragmentos = [fragmento_de_biblioteca(codigo_biblioteca)] if codigo_biblioteca is not None else fragmentos_de_datos()
+    nombre_archivo = f"prestamos_{agrupar + '_' if agrupar else ''}{desde}_{hasta}"
+
+    if agrupar is None:
+        consulta = ReportesPrestamos.prestamos(inicio, fin, codigo_biblioteca)
+        combinar = None
+    else:
+        consulta = ReportesPrestamos.agregados(agrupar, inicio, fin, codigo_biblioteca)
+        combinar = ReportesPrestamos.sumar_por_clave if agrupar in AGRUPACIONES_COMBINADAS and len(fragmentos) > 1 else None
+    return transmitir_reporte(consulta, formato, acepta_gzip(accept_encoding), nombre_archivo, fragmentos, combinar)
@@ -0,0 +1,17 @@
+from fastapi import HTTPException, Depends
+from sqlalchemy.orm import Session
+from fastapi import APIRouter
+from ...models.schemas import TrabajoRespuesta
+from ...database.models import TrabajoEliminacion
+from ...database.db import get_db
+from ..asincrono import compatible_async
+
+router = APIRouter(prefix="/trabajos", tags=["Trabajos"])
+
+@router.get("/{id_trabajo}", response_model=TrabajoRespuesta)
+@compatible_async
+def obtener_trabajo(id_trabajo: int, sesion: Session = Depends(get_db)):
+    trabajo = sesion.query(TrabajoEliminacion).filter(TrabajoEliminacion.id_trabajo == id_trabajo).first()
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
@@ -0,0 +1,84 @@
+import json
+from datetime import date, datetime
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Type
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se codifica con json de la biblioteca estándar
+    orjson = None
+
+
+def columnas_respuesta(modelo, esquema: Type[BaseModel]) -> list:
+    """Columnas del modelo ORM que corresponden a los campos del esquema, en el mismo orden"""
+    return [getattr(modelo, campo) for campo in esquema.model_fields]
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def codificar_json(contenido) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(contenido)
+    return json.dumps(contenido, default=_serializar_valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# (nombre del campo, esquema) de un objeto relacionado cuyas columnas siguen a las del esquema principal
+Anidado = Tuple[str, Type[BaseModel]]
+
+
+def armador_filas(esquema: Type[BaseModel], anidados: Sequence[Anidado] = ()) -> Callable[[Sequence], dict]:
+    """Función que convierte una tupla de columnas en el diccionario del esquema.
+
+    Con anidados, la tupla trae a continuación las columnas de cada objeto relacionado
+    (columnas_respuesta de su esquema); si su primera columna es NULL el objeto queda en None.
+    """
+    campos = tuple(esquema.model_fields)
+    if not anidados:
+        return lambda fila: dict(zip(campos, fila))
+
+    tramos = []
+    inicio = len(campos)
+    for nombre, esquema_anidado in anidados:
+        campos_anidado = tuple(esquema_anidado.model_fields)
+        tramos.append((nombre, campos_anidado, inicio, inicio + len(campos_anidado)))
+        inicio += len(campos_anidado)
+
+    def armar(fila: Sequence) -> dict:
+        diccionario = dict(zip(campos, fila))
+        for nombre, campos_anidado, desde, hasta in tramos:
+            diccionario[nombre] = None if fila[desde] is None else dict(zip(campos_anidado, fila[desde:hasta]))
+        return diccionario
+
+    return armar
+
+
+def filas_como_diccionarios(filas: Iterable, esquema: Type[BaseModel], anidados: Sequence[Anidado] = ()) -> List[dict]:
+    """Convierte tuplas de columnas (en el orden de columnas_respuesta) en diccionarios del esquema"""
+    armar = armador_filas(esquema, anidados)
+    return [armar(fila) for fila in filas]
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """JSONResponse codificada con orjson cuando está instalado"""
+
+    def render(self, contenido) -> bytes:
+        return codificar_json(contenido)
+
+
+def responder_filas(
+    filas: Iterable,
+    esquema: Type[BaseModel],
+    cabeceras: Optional[dict] = None,
+    anidados: Sequence[Anidado] = ()
+) -> RespuestaJSONRapida:
+    """Respuesta JSON armada desde tuplas de columnas leídas de la base de datos.
+
+    Los datos ya vienen tipados por las columnas del modelo, así que no se instancia
+    el esquema Pydantic por fila; el response_model de la ruta queda solo para la documentación.
+    """
+    return RespuestaJSONRapida(filas_como_diccionarios(filas, esquema, anidados), headers=cabeceras)
@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
+from ..database.db import CrearSesion, elegir_fragmento, fragmentos_de_datos
+from ..repositories.biblioteca_repository import GestorBiblioteca
+
+
+registro = logging.getLogger(__name__)
+
+
+def barrer_vencidos(tamano_lote: int = 1000) -> int:
+    """Ejecuta un barrido completo de préstamos vencidos con una sesión propia, fragmento a fragmento"""
+    actualizados = 0
+    with CrearSesion() as sesion:
+        for fragmento in fragmentos_de_datos():
+            elegir_fragmento(sesion, fragmento)
+            actualizados += GestorBiblioteca.marcar_prestamos_vencidos(sesion, tamano_lote=tamano_lote)
+    return actualizados
+
+
+async def barrido_periodico(intervalo_segundos: float):
+    """Tarea de fondo: repite el barrido de vencimientos cada intervalo"""
+    while True:
+        try:
+            actualizados = await run_in_threadpool(barrer_vencidos)
+            if actualizados:
+                registro.info("Barrido de vencimientos: %s préstamos actualizados", actualizados)
+        except Exception:
+            registro.exception("Falló el barrido de vencimientos")
+        await asyncio.sleep(intervalo_segundos)